@@ -0,0 +1,556 @@
+"""
+Benchmark suite of the persistence layer with synthetic datasets.
+"""
+
+import asyncio
+import gc
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import Session
+
+from discord_taskbot.components.backends import create_backend
+from discord_taskbot.components.config import StorageConfig
+from discord_taskbot.components.migrations import rebuild_project_stats
+from discord_taskbot.components.data_classes import Task
+from discord_taskbot.components.models import ORM_Project, ORM_Task
+from discord_taskbot.components.persistence import PersistenceAPI, AsyncPersistenceAPI
+from discord_taskbot.components.stats import BotStats
+from discord_taskbot.utils.constants import TASK_STATUS_IDS, TASK_PAGE_SIZE
+
+__all__ = ['PROFILES', 'RESULT_FORMAT_VERSION', 'generate_dataset', 'measure_instrumentation', 'measure_event_loop',
+           'run_benchmarks', 'compare_results', 'load_results', 'save_results']
+
+# synthetic guild sizes (projects, tasks)
+PROFILES = {
+    'small': (10, 1_000),
+    'medium': (100, 100_000),
+    'large': (1_000, 1_000_000),
+}
+
+RESULT_FORMAT_VERSION = 1
+
+# first synthetic channel and message id, similar in size to Discord snowflakes
+_CHANNEL_ID_BASE = 900_000_000_000_000_000
+_MESSAGE_ID_BASE = 1_000_000_000_000_000_000
+
+# rows per insert statement when generating a dataset
+_GENERATE_CHUNK_SIZE = 10_000
+
+# lookups per full table scan benchmark, which takes milliseconds per lookup on large datasets
+_SCAN_ITERATIONS = 100
+
+# maximum number of tasks loaded at once by the record construction benchmarks
+_RECORD_COUNT = 100_000
+
+# SQLite storage profiles compared by the write benchmarks, and their number of projects
+_WRITE_PROFILES = {
+    'rollback_full': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'wal_full': {'journal_mode': 'WAL', 'synchronous': 'FULL'},
+    'wal_normal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+    'wal_normal_mmap': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'mmap_size': 268_435_456,
+                        'cache_size': -65_536},
+}
+_WRITE_PROFILE_PROJECTS = 10
+
+# sleep interval of the coroutine that measures event loop stalls
+_TICK_SECONDS = 0.001
+
+
+def generate_dataset(config: StorageConfig, projects: int, tasks: int) -> None:
+    """
+    Create a database with synthetic projects and tasks. Tasks are spread evenly over the projects and all of them
+    are posted (have a message id). Rows are inserted in bulk, bypassing the PersistenceAPI. Task ids are assigned by
+    the database, from 1 on in an empty database.
+    """
+
+    # create the schema and runtime values
+    db = PersistenceAPI(config)
+    db.startup()
+    db.close()
+
+    backend = create_backend(config)
+    engine = backend.create_engine()
+    tasks_per_project = [tasks // projects + (1 if i < tasks % projects else 0) for i in range(projects)]
+
+    with Session(engine) as session:
+        session.execute(ORM_Project.__table__.insert(), [
+            {
+                'tag': f"P{i}",
+                'id': i,
+                'display_name': f"Project {i}",
+                'description': f"Synthetic project {i}.",
+                'channel_id': _CHANNEL_ID_BASE + i,
+            }
+            for i in range(1, projects + 1)
+        ])
+
+        backend.set_counter(session, 'PROJECT_ID_COUNT', projects)
+        for project_id, count in enumerate(tasks_per_project, start=1):
+            backend.set_counter(session, str(project_id), count)
+
+        rows = []
+        task_id = 0
+
+        for project_id, count in enumerate(tasks_per_project, start=1):
+            for number in range(1, count + 1):
+                task_id += 1
+                rows.append({
+                    'related_project_id': project_id,
+                    'number': number,
+                    'title': f"Task {number} of project {project_id}",
+                    'description': "Synthetic task.",
+                    'status': TASK_STATUS_IDS[task_id % len(TASK_STATUS_IDS)],
+                    'assigned_to': None,
+                    'message_id': _MESSAGE_ID_BASE + task_id,
+                    'has_thread': False,
+                })
+
+                if len(rows) >= _GENERATE_CHUNK_SIZE:
+                    session.execute(ORM_Task.__table__.insert(), rows)
+                    rows = []
+
+        if rows:
+            session.execute(ORM_Task.__table__.insert(), rows)
+
+        rebuild_project_stats(session.connection())
+        session.commit()
+
+    engine.dispose()
+
+
+def _database_version(config: StorageConfig) -> str:
+    engine = create_backend(config).create_engine()
+    with engine.connect():
+        version = '.'.join(map(str, engine.dialect.server_version_info))
+    engine.dispose()
+    return version
+
+
+def _timings(samples: list[float]) -> dict[str, float]:
+    """Summary of operation durations (seconds) in microseconds."""
+
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e6
+
+    total = sum(samples)
+    return {
+        'count': len(samples),
+        'mean_us': statistics.fmean(samples) * 1e6,
+        'p50_us': percentile(0.50),
+        'p95_us': percentile(0.95),
+        'p99_us': percentile(0.99),
+        'ops_per_s': len(samples) / total if total else 0.0,
+    }
+
+
+def _measure(func: Callable[[int], Any], iterations: int) -> dict[str, float]:
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        samples.append(time.perf_counter() - start)
+
+    return _timings(samples)
+
+
+def _measure_async(func: Callable[[int], Awaitable[Any]], iterations: int) -> dict[str, float]:
+    """Like _measure(), for coroutines awaited one after another in a fresh event loop."""
+
+    async def run() -> list[float]:
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            await func(i)
+            samples.append(time.perf_counter() - start)
+        return samples
+
+    return _timings(asyncio.run(run()))
+
+
+def _measure_per_call(func: Callable[[], Any], iterations: int) -> dict[str, float]:
+    """Average duration of a call that is too fast to be timed one by one, minus the loop overhead."""
+
+    def loop(f: Callable[[], Any]) -> float:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            f()
+        return time.perf_counter() - start
+
+    empty = loop(lambda: None)
+    total = loop(func)
+    return {'count': iterations, 'mean_us': max(0.0, total - empty) / iterations * 1e6}
+
+
+def measure_instrumentation(iterations: int = 100_000) -> dict[str, dict[str, float]]:
+    """Overhead of the stats instrumentation per measured call, disabled and enabled."""
+
+    results = {}
+
+    for enabled in (False, True):
+        stats = BotStats(enabled=enabled)
+        state = 'enabled' if enabled else 'disabled'
+
+        def timed_block() -> None:
+            with stats.timer('benchmark_seconds', {'method': 'benchmark'}):
+                pass
+
+        results[f'instrumentation_timer_{state}'] = _measure_per_call(timed_block, iterations)
+        results[f'instrumentation_observe_{state}'] = _measure_per_call(
+            lambda: stats.observe('benchmark_seconds', 0.001, {'method': 'benchmark'}), iterations)
+
+    return results
+
+
+def measure_event_loop(inline: Callable[[int], Any], awaited: Callable[[int], Awaitable[Any]],
+                       iterations: int) -> dict[str, dict[str, float]]:
+    """
+    Latency of a database call and the event loop stall it causes, once called inline in a coroutine (blocking the
+    loop, like the event handlers did before the AsyncPersistenceAPI) and once awaited on the persistence executor.
+    A ticker coroutine sleeps _TICK_SECONDS in a loop meanwhile; the time it oversleeps is the stall.
+    """
+
+    async def run(call: Callable[[int], Any], blocking: bool) -> dict[str, float]:
+        stalls = []
+        running = True
+
+        async def ticker() -> None:
+            while running:
+                start = time.perf_counter()
+                await asyncio.sleep(_TICK_SECONDS)
+                stalls.append(max(0.0, time.perf_counter() - start - _TICK_SECONDS))
+
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+
+        samples = []
+        for i in range(iterations):
+            start = time.perf_counter()
+            if blocking:
+                call(i)
+            else:
+                await call(i)
+            samples.append(time.perf_counter() - start)
+
+            # let the ticker run between calls, like the loop does between events
+            await asyncio.sleep(0)
+
+        running = False
+        await task
+
+        return {**_timings(samples), 'stall_seconds': sum(stalls), 'max_stall_us': max(stalls, default=0.0) * 1e6}
+
+    return {
+        'inline': asyncio.run(run(inline, blocking=True)),
+        'executor': asyncio.run(run(awaited, blocking=False)),
+    }
+
+
+def _measure_index_lookups(config: StorageConfig, message_ids: list[int], project_ids: list[int],
+                           numbers: list[int], iterations: int) -> dict[str, dict[str, float]]:
+    """
+    Task lookups by message id and by project and number, once through the indexes of the tasks table and once as
+    full table scans. Adding 0 to a column keeps the database from using its index. Like get_task(), message lookups
+    repeat the condition of the partial message id index.
+    """
+
+    def column(c: Any, scan: bool) -> Any:
+        return c + 0 if scan else c
+
+    lookups = {
+        'message': lambda scan, i: (column(ORM_Task.message_id, scan) == message_ids[i],
+                                    column(ORM_Task.message_id, scan) != -1),
+        'project_number': lambda scan, i: (column(ORM_Task.related_project_id, scan) == project_ids[i],
+                                           ORM_Task.number == numbers[i]),
+    }
+
+    engine = create_backend(config).create_engine()
+    results = {}
+
+    with engine.connect() as connection:
+        for name, conditions in lookups.items():
+            results[f'task_by_{name}_indexed'] = _measure(
+                lambda i: connection.execute(select(ORM_Task.id).where(*conditions(False, i))).first(), iterations)
+            results[f'task_by_{name}_scan'] = _measure(
+                lambda i: connection.execute(select(ORM_Task.id).where(*conditions(True, i))).first(),
+                min(iterations, _SCAN_ITERATIONS))
+
+    engine.dispose()
+    return results
+
+
+def _measure_records(config: StorageConfig, count: int) -> dict[str, dict[str, float]]:
+    """
+    Cost of loading count tasks as Task records: as ORM objects converted with from_orm(), as result rows converted
+    with from_rows(), and built from result rows by the validating constructor. seconds includes the query of the
+    ORM and row paths; mean_us is per record. memory_bytes is the Python memory allocated for the records, which
+    share their strings with the rows when built by the constructor.
+    """
+
+    engine = create_backend(config).create_engine()
+
+    with Session(engine) as session:
+        rows = session.execute(select(*Task.orm_columns()).limit(count)).all()
+
+    def from_orm() -> list[Task]:
+        with Session(engine) as s:
+            return [Task.from_orm(t) for t in s.query(ORM_Task).limit(count)]
+
+    def from_rows() -> list[Task]:
+        with Session(engine) as s:
+            return Task.from_rows(s.execute(select(*Task.orm_columns()).limit(count)))
+
+    def constructor() -> list[Task]:
+        return [Task(*row) for row in rows]
+
+    results = {}
+
+    for name, load in (('from_orm', from_orm), ('from_rows', from_rows), ('constructor', constructor)):
+        gc.collect()
+        start = time.perf_counter()
+        records = load()
+        seconds = time.perf_counter() - start
+        del records
+
+        gc.collect()
+        tracemalloc.start()
+        records = load()
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[f'task_records_{name}'] = {'count': len(records), 'seconds': seconds, 'memory_bytes': memory,
+                                           'mean_us': seconds / max(1, len(records)) * 1e6}
+        del records
+
+    engine.dispose()
+    return results
+
+
+def _measure_write_profiles(directory: str, iterations: int, rng: random.Random) -> dict[str, dict[str, float]]:
+    """Write throughput of add_task and update_task per SQLite storage profile, each on its own new database."""
+
+    results = {}
+    statuses = TASK_STATUS_IDS[1:]
+
+    for name, pragmas in _WRITE_PROFILES.items():
+        db = PersistenceAPI(StorageConfig(path=str(Path(directory) / f'profile_{name}.db'), **pragmas))
+        db.startup()
+
+        try:
+            project_ids = [db.add_project(f"P{i}", f"Project {i}", "Benchmark.", _CHANNEL_ID_BASE + i).id
+                           for i in range(_WRITE_PROFILE_PROJECTS)]
+            task_project_ids = [rng.choice(project_ids) for _ in range(iterations)]
+            task_ids = []
+
+            results[f'profile_{name}_add_task'] = _measure(
+                lambda i: task_ids.append(db.add_task(task_project_ids[i], f"Benchmark task {i}", "Benchmark.").id),
+                iterations)
+            results[f'profile_{name}_update_task'] = _measure(
+                lambda i: db.update_task(task_ids[i], status=statuses[i % len(statuses)]), iterations)
+        finally:
+            db.close()
+
+    return results
+
+
+def _measure_startup(config: StorageConfig) -> tuple[dict[str, float], PersistenceAPI]:
+    """Startup time of a fresh PersistenceAPI, then Python memory allocated by a second startup."""
+
+    gc.collect()
+    start = time.perf_counter()
+    db = PersistenceAPI(config)
+    db.startup()
+    seconds = time.perf_counter() - start
+    db.close()
+
+    gc.collect()
+    tracemalloc.start()
+    db = PersistenceAPI(config)
+    db.startup()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': seconds, 'memory_bytes': current, 'peak_memory_bytes': peak}, db
+
+
+def run_benchmarks(projects: int, tasks: int, iterations: int = 1000, seed: int = 0,
+                   directory: str = None, url: str = None) -> dict[str, Any]:
+    """
+    Generate a synthetic dataset and measure the PersistenceAPI on it. Returns the results as a JSON-serializable dict.
+
+    Lookups use random existing keys; the task lookups therefore mostly miss the task cache on large datasets.
+    Writes go to random projects and tasks. The dataset is created in a SQLite database in a temporary directory
+    (in directory if given), or in the empty database at url, e.g. a PostgreSQL database. All tables of the database
+    at url are dropped afterwards.
+    """
+
+    projects = max(1, int(projects))
+    tasks = max(projects, int(tasks))
+    rng = random.Random(seed)
+
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        config = StorageConfig(path=str(Path(tmp) / 'benchmark.db'), url=url or '')
+
+        if url:
+            engine = create_backend(config).create_engine()
+            empty = not inspect(engine).get_table_names()
+            engine.dispose()
+
+            if not empty:
+                raise ValueError("The benchmark database has to be empty.")
+
+        try:
+            start = time.perf_counter()
+            generate_dataset(config, projects, tasks)
+            generate_seconds = time.perf_counter() - start
+
+            startup, db = _measure_startup(config)
+            records = _measure_records(config, min(tasks, _RECORD_COUNT))
+            write_profiles = {} if url else _measure_write_profiles(tmp, iterations, random.Random(seed))
+            index_lookups = _measure_index_lookups(
+                config, [_MESSAGE_ID_BASE + rng.randint(1, tasks) for _ in range(iterations)],
+                [rng.randint(1, projects) for _ in range(iterations)],
+                [rng.randint(1, tasks // projects) for _ in range(iterations)], iterations)
+
+            channel_ids = [_CHANNEL_ID_BASE + rng.randint(1, projects) for _ in range(iterations)]
+            message_ids = [_MESSAGE_ID_BASE + rng.randint(1, tasks) for _ in range(iterations)]
+            task_ids = [rng.randint(1, tasks) for _ in range(iterations)]
+            statuses = [rng.choice(TASK_STATUS_IDS) for _ in range(iterations)]
+            project_ids = [rng.randint(1, projects) for _ in range(iterations)]
+
+            # task numbers occur in the titles of one task per project
+            search_terms = [str(rng.randint(1, tasks // projects)) for _ in range(iterations)]
+
+            # task listings start after these task numbers: first, middle and last page of a project; a page of a
+            # single status spans len(TASK_STATUS_IDS) pages of all tasks
+            last_page = max(0, tasks // projects - TASK_PAGE_SIZE)
+            last_status_page = max(0, tasks // projects - TASK_PAGE_SIZE * len(TASK_STATUS_IDS))
+
+            results = {
+                'startup': startup,
+                'get_project_by_channel': _measure(lambda i: db.get_project(channel_id=channel_ids[i]), iterations),
+                'is_channel_in_use': _measure(lambda i: db.is_channel_in_use(channel_ids[i]), iterations),
+                'get_task_by_message': _measure(lambda i: db.get_task(message_id=message_ids[i]), iterations),
+                'update_task': _measure(lambda i: db.update_task(task_ids[i], status=statuses[i]), iterations),
+                'add_task': _measure(lambda i: db.add_task(project_ids[i], f"Benchmark task {i}", "Benchmark."),
+                                     iterations),
+                'search_tasks': _measure(lambda i: db.search_tasks(search_terms[i]), iterations),
+                'search_tasks_in_project': _measure(
+                    lambda i: db.search_tasks(search_terms[i], project_ids=[project_ids[i]]), iterations),
+                'get_tasks_first_page': _measure(lambda i: db.get_tasks(project_ids[i], 0, TASK_PAGE_SIZE),
+                                                 iterations),
+                'get_tasks_middle_page': _measure(
+                    lambda i: db.get_tasks(project_ids[i], last_page // 2, TASK_PAGE_SIZE), iterations),
+                'get_tasks_last_page': _measure(lambda i: db.get_tasks(project_ids[i], last_page, TASK_PAGE_SIZE),
+                                                iterations),
+                'get_tasks_last_page_by_status': _measure(
+                    lambda i: db.get_tasks(project_ids[i], last_status_page, TASK_PAGE_SIZE, status=statuses[i]),
+                    iterations),
+                **index_lookups,
+                **records,
+                **write_profiles,
+                **measure_instrumentation(),
+            }
+
+            db.close()
+
+            adb = AsyncPersistenceAPI(PersistenceAPI(config))
+            adb.startup()
+            try:
+                # the channel check on_message does for every message, in project channels and other channels;
+                # ops_per_s is the number of messages per second the check lets through
+                message_channel_ids = [channel_id + (projects if i % 2 else 0)
+                                       for i, channel_id in enumerate(channel_ids)]
+                results['on_message_channel_check'] = _measure_async(
+                    lambda i: adb.is_channel_in_use(message_channel_ids[i]), iterations)
+
+                # event loop stall of task updates, which commit (and fsync on SQLite) on every call
+                event_loop = measure_event_loop(
+                    lambda i: adb.api.update_task(task_ids[i], status=statuses[i]),
+                    lambda i: adb.update_task(task_ids[i], status=statuses[i]), iterations)
+            finally:
+                adb.close()
+
+            results.update({f'event_loop_{mode}_update_task': r for mode, r in event_loop.items()})
+            database_version = _database_version(config)
+
+        finally:
+            if url:
+                backend = create_backend(config)
+                engine = backend.create_engine()
+                backend.drop_all(engine)
+                engine.dispose()
+
+    return {
+        'format_version': RESULT_FORMAT_VERSION,
+        'dataset': {'projects': projects, 'tasks': tasks, 'seed': seed, 'generate_seconds': generate_seconds},
+        'iterations': iterations,
+        'environment': {
+            'python': platform.python_version(),
+            'backend': config.backend,
+            'database': database_version,
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+# metrics that are compared against a baseline; all of them get worse when they grow
+_COMPARED_METRICS = ('seconds', 'memory_bytes', 'mean_us', 'p95_us')
+
+
+def compare_results(results: dict[str, Any], baseline: dict[str, Any],
+                    tolerance: float = 0.2) -> list[dict[str, Any]]:
+    """
+    Compare benchmark results with a baseline of the same dataset.
+    Returns one entry per compared metric; a metric regressed if it grew by more than tolerance (0.2 == 20 %).
+    """
+
+    if results.get('dataset', {}).get('projects') != baseline.get('dataset', {}).get('projects') or \
+            results.get('dataset', {}).get('tasks') != baseline.get('dataset', {}).get('tasks'):
+        raise ValueError("Results and baseline have been measured on different datasets.")
+
+    comparison = []
+
+    for name, metrics in results['results'].items():
+        base_metrics = baseline['results'].get(name, {})
+
+        for metric in _COMPARED_METRICS:
+            if metric not in metrics or not base_metrics.get(metric):
+                continue
+
+            ratio = metrics[metric] / base_metrics[metric]
+            comparison.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': base_metrics[metric],
+                'value': metrics[metric],
+                'ratio': ratio,
+                'regressed': ratio > 1 + tolerance,
+            })
+
+    return comparison
+
+
+def load_results(path: str) -> dict[str, Any]:
+    with open(path, encoding='utf-8') as fp:
+        return json.load(fp)
+
+
+def save_results(path: str, results: dict[str, Any]) -> None:
+    with open(path, 'w', encoding='utf-8') as fp:
+        json.dump(results, fp, indent=2)
+        fp.write('\n')
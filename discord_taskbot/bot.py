@@ -3,25 +3,50 @@ The actual discord bot.
 """
 
 import asyncio
-import traceback
 
 import discord
 from sqlalchemy.exc import IntegrityError
 
 from discord_taskbot.components.client import TaskBot
-from discord_taskbot.components.exceptions import DiscordTBException, CannotBeUpdated
+from discord_taskbot.components.exceptions import DiscordTBException, CannotBeUpdated, InvalidCursor
+from discord_taskbot.components.logger import get_logger, log_context, bind_log_context
+from discord_taskbot.components.scheduler import Priority
 from discord_taskbot.utils import INTENTS
-from discord_taskbot.utils.constants import TASK_STATUS_MAPPING
+from discord_taskbot.utils.constants import TASK_STATUS_MAPPING, MAX_SEARCH_RESULTS
 
 BOT = TaskBot(intents=INTENTS)
 tree = BOT.tree
 
+logger = get_logger('bot')
+
+# reactions are the most frequent events, their records can be sampled with LOG_SAMPLE_RATES
+reaction_logger = get_logger('reactions')
+
 
 @BOT.event
 async def on_ready():
     bot_activity = discord.Activity(type=discord.ActivityType.watching, name="task completions ✅")
     await BOT.change_presence(status=discord.Status.online, activity=bot_activity)
-    print(f'Successfully logged in as {BOT.user}.')
+    logger.info("Successfully logged in as %s.", BOT.user, extra={'guilds': len(BOT.guilds),
+                                                                  'shards': sorted(BOT.shards)})
+
+    # catch up on task messages, threads and reactions changed while the bot was offline
+    BOT.start_reconciliation(handle_task_reaction)
+
+
+@BOT.event
+async def on_guild_available(guild: discord.Guild):
+    await BOT.attach_guild(guild)
+
+
+@BOT.event
+async def on_guild_join(guild: discord.Guild):
+    await BOT.attach_guild(guild, joined=True)
+
+
+@BOT.event
+async def on_guild_remove(guild: discord.Guild):
+    await BOT.detach_guild(guild)
 
 
 @BOT.event
@@ -31,31 +56,48 @@ async def on_message(message: discord.Message):
         return
 
     # if message no interaction and channel is registered, delete message
-    if BOT.db.is_channel_in_use(message.channel.id) and message.author.id != BOT.user.id:
-        await message.delete()
+    if message.author.id != BOT.user.id and await BOT.db.is_channel_in_use(message.channel.id):
+        await BOT.scheduler.enqueue(Priority.CLEANUP, ('channel', message.channel.id), message.delete)
 
 
 @BOT.event
 async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
-    channel = await BOT.fetch_channel(payload.channel_id)
-    message = await channel.fetch_message(payload.message_id)
-    user = await BOT.fetch_user(payload.user_id)
+    with BOT.stats.count_rest_calls('reaction'), \
+            log_context(guild_id=payload.guild_id, channel_id=payload.channel_id, message_id=payload.message_id,
+                        user_id=payload.user_id):
+        await handle_task_reaction(payload)
+
+
+async def handle_task_reaction(payload: discord.RawReactionActionEvent) -> None:
+    """Execute a task action. Everything is decided from the raw payload, REST calls are only made for actions."""
 
     # check if message is a task
-    task = BOT.db.get_task(message_id=message.id)
-    if not task:
+    if not await BOT.db.is_task_message(payload.message_id):
         return
 
-    if not user.bot:
-        await message.remove_reaction(payload.emoji, user)
+    # ignore task action seeding and other bots
+    if payload.user_id == BOT.user.id:
+        return
 
+    user = payload.member or BOT.get_user(payload.user_id) or await BOT.fetch_user(payload.user_id)
     if user.bot:
         return
 
-    emoji = BOT.db.get_emoji(emoji=str(payload.emoji))
+    message = BOT.get_partial_task_message(payload.channel_id, payload.message_id, payload.guild_id)
+    await BOT.scheduler.enqueue(Priority.REACTION, ('channel', payload.channel_id), message.remove_reaction,
+                                payload.emoji, user)
+
+    emoji = await BOT.db.get_emoji(emoji=str(payload.emoji), guild_id=payload.guild_id)
     if not emoji:
         return
 
+    task = await BOT.db.get_task(message_id=payload.message_id)
+    if not task:
+        return
+
+    bind_log_context(task_id=task.id, project_id=task.related_project_id)
+    reaction_logger.debug("Task action '%s'.", emoji.id)
+
     match emoji.id:
         case 'pending':
             await BOT.update_task_status(task.id, emoji.id)
@@ -72,29 +114,45 @@ async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
         case 'open_discussion':
             thread = await message.create_thread(name=BOT.generate_task_thread_title(task))
             try:
-                BOT.db.update_task(task.id, has_thread=True)
+                task = await BOT.db.update_task(task.id, has_thread=True)
             except CannotBeUpdated:
-                # TODO don't use pass but something else, this is hard to debug
-                pass
+                reaction_logger.warning("Discussion thread has been created, but the task already has one.")
+            else:
+                BOT.render_queue.remember_thread(task)
         case 'done':
             await BOT.update_task_status(task.id, emoji.id)
 
 
 @BOT.event
 async def on_thread_create(thread: discord.Thread):
-    print ("New Thread!", thread)
-    task = BOT.db.get_task(thread_id=thread.id)
+    logger.debug("Thread created.", extra={'guild_id': thread.guild.id, 'thread_id': thread.id})
+    task = await BOT.db.get_task(thread_id=thread.id)
     if task:
-        BOT.db.update_task(task.id, has_thread=True)
-        await thread.edit(name=BOT.generate_task_thread_title(task))
+        await BOT.update_task(task.id, has_thread=True)
 
 
 @BOT.event
 async def on_thread_delete(thread: discord.Thread):
-    print ("Thread deleted!", thread)
-    task = BOT.db.get_task(thread_id=thread.id)
+    logger.debug("Thread deleted.", extra={'guild_id': thread.guild.id, 'thread_id': thread.id})
+    task = await BOT.db.get_task(thread_id=thread.id)
     if task:
-        BOT.db.update_task(task.id, has_thread=False)
+        await BOT.db.update_task(task.id, has_thread=False)
+        BOT.render_queue.forget(task.id, message=False)
+
+
+@BOT.event
+async def on_raw_thread_delete(payload: discord.RawThreadDeleteEvent):
+    BOT.handles.remove('thread', payload.thread_id)
+
+
+@BOT.event
+async def on_raw_message_delete(payload: discord.RawMessageDeleteEvent):
+    BOT.handles.remove('message', payload.message_id)
+
+
+@BOT.event
+async def on_guild_channel_delete(channel: discord.abc.GuildChannel):
+    BOT.handles.remove('channel', channel.id)
 
 
 @tree.command()
@@ -112,26 +170,28 @@ async def new_task(interaction: discord.Interaction, title: str, description: st
     await interaction.response.defer()
 
     # check if channel id is valid
-    project = BOT.db.get_project(channel_id=interaction.channel_id)
+    project = await BOT.db.get_project(channel_id=interaction.channel_id)
     if not project:
         await interaction.followup.send(
             f"This channel is not assigned to a project. Try again in a valid project channel. Entered information:\n```\n{title}\n{description}\n```")
         return
 
     try:
-        task = BOT.db.add_task(project.id, title, description)
+        task = await BOT.db.add_task(project.id, title, description)
     except Exception:
         await interaction.followup.send("Something went wrong while creating a new task.")
         return
 
     await BOT.update_task_status(task.id, 'pending')
-    message: discord.Message = await BOT.send_new_task(interaction.channel, task)
+    message: discord.Message = await BOT.send_new_task(interaction.channel, task,
+                                                       seed_reactions=not BOT.defer_reaction_seeding)
+    await BOT.db.update_task(task.id, message_id=message.id)
 
-    # TODO first send task content, secondly update task message id and then send task action emojis
+    await interaction.followup.send(f"Task created successfully.")
 
-    BOT.db.update_task(task.id, message_id=message.id)
+    if BOT.defer_reaction_seeding:
+        await BOT.seed_task_reactions(message)
 
-    await interaction.followup.send(f"Task created successfully.")
     await asyncio.sleep(1)
     await interaction.delete_original_response()
 
@@ -144,23 +204,26 @@ async def new_task_modal(interaction: discord.Interaction):
         await interaction.response.send_message("Creating new task...")
 
         try:
-            task = BOT.db.add_task(project.id, title, description)
+            task = await BOT.db.add_task(project.id, title, description)
         except Exception:
-            print(traceback.format_exc())
+            logger.exception("Creating a task failed.", extra={'project_id': project.id})
             await interaction.followup.send("Something went wrong while creating a new task.")
             return
 
         await BOT.update_task_status(task.id, 'pending')
 
-        # TODO first, send message with task content, second store message id for task, then add reactions to message
-
-        message: discord.Message = await BOT.send_new_task(interaction.channel, task)
-        BOT.db.update_task(task.id, message_id=message.id)
+        message: discord.Message = await BOT.send_new_task(interaction.channel, task,
+                                                           seed_reactions=not BOT.defer_reaction_seeding)
+        await BOT.db.update_task(task.id, message_id=message.id)
         await interaction.edit_original_response(content=f"Task created successfully.")
+
+        if BOT.defer_reaction_seeding:
+            await BOT.seed_task_reactions(message)
+
         await asyncio.sleep(1)
         await interaction.delete_original_response()
 
-    project = BOT.db.get_project(channel_id=interaction.channel_id)
+    project = await BOT.db.get_project(channel_id=interaction.channel_id)
     if not project:
         await interaction.response.send_message(
             f"This channel is not assigned to a project. Try again in a valid project channel.")
@@ -175,7 +238,7 @@ async def edit_task(interaction: discord.Interaction):
     """Edit a task's title and description with a modal."""
 
     # check if command is send in a task thread
-    t = BOT.db.get_task(thread_id=interaction.channel_id)
+    t = await BOT.db.get_task(thread_id=interaction.channel_id)
     if not t:
         await interaction.response.send_message("Failure. Tasks can only be edited from their discussion threads.")
         await asyncio.sleep(3)
@@ -203,7 +266,7 @@ async def set_task_status(interaction: discord.Interaction, status: str) -> None
     await interaction.response.defer()
 
     # check if command is send in a task thread
-    t = BOT.db.get_task(thread_id=interaction.channel_id)
+    t = await BOT.db.get_task(thread_id=interaction.channel_id)
     if not t:
         await interaction.followup.send("Failure. Tasks can only be edited from their discussion threads.")
         await asyncio.sleep(3)
@@ -228,7 +291,7 @@ async def assign_task(interaction: discord.Interaction, person: str = None) -> N
     await interaction.response.defer()
 
     # check if command is send in a task thread
-    t = BOT.db.get_task(thread_id=interaction.channel_id)
+    t = await BOT.db.get_task(thread_id=interaction.channel_id)
     if not t:
         await interaction.followup.send("Failure. Tasks can only be edited from their discussion threads.")
         await asyncio.sleep(3)
@@ -260,19 +323,162 @@ async def assign_task(interaction: discord.Interaction, person: str = None) -> N
     await interaction.followup.send(f"Invalid assignment parameter.")
 
 
+def parse_person(interaction: discord.Interaction, person: str = None) -> int | None:
+    """Get the user id of a person filter: a user mention or 'me'. Raises a ValueError if it is invalid."""
+
+    if not person:
+        return None
+    if person == "me":
+        return interaction.user.id
+
+    user_id = person[2:-1].lstrip('!')
+    if person.startswith('<@') and person.endswith('>') and user_id.isdigit():
+        return int(user_id)
+
+    raise ValueError("Invalid person. Mention a user or use 'me'.")
+
+
+@BOT.event
+async def on_interaction(interaction: discord.Interaction):
+    # page buttons of task listings carry their page in the custom id, see TaskBot.generate_task_page()
+    if interaction.type != discord.InteractionType.component:
+        return
+
+    page = BOT.parse_task_page_id(interaction.data.get('custom_id', ''))
+    if page is None:
+        return
+
+    project_id, status, assigned_to, after_number, before_number = page
+    project = await BOT.db.get_project(project_id=project_id)
+    if not project or project.guild_id != interaction.guild_id:
+        await interaction.response.send_message("This project does not exist anymore.", ephemeral=True)
+        return
+
+    embed, view = await BOT.generate_task_page(project, status, assigned_to, after_number, before_number)
+    await interaction.response.edit_message(embed=embed, view=view)
+
+
+@tree.command(name="tasks")
+async def list_tasks(interaction: discord.Interaction, project: str = None, status: str = None,
+                     person: str = None) -> None:
+    """List the tasks of this channel's or another project."""
+
+    if project:
+        p = await BOT.db.get_project(tag=project.strip(), guild_id=interaction.guild_id)
+    else:
+        p = await BOT.db.get_project(channel_id=interaction.channel_id)
+
+    if not p:
+        await interaction.response.send_message(
+            f"Project '{project}' does not exist." if project else "This channel is not bound to a project.",
+            ephemeral=True)
+        return
+
+    if status:
+        status = status.strip()
+        if status not in TASK_STATUS_MAPPING:
+            await interaction.response.send_message(
+                f"Invalid status id. You can only choose from {' | '.join(list(TASK_STATUS_MAPPING.keys()))}",
+                ephemeral=True)
+            return
+
+    try:
+        assigned_to = parse_person(interaction, person)
+    except ValueError as e:
+        await interaction.response.send_message(str(e), ephemeral=True)
+        return
+
+    embed, view = await BOT.generate_task_page(p, status or None, assigned_to)
+    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+
+@tree.command(name="board")
+async def post_board(interaction: discord.Interaction) -> None:
+    """Post and pin a board with this project's task counts, replacing the previous one."""
+
+    p = await BOT.db.get_project(channel_id=interaction.channel_id)
+    if not p:
+        await interaction.response.send_message("This channel is not bound to a project.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+
+    try:
+        await BOT.post_board(p, interaction.channel)
+    except discord.HTTPException as e:
+        logger.warning("Posting the board failed: %s", e, extra={'project_id': p.id})
+        await interaction.followup.send("The board could not be posted or pinned.", ephemeral=True)
+    else:
+        await interaction.followup.send("Board posted.", ephemeral=True)
+
+
+@tree.command(name="search")
+async def search_tasks(interaction: discord.Interaction, query: str, project: str = None, status: str = None,
+                       person: str = None, after: str = None) -> None:
+    """Search tasks of this server by title and description."""
+
+    await interaction.response.defer(ephemeral=True)
+
+    projects = {p.id: p for p in await BOT.db.get_projects(guild_id=interaction.guild_id)}
+    if project:
+        projects = {i: p for i, p in projects.items() if p.tag == project.strip()}
+        if not projects:
+            await interaction.followup.send(f"Project '{project}' does not exist.", ephemeral=True)
+            return
+
+    if status:
+        status = status.strip()
+        if status not in TASK_STATUS_MAPPING:
+            await interaction.followup.send(
+                f"Invalid status id. You can only choose from {' | '.join(list(TASK_STATUS_MAPPING.keys()))}",
+                ephemeral=True)
+            return
+
+    try:
+        assigned_to = parse_person(interaction, person)
+    except ValueError as e:
+        await interaction.followup.send(str(e), ephemeral=True)
+        return
+
+    try:
+        tasks, next_cursor = await BOT.db.search_tasks(query, list(projects), status, assigned_to, after,
+                                                       limit=MAX_SEARCH_RESULTS)
+    except InvalidCursor as e:
+        await interaction.followup.send(str(e), ephemeral=True)
+        return
+
+    if not tasks:
+        await interaction.followup.send("No tasks found.", ephemeral=True)
+        return
+
+    lines = []
+    for t in tasks:
+        p = projects[t.related_project_id]
+        title = t.title if len(t.title) <= 60 else t.title[:59] + '…'
+        line = f"**{p.tag}-{t.number}** {title} ({TASK_STATUS_MAPPING.get(t.status, t.status)})"
+        if t.message_id != -1:
+            line += f" https://discord.com/channels/{p.guild_id}/{p.channel_id}/{t.message_id}"
+        lines.append(line)
+
+    if next_cursor:
+        lines.append(f"More results: repeat the search with `after:{next_cursor}`.")
+
+    await interaction.followup.send('\n'.join(lines), ephemeral=True)
+
+
 @tree.command(name="newproject")
 async def new_project(interaction: discord.Interaction, project_id: str, displayname: str, description: str) -> None:
     """Assign a new project to this channel."""
 
     await interaction.response.defer()
     try:
-        BOT.db.add_project(project_id, displayname, description, interaction.channel_id)
+        await BOT.db.add_project(project_id, displayname, description, interaction.channel_id, interaction.guild_id)
     except IntegrityError:
         await interaction.followup.send(f"Could not create project '{displayname}' as it already exists.")
     except DiscordTBException as e:
         await interaction.followup.send(f"Could not create project '{displayname}': {e}")
     except Exception:
-        traceback.print_exc()
+        logger.exception("Creating project '%s' failed.", project_id)
         await interaction.followup.send(f"Something went wrong while creating '{displayname}'.")
 
     else:
@@ -284,7 +490,7 @@ async def new_project(interaction: discord.Interaction, project_id: str, display
 async def edit_project(interaction: discord.Interaction) -> None:
     """Edit a project with a pop-up."""
 
-    p = BOT.db.get_project(channel_id=interaction.channel_id)
+    p = await BOT.db.get_project(channel_id=interaction.channel_id)
     if not p:
         await interaction.response.send_message(f"This channel is not bound to a project.")
         return
@@ -293,7 +499,7 @@ async def edit_project(interaction: discord.Interaction) -> None:
         await interaction.response.defer()
 
         try:
-            BOT.db.update_project(p.tag, new_displayname, new_description)
+            await BOT.db.update_project(p.tag, new_displayname, new_description, guild_id=p.guild_id)
         except:
             await interaction.followup.send(f"Something went wrong while updating '{p.tag}'.")
         else:
@@ -310,9 +516,9 @@ async def set_emoji(interaction: discord.Interaction, emoji_id: str, emoji: str)
     await interaction.response.defer()
 
     try:
-        BOT.db.update_task_action_emoji(emoji_id, emoji)
+        await BOT.update_task_action_emoji(emoji_id, emoji, interaction.guild_id)
     except DiscordTBException as e:
-        await interaction.followup.send(
-            f"{e} You can only choose from {' | '.join(list(BOT.db.get_task_action_emoji_mapping().keys()))}.")
+        emoji_mapping = await BOT.db.get_task_action_emoji_mapping(interaction.guild_id)
+        await interaction.followup.send(f"{e} You can only choose from {' | '.join(list(emoji_mapping.keys()))}.")
     else:
         await interaction.followup.send(f"Successfully updated emoji '{emoji_id}' to '{emoji}' (\{emoji}).")
@@ -0,0 +1,337 @@
+"""
+Storage backends.
+"""
+
+import re
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import create_engine, event, cast, column, func, insert, literal_column, or_, select, table, text, \
+    Float, Integer, String, Table
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+from .config import StorageConfig
+from .exceptions import InvalidConfiguration
+from .migrations import SEARCH_INDEX_PROGRESS_NAME, SEARCH_INDEX_END_NAME, POSTGRESQL_SEARCH_VECTOR
+from .models import ORM_Task, ORM_ProjectStat, ORM_Value, ORM_BASE
+
+__all__ = ['StorageBackend', 'SQLiteBackend', 'PostgreSQLBackend', 'create_backend']
+
+# rows per INSERT ... RETURNING statement, keeps the statement below PostgreSQL's limit of bind parameters
+_INSERT_CHUNK_SIZE = 1000
+
+# upsert of task counts, valid on SQLite (3.24+) and PostgreSQL; SQLAlchemy doesn't cache the compiled form of its
+# dialect specific ON CONFLICT constructs
+_ADD_PROJECT_STATS = text(
+    f"INSERT INTO {ORM_ProjectStat.__tablename__} (project_id, kind, key, count) "
+    f"VALUES (:project_id, :kind, :key, :count) ON CONFLICT (project_id, kind, key) "
+    f"DO UPDATE SET count = {ORM_ProjectStat.__tablename__}.count + excluded.count")
+
+
+class StorageBackend(ABC):
+    name = ''
+
+    # True if task numbers come from database sequences, which reserve blocks themselves (see counter_block_size)
+    sequence_counters = False
+
+    def __init__(self, config: StorageConfig, counter_block_size: int = 1) -> None:
+        """
+        Database specific part of the persistence layer: engine and connection pool, counters and inserts.
+
+        Counters are named like their rows in the values table: PROJECT_ID_COUNT for project ids and the project id
+        for the project's task numbers. Backends implement all abstract methods.
+
+        Attributes:
+            config              Storage profile.
+            counter_block_size  Number of task numbers reserved per counter update.
+        """
+
+        self.config = config
+        self.counter_block_size = max(1, int(counter_block_size))
+
+    @abstractmethod
+    def create_engine(self) -> Engine:
+        """Create the engine with the connection pool and connection settings of the storage profile."""
+
+    @abstractmethod
+    def read_counters(self, session: Session) -> dict[str, int]:
+        """Get the last allocated value of all existing counters."""
+
+    @abstractmethod
+    def set_counter(self, session: Session, name: str, value: int) -> None:
+        """Create or reset a counter, so the next allocated value is value + 1."""
+
+    @abstractmethod
+    def allocate(self, session: Session, name: str, count: int = 1) -> Sequence[int]:
+        """Allocate count values of a counter within the session's transaction."""
+
+    @abstractmethod
+    def insert(self, session: Session, table: Table, rows: list[dict[str, Any]], columns: Sequence) -> list:
+        """Insert rows within the session's transaction and return the created rows as selected by columns."""
+
+    def add_project_stats(self, session: Session, deltas: dict[tuple[int, str, str], int]) -> None:
+        """
+        Add deltas to task counts of projects within the session's transaction, keyed by project id, kind and key.
+        Missing counts are created. Counts are updated in key order, so concurrent transactions lock them in the same
+        order.
+        """
+
+        rows = [{'project_id': project_id, 'kind': kind, 'key': key, 'count': delta}
+                for (project_id, kind, key), delta in sorted(deltas.items()) if delta]
+        if rows:
+            session.execute(_ADD_PROJECT_STATS, rows)
+
+    @abstractmethod
+    def search(self, session: Session, terms: list[tuple[str, bool]], conditions: Sequence,
+               after: tuple[float, int] | None, limit: int, columns: Sequence) -> list:
+        """
+        Full-text search over task titles and descriptions. Returns up to limit rows of columns followed by the score,
+        ordered by score (best first) and task id. Terms are pairs of a word and whether it matches as prefix, all of
+        them have to match. Pass the score and task id of the last returned row as after to get the next page.
+        """
+
+    @staticmethod
+    def _page(ranked, after: tuple[float, int] | None, limit: int, columns: Sequence):
+        """Keyset page over a subquery of ranked tasks (columns, task id and score)."""
+
+        ranked = ranked.subquery()
+        query = select(*(ranked.c[c.key] for c in columns), ranked.c.score)
+
+        if after is not None:
+            score, task_id = after
+            query = query.where(or_(ranked.c.score > score, (ranked.c.score == score) & (ranked.c.id > task_id)))
+
+        return query.order_by(ranked.c.score, ranked.c.id).limit(limit)
+
+    def build_search_index(self, session: Session, chunk_size: int) -> bool:
+        """Index the next chunk of tasks that existed before the search index. Returns True once all are indexed."""
+        return True
+
+    def drop_all(self, engine: Engine) -> None:
+        """Drop all tables and counters of the bot."""
+        ORM_BASE.metadata.drop_all(engine)
+
+
+class SQLiteBackend(StorageBackend):
+    name = 'sqlite'
+
+    def create_engine(self) -> Engine:
+        """
+        Create an engine with a pool of connections that stay open. SQLAlchemy 1.4 opens a new connection for every
+        session of a file database by default, which costs a file open and all pragmas on every call.
+        """
+
+        config = self.config
+        engine = create_engine(config.url, poolclass=QueuePool, pool_size=config.pool_size,
+                               max_overflow=config.max_overflow, pool_timeout=config.pool_timeout,
+                               connect_args={'check_same_thread': False})
+        pragmas = config.pragmas()
+
+        @event.listens_for(engine, 'connect')
+        def apply_pragmas(dbapi_connection, connection_record) -> None:
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        return engine
+
+    def read_counters(self, session: Session) -> dict[str, int]:
+        counters = {}
+
+        for name, value in session.execute(select(ORM_Value.name, ORM_Value.value)):
+            if name == "PROJECT_ID_COUNT" or name.isdigit():
+                try:
+                    counters[name] = int(value)
+                except ValueError:
+                    pass
+
+        return counters
+
+    def set_counter(self, session: Session, name: str, value: int) -> None:
+        session.merge(ORM_Value(name=str(name), value=str(int(value))))
+
+    def allocate(self, session: Session, name: str, count: int = 1) -> Sequence[int]:
+        """
+        The increment is a single UPDATE, which holds the database write lock until the transaction ends. Allocations
+        are therefore atomic across threads and processes and roll back together with the rows that use them.
+        """
+
+        values = ORM_Value.__table__
+
+        session.execute(values.update()
+                        .where(values.c.name == name)
+                        .values(value=cast(cast(values.c.value, Integer) + count, String)))
+        last_value = int(session.execute(select(values.c.value).where(values.c.name == name)).scalar_one())
+
+        return range(last_value - count + 1, last_value + 1)
+
+    def insert(self, session: Session, table: Table, rows: list[dict[str, Any]], columns: Sequence) -> list:
+        """
+        SQLAlchemy 1.4 doesn't support RETURNING on SQLite: the rows are inserted with one executemany and read back.
+        The transaction holds the write lock from the first insert on and new rowids are max(rowid) + 1, so the
+        len(rows) highest primary keys are the inserted rows.
+        """
+
+        primary_key = table.primary_key.columns[0]
+
+        session.execute(table.insert(), rows)
+        created = session.execute(select(*columns).order_by(primary_key.desc()).limit(len(rows))).all()
+
+        return created[::-1]
+
+    def search(self, session: Session, terms: list[tuple[str, bool]], conditions: Sequence,
+               after: tuple[float, int] | None, limit: int, columns: Sequence) -> list:
+        """The FTS5 rank is bm25, which is negative and lower for better matches."""
+
+        match = ' '.join(f'"{word}"' + ('*' if prefix else '') for word, prefix in terms)
+        ranked = (select(*columns, literal_column('tasks_fts.rank').label('score'))
+                  .select_from(_TASKS_FTS.join(ORM_Task.__table__, _TASKS_FTS.c.rowid == ORM_Task.id))
+                  .where(text("tasks_fts MATCH :match").bindparams(match=match), *conditions))
+
+        return session.execute(self._page(ranked, after, limit, columns)).all()
+
+    def build_search_index(self, session: Session, chunk_size: int) -> bool:
+        """
+        Tasks are indexed in ascending id order, the progress value marks the last indexed id. Taking the write lock
+        first keeps concurrent chunks (e.g. of other shard processes) and task updates from interleaving.
+        """
+
+        values = ORM_Value.__table__
+        progress = values.c.name == SEARCH_INDEX_PROGRESS_NAME
+
+        session.execute(values.update().where(progress).values(value=values.c.value))
+        stored = dict(session.execute(select(values.c.name, values.c.value).where(
+            values.c.name.in_([SEARCH_INDEX_PROGRESS_NAME, SEARCH_INDEX_END_NAME]))).all())
+
+        first_id = int(stored.get(SEARCH_INDEX_PROGRESS_NAME, 0))
+        end_id = int(stored.get(SEARCH_INDEX_END_NAME, 0))
+        if first_id >= end_id:
+            return True
+
+        last_id = min(first_id + chunk_size, end_id)
+        session.execute(text("INSERT INTO tasks_fts(rowid, title, description) "
+                             "SELECT id, title, description FROM tasks WHERE id > :first AND id <= :last"),
+                        {'first': first_id, 'last': last_id})
+
+        # once done, all ids are indexed by the triggers: ids <= 0 or > 0
+        if last_id == end_id:
+            session.execute(values.update().where(values.c.name.in_([SEARCH_INDEX_PROGRESS_NAME,
+                                                                     SEARCH_INDEX_END_NAME])).values(value='0'))
+            return True
+
+        session.execute(values.update().where(progress).values(value=str(last_id)))
+        return False
+
+    def drop_all(self, engine: Engine) -> None:
+        super().drop_all(engine)
+
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS tasks_fts"))
+
+
+class PostgreSQLBackend(StorageBackend):
+    name = 'postgresql'
+    sequence_counters = True
+
+    def create_engine(self) -> Engine:
+        """
+        Create an engine with a bounded connection pool. Idle connections are reused most recent first, so surplus
+        connections idle long enough to be recycled, and checked before use, so a restarted server doesn't fail calls.
+        """
+
+        config = self.config
+
+        try:
+            return create_engine(config.url, pool_size=config.pool_size, max_overflow=config.max_overflow,
+                                 pool_timeout=config.pool_timeout, pool_recycle=config.pool_recycle,
+                                 pool_pre_ping=True, pool_use_lifo=True,
+                                 connect_args={'application_name': 'discord-taskbot'})
+        except ModuleNotFoundError as e:
+            raise InvalidConfiguration(f"The PostgreSQL backend requires '{e.name}', "
+                                       f"install discord_taskbot[postgresql].") from None
+
+    @staticmethod
+    def _sequence(name: str) -> str:
+        """Name of a counter's sequence, e.g. counter_project_id_count or counter_12."""
+
+        if not re.fullmatch(r'\w+', name, re.ASCII):
+            raise ValueError(f"Invalid counter name '{name}'.")
+        return f"counter_{name.lower()}"
+
+    def read_counters(self, session: Session) -> dict[str, int]:
+        rows = session.execute(text(
+            "SELECT sequencename, last_value FROM pg_sequences "
+            "WHERE schemaname = current_schema() AND sequencename LIKE 'counter\\_%'"))
+
+        # sequences that never handed out a value have no last value
+        return {name[len('counter_'):].upper(): int(value or 0) for name, value in rows}
+
+    def set_counter(self, session: Session, name: str, value: int) -> None:
+        """Sequences cache counter_block_size values per connection. Creating a sequence is transactional."""
+
+        sequence = self._sequence(name)
+        value = int(value)
+
+        session.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {sequence} CACHE {self.counter_block_size}"))
+        session.execute(select(func.setval(sequence, max(1, value), value > 0)))
+
+    def allocate(self, session: Session, name: str, count: int = 1) -> Sequence[int]:
+        """
+        Sequences never block concurrent writers, but their values are not rolled back: a failed insert leaves a gap
+        in the task numbers. Values of a multi-value allocation are not consecutive if other connections allocate
+        values of the same counter at the same time.
+        """
+
+        sequence = self._sequence(name)
+
+        if count == 1:
+            return [session.execute(select(func.nextval(sequence))).scalar_one()]
+
+        return session.execute(select(func.nextval(sequence))
+                               .select_from(func.generate_series(1, count))).scalars().all()
+
+    def insert(self, session: Session, table: Table, rows: list[dict[str, Any]], columns: Sequence) -> list:
+        created = []
+
+        for i in range(0, len(rows), _INSERT_CHUNK_SIZE):
+            created.extend(session.execute(insert(table).values(rows[i:i + _INSERT_CHUNK_SIZE]).returning(*columns)))
+
+        return created
+
+    def search(self, session: Session, terms: list[tuple[str, bool]], conditions: Sequence,
+               after: tuple[float, int] | None, limit: int, columns: Sequence) -> list:
+        """
+        Matches use the GIN index over the weighted search document, the score is the negated ts_rank, so lower is
+        better like on SQLite. ts_rank is a real, which is read back rounded; as double it round-trips in cursors.
+        """
+
+        vector = literal_column(f"({POSTGRESQL_SEARCH_VECTOR})")
+        query = func.to_tsquery(literal_column("'simple'"),
+                                ' & '.join(f"'{word}'" + (':*' if prefix else '') for word, prefix in terms))
+        ranked = (select(*columns, cast(-func.ts_rank(vector, query), Float(53)).label('score'))
+                  .where(vector.op('@@')(query), *conditions))
+
+        return session.execute(self._page(ranked, after, limit, columns)).all()
+
+    def drop_all(self, engine: Engine) -> None:
+        super().drop_all(engine)
+
+        with Session(engine) as session:
+            for name in self.read_counters(session):
+                session.execute(text(f"DROP SEQUENCE IF EXISTS {self._sequence(name)}"))
+            session.commit()
+
+
+# external content FTS5 table over task titles and descriptions, see migrations
+_TASKS_FTS = table('tasks_fts', column('rowid'))
+
+_BACKENDS = {backend.name: backend for backend in (SQLiteBackend, PostgreSQLBackend)}
+
+
+def create_backend(config: StorageConfig, counter_block_size: int = 1) -> StorageBackend:
+    """Get the backend of a storage profile's database URL."""
+    return _BACKENDS[config.backend](config, counter_block_size)
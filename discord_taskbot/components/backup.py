@@ -0,0 +1,160 @@
+"""
+Online snapshots of the SQLite database.
+"""
+
+import os
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .config import BackupConfig
+from .exceptions import BackupFailed
+
+__all__ = ['create_snapshot', 'check_snapshot', 'list_snapshots', 'rotate_snapshots']
+
+# restarts of a stepped backup (caused by concurrent commits) before the backup is given up
+MAX_BACKUP_RESTARTS = 3
+
+
+class _BackupRestarted(Exception):
+    """A stepped backup has been restarted too often."""
+
+
+def _snapshot_prefix(database: str) -> str:
+    return f"{Path(database).stem}-"
+
+
+def create_snapshot(database: str, config: BackupConfig) -> Path:
+    """
+    Copy a (running) database into a new snapshot file in the backup directory and check the snapshot's integrity.
+    Returns the path of the snapshot.
+
+    The database is copied with SQLite's online backup in steps of config.pages pages with a short pause between
+    the steps, so other connections are never locked out for longer than one step. In WAL mode, the copy reads from a
+    single read transaction: writers are not blocked at all and concurrent commits don't restart the backup.
+    In other journal modes, every commit of another connection restarts the copy. After MAX_BACKUP_RESTARTS
+    restarts, the backup fails with BackupFailed instead of copying the database in a single step, which would block
+    writers for the duration of the copy; a periodic backup tries again in its next interval.
+    """
+
+    if not Path(database).is_file():
+        raise BackupFailed(f"Database '{database}' does not exist.")
+
+    directory = Path(config.directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+    snapshot = directory / f"{_snapshot_prefix(database)}{timestamp}.db"
+    partial = snapshot.with_suffix('.db.part')
+
+    source = sqlite3.connect(database, isolation_level=None)
+    target = sqlite3.connect(partial)
+
+    try:
+        wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal'
+
+        if wal:
+            # pin a snapshot of the database for the whole copy
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+
+        restarts = 0
+        last_remaining = None
+
+        def pause(status: int, remaining: int, total: int) -> None:
+            nonlocal restarts, last_remaining
+
+            # a restarted backup has more pages left than after the previous step
+            if last_remaining is not None and remaining > last_remaining:
+                restarts += 1
+                if restarts > MAX_BACKUP_RESTARTS:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+
+            if remaining and config.step_sleep:
+                time.sleep(config.step_sleep)
+
+        source.backup(target, pages=config.pages, progress=pause)
+
+        if wal:
+            source.execute("COMMIT")
+
+    except _BackupRestarted:
+        target.close()
+        partial.unlink(missing_ok=True)
+        raise BackupFailed(f"Backup of '{database}' failed: concurrent writes restarted it more than "
+                           f"{MAX_BACKUP_RESTARTS} times.") from None
+
+    except sqlite3.Error as e:
+        target.close()
+        partial.unlink(missing_ok=True)
+        raise BackupFailed(f"Backup of '{database}' failed: {e}") from e
+
+    finally:
+        source.close()
+
+    target.close()
+
+    try:
+        check_snapshot(partial)
+    except BackupFailed:
+        partial.unlink(missing_ok=True)
+        raise
+
+    # only complete and checked snapshots get their final name
+    os.replace(partial, snapshot)
+    return snapshot
+
+
+def check_snapshot(snapshot: str | Path) -> None:
+    """Run an integrity check on a snapshot. Raises BackupFailed if it is damaged."""
+
+    connection = sqlite3.connect(f"file:{Path(snapshot).resolve()}?mode=ro", uri=True)
+    try:
+        result = [row[0] for row in connection.execute("PRAGMA integrity_check")]
+    except sqlite3.Error as e:
+        raise BackupFailed(f"Snapshot '{snapshot}' can't be checked: {e}") from e
+    finally:
+        connection.close()
+
+    if result != ['ok']:
+        raise BackupFailed(f"Snapshot '{snapshot}' failed the integrity check: {'; '.join(result[:5])}")
+
+
+def list_snapshots(database: str, config: BackupConfig) -> list[Path]:
+    """Get all snapshots of a database, from oldest to newest."""
+
+    directory = Path(config.directory)
+    if not directory.is_dir():
+        return []
+
+    # snapshot names end with their creation time, so they sort chronologically
+    return sorted(directory.glob(f"{_snapshot_prefix(database)}*.db"))
+
+
+def rotate_snapshots(database: str, config: BackupConfig) -> list[Path]:
+    """
+    Delete snapshots beyond config.keep and older than config.max_age. The newest snapshot is always kept.
+    Returns the deleted snapshots.
+    """
+
+    snapshots = list_snapshots(database, config)
+    if not snapshots:
+        return []
+
+    *candidates, newest = snapshots
+    deleted = []
+
+    if config.keep:
+        excess = len(snapshots) - config.keep
+        deleted.extend(candidates[:max(0, excess)])
+
+    if config.max_age:
+        oldest_allowed = time.time() - config.max_age
+        deleted.extend(s for s in candidates if s not in deleted and s.stat().st_mtime < oldest_allowed)
+
+    for snapshot in deleted:
+        snapshot.unlink(missing_ok=True)
+
+    return deleted
@@ -2,55 +2,242 @@
 Persistence cache for faster data access.
 """
 
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
 from typing import Any
 
+__all__ = ['PersistenceCache', 'DEFAULT_NAMESPACE']
+
+DEFAULT_NAMESPACE = 'default'
+
+
+class _Namespace:
+    __slots__ = ('maxsize', 'ttl', 'entries', 'loads', 'hits', 'misses', 'evictions', 'expirations')
+
+    def __init__(self, maxsize: int | None, ttl: float | None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # {name: (value, expiry timestamp or None)}, ordered from least to most recently used
+        self.entries: OrderedDict[Hashable, tuple[Any, float | None]] = OrderedDict()
+
+        # names being loaded by get_or_load() {name: [number of loads, writes since the first load started]}
+        self.loads: dict[Hashable, list[int]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
 
 class PersistenceCache:
 
     def __init__(self) -> None:
         """
         Add and update cache variables to speed up data access times.
-        
+
         It's the programmer's responsibility to synchronize cache and persistent storage.
 
+        Values are stored in namespaces (e.g. counters, projects, tasks). Each namespace can be bounded to a maximum
+        number of entries, evicting the least recently used one first, and can expire entries after a time to live.
+        Namespaces without a bound keep all of their entries. All methods are thread-safe.
+
         Methods:
+            configure
             add
             get
+            get_or_load
+            set
             update
             remove
-        
+            clear
+            items
+            stats
+
         See the method docstrings for more explanation.
         """
 
-    def add(self, name: str, value: Any) -> None:
+        self._lock = threading.RLock()
+        self._namespaces: dict[str, _Namespace] = {}
+
+        self.configure(DEFAULT_NAMESPACE)
+
+    def configure(self, namespace: str, maxsize: int = None, ttl: float = None) -> None:
+        """
+        Create or reconfigure a namespace.
+        maxsize limits the number of entries (LRU eviction), ttl the seconds an entry stays valid.
+        """
+
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+
+            if ns is None:
+                self._namespaces[namespace] = _Namespace(maxsize, ttl)
+                return
+
+            ns.maxsize = maxsize
+            ns.ttl = ttl
+            self._evict(ns)
+
+    def _namespace(self, namespace: str) -> _Namespace:
+        try:
+            return self._namespaces[namespace]
+        except KeyError:
+            raise KeyError(f"Cache namespace '{namespace}' does not exist. Create it with configure().") from None
+
+    def _evict(self, ns: _Namespace) -> None:
+        """Remove least recently used entries until the namespace's bound is met."""
+        if ns.maxsize is None:
+            return
+
+        while len(ns.entries) > ns.maxsize:
+            ns.entries.popitem(last=False)
+            ns.evictions += 1
+
+    @staticmethod
+    def _written(ns: _Namespace, name: Hashable) -> None:
+        """Count a write of a name that is being loaded, so the loaded (older) value is not stored over it."""
+
+        load = ns.loads.get(name)
+        if load is not None:
+            load[1] += 1
+
+    def _store(self, ns: _Namespace, name: Hashable, value: Any) -> None:
+        self._written(ns, name)
+        expiry = time.monotonic() + ns.ttl if ns.ttl is not None else None
+
+        ns.entries[name] = (value, expiry)
+        ns.entries.move_to_end(name)
+        self._evict(ns)
+
+    def _lookup(self, ns: _Namespace, name: Hashable) -> tuple[bool, Any]:
+        """Get (found, value) of a valid entry, counting hits and misses. Expired entries are removed."""
+
+        entry = ns.entries.get(name)
+
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del ns.entries[name]
+            ns.expirations += 1
+            entry = None
+
+        if entry is None:
+            ns.misses += 1
+            return False, None
+
+        ns.entries.move_to_end(name)
+        ns.hits += 1
+        return True, entry[0]
+
+    def add(self, name: Hashable, value: Any, namespace: str = DEFAULT_NAMESPACE) -> None:
         """Add a new value to the cache."""
 
-        # ensure name of cache item is type string
-        # checks in other methods are not needed, as all of them check if the name (== string) exists
-        if not isinstance(name, str):
-            raise TypeError(f"Parameter type for 'name' is {type(name)} not str.")
+        with self._lock:
+            ns = self._namespace(namespace)
 
-        if name in vars(self):
-            raise AttributeError(
-                f"Attribute '{name}' already exists in cache. If you want to update it use .update(name, value).")
-        self.__setattr__(name, value)
+            if name in ns.entries:
+                raise AttributeError(
+                    f"Attribute '{name}' already exists in cache. If you want to update it use .update(name, value).")
 
-    def get(self, name: str) -> Any | None:
+            self._store(ns, name, value)
+
+    def get(self, name: Hashable, namespace: str = DEFAULT_NAMESPACE) -> Any | None:
         """Get a value from the cache. If it does not exist None is returned."""
+
+        with self._lock:
+            return self._lookup(self._namespace(namespace), name)[1]
+
+    def get_or_load(self, name: Hashable, loader: Callable[[], Any], namespace: str = DEFAULT_NAMESPACE) -> Any | None:
+        """
+        Get a value from the cache, or load and store it on a miss.
+        None results of the loader are returned but not stored. Neither are results of loads that a write of the same
+        name (e.g. a write-through after an update) happened during, as they may be older than the written value.
+        """
+
+        with self._lock:
+            ns = self._namespace(namespace)
+            found, value = self._lookup(ns, name)
+
+            if found:
+                return value
+
+            load = ns.loads.setdefault(name, [0, 0])
+            load[0] += 1
+            writes = load[1]
+
+        # load without holding the lock, loaders may do I/O
+        value = None
         try:
-            return self.__getattribute__(name)
-        except AttributeError:
-            return None
+            value = loader()
+        finally:
+            with self._lock:
+                if value is not None and load[1] == writes:
+                    self._store(ns, name, value)
+
+                load[0] -= 1
+                if not load[0]:
+                    del ns.loads[name]
 
-    def update(self, name: str, value: Any) -> None:
+        return value
+
+    def set(self, name: Hashable, value: Any, namespace: str = DEFAULT_NAMESPACE) -> None:
+        """Add or replace a value in the cache."""
+
+        with self._lock:
+            self._store(self._namespace(namespace), name, value)
+
+    def update(self, name: Hashable, value: Any, namespace: str = DEFAULT_NAMESPACE) -> None:
         """Update a value in the cache."""
 
-        if name not in vars(self):
-            raise AttributeError(
-                f"Attribute '{name}' does not exist in cache. Add new values with add() before updating them.")
-        self.__setattr__(name, value)
+        with self._lock:
+            ns = self._namespace(namespace)
+
+            if name not in ns.entries:
+                raise AttributeError(
+                    f"Attribute '{name}' does not exist in cache. Add new values with add() before updating them.")
 
-    def remove(self, name: str) -> None:
+            self._store(ns, name, value)
+
+    def remove(self, name: Hashable, namespace: str = DEFAULT_NAMESPACE) -> None:
         """Remove a value from the cache."""
-        if name in vars(self):
-            self.__delattr__(name)
+
+        with self._lock:
+            ns = self._namespace(namespace)
+            self._written(ns, name)
+            ns.entries.pop(name, None)
+
+    def clear(self, namespace: str = None) -> None:
+        """Remove all values of a namespace, or of all namespaces if none is given."""
+
+        with self._lock:
+            namespaces = [self._namespace(namespace)] if namespace is not None else self._namespaces.values()
+
+            for ns in namespaces:
+                ns.entries.clear()
+
+                for load in ns.loads.values():
+                    load[1] += 1
+
+    def items(self, namespace: str = DEFAULT_NAMESPACE) -> list[tuple[Hashable, Any]]:
+        """Get a snapshot of all valid (name, value) pairs of a namespace. Doesn't count as hits."""
+
+        with self._lock:
+            now = time.monotonic()
+            return [(name, value) for name, (value, expiry) in self._namespace(namespace).entries.items()
+                    if expiry is None or expiry > now]
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Get the size, hits, misses, evictions and expirations per namespace."""
+
+        with self._lock:
+            return {
+                name: {
+                    'size': len(ns.entries),
+                    'hits': ns.hits,
+                    'misses': ns.misses,
+                    'evictions': ns.evictions,
+                    'expirations': ns.expirations,
+                }
+                for name, ns in self._namespaces.items()
+            }
@@ -2,62 +2,460 @@
 Custom subclass of discord.Client.
 """
 
+import asyncio
+import time
 from typing import Any, Type
 
+import aiohttp
 import discord
 from discord import app_commands
 from discord import ui
 
-from discord_taskbot.components.exceptions import DiscordTBException, TaskDoesNotExist
-from discord_taskbot.components.data_classes import Task
-from discord_taskbot.utils.constants import DEFAULT_TASK_EMOJI_MAPPING, TASK_STATUS_MAPPING
-from .persistence import PersistenceAPI
-
-
-class TaskBot(discord.Client):
-    def __init__(self, *, intents: discord.Intents, **options: Any) -> None:
+from discord_taskbot.components.exceptions import DiscordTBException, TaskDoesNotExist, BackupFailed
+from discord_taskbot.components.data_classes import Project, Task
+from discord_taskbot.utils.constants import DEFAULT_TASK_EMOJI_MAPPING, TASK_STATUS_MAPPING, DEFAULT_RENDER_DELAY, \
+    DEFAULT_HANDLE_CACHE_SIZE, DEFAULT_SCHEDULER_CONCURRENCY, DEFAULT_SCHEDULER_QUEUE_SIZE, \
+    DEFAULT_TRANSFER_CHUNK_SIZE, DEFAULT_SEARCH_INDEX_CHUNK_SIZE, DEFAULT_SEARCH_INDEX_PAUSE, TASK_PAGE_SIZE, \
+    TASK_PAGE_ID_PREFIX, DEFAULT_BOARD_RENDER_DELAY, BOARD_MESSAGE_VALUE_PREFIX, MAX_BOARD_ASSIGNEES, \
+    DEFAULT_RECONCILE_CONCURRENCY, UNKNOWN_EMOJI_ERROR_CODE
+from .backup import create_snapshot, rotate_snapshots
+from .config import BackupConfig, MetricsConfig, ShardConfig
+from .handles import HandleCache
+from .logger import get_logger, bind_log_context
+from .metrics import MetricsServer
+from .persistence import PersistenceAPI, AsyncPersistenceAPI
+from .reconcile import ReactionReplay, reconcile_channels
+from .render import TaskRenderQueue, BoardRenderQueue
+from .scheduler import OutboundScheduler, Priority
+from .stats import BotStats
+
+logger = get_logger('client')
+
+
+class TaskCommandTree(app_commands.CommandTree):
+    """Command tree that measures the run time of every app command and logs it with the interaction's context."""
+
+    async def interaction_check(self, interaction: discord.Interaction, /) -> bool:
+        # the command runs in the same asyncio task, so its records get the interaction's context
+        bind_log_context(guild_id=interaction.guild_id, channel_id=interaction.channel_id,
+                         user_id=interaction.user.id, command=interaction.command and interaction.command.name)
+
+        if self.client.stats.enabled:
+            interaction.extras['started'] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError, /) -> None:
+        self.client.observe_command(interaction, interaction.command, 'error')
+        await super().on_error(interaction, error)
+
+
+class TaskBot(discord.AutoShardedClient):
+    def __init__(self, *, intents: discord.Intents, render_delay: float = DEFAULT_RENDER_DELAY,
+                 handle_cache_size: int = DEFAULT_HANDLE_CACHE_SIZE,
+                 scheduler_concurrency: int = DEFAULT_SCHEDULER_CONCURRENCY,
+                 scheduler_queue_size: int = DEFAULT_SCHEDULER_QUEUE_SIZE, defer_reaction_seeding: bool = False,
+                 backup_config: BackupConfig = None, metrics_config: MetricsConfig = None,
+                 shard_config: ShardConfig = None, board_render_delay: float = DEFAULT_BOARD_RENDER_DELAY,
+                 reconcile_concurrency: int = DEFAULT_RECONCILE_CONCURRENCY, **options: Any) -> None:
         """
-        A subclass of discord.Client.
+        A subclass of discord.AutoShardedClient.
         
         Primarily to add custom application commands, but it also provides method for modal generation
         and other higher-level methods for data manipulation.
 
         Attributes:
-            tree    Discord App-Command tree
-            db      Direct access to database API
+            tree            Discord App-Command tree
+            db              Direct access to the non-blocking database API
+            stats           Runtime counters, e.g. REST calls per handled event
+            render_queue    Debounced rendering of task messages and threads, see render_delay (seconds)
+            board_queue     Debounced rendering of project boards, see board_render_delay (seconds)
+            handles         LRU cache of channel, thread and message handles, see handle_cache_size
+            scheduler       Prioritized queue for Discord writes, see scheduler_concurrency and scheduler_queue_size
+
+            defer_reaction_seeding  Whether task action reactions are added after answering the creating interaction.
+            backup_config           Periodic database snapshots. If none given, it is read from the environment.
+            metrics_config          Instrumentation and metrics endpoint, read from the environment if none given.
+            shard_config            Shards run by this client, read from the environment if none given. A single
+                                    shard by default.
+            reconcile_concurrency   Number of project channels reconciled at the same time after startup, see
+                                    start_reconciliation().
         
         """
+        self.metrics_config = metrics_config or MetricsConfig.from_env()
+        self.stats = BotStats(enabled=self.metrics_config.enabled)
+
+        if self.stats.enabled:
+            options.setdefault('http_trace', self._create_http_trace())
+
+        self.shard_config = shard_config or ShardConfig.from_env()
+        options.setdefault('shard_count', self.shard_config.count)
+        options.setdefault('shard_ids', self.shard_config.ids)
+
         super().__init__(intents=intents, **options)
 
-        self.tree = app_commands.CommandTree(self)
+        self.tree = TaskCommandTree(self)
+
+        self._install_rest_call_hook()
+        self._metrics_server: MetricsServer | None = None
+
+        self.render_queue = TaskRenderQueue(self, render_delay)
+        self.board_queue = BoardRenderQueue(self, board_render_delay)
+        self.handles = HandleCache(self.stats, handle_cache_size)
+        self.scheduler = OutboundScheduler(self.stats, scheduler_concurrency, scheduler_queue_size)
+
+        self.defer_reaction_seeding = defer_reaction_seeding
+
+        # stored task action emojis that could not be added, replaced by their default emoji from now on
+        self._failed_task_emojis: set[str] = set()
 
-        # start and initialize the database
-        self.db = PersistenceAPI()
+        self.backup_config = backup_config or BackupConfig.from_env()
+        self._backup_task: asyncio.Task | None = None
+        self._search_index_task: asyncio.Task | None = None
+
+        self.reconcile_concurrency = reconcile_concurrency
+
+        # project channels that have been reconciled, or are being reconciled, since the start
+        self.reconciled_channels: set[int] = set()
+        self._reconcile_task: asyncio.Task | None = None
+        self._replay_reaction: ReactionReplay | None = None
+
+        # start and initialize the database, shards of a process only load the data of their guilds
+        guild_filter = self.shard_config.owns_guild if self.shard_config.partitioned else None
+        self.db = AsyncPersistenceAPI(PersistenceAPI(guild_filter=guild_filter), stats=self.stats)
         self.db.startup()
 
+        self.stats.add_gauge_collector(self._collect_gauges)
+
     async def setup_hook(self):
+        self.scheduler.start()
+
+        if self.stats.enabled and self.metrics_config.port:
+            self._metrics_server = MetricsServer(self.stats, self.metrics_config.host, self.metrics_config.port)
+            await self._metrics_server.start()
+
+        if self.backup_config.interval and self.db.api.config.backend != 'sqlite':
+            logger.warning("Periodic snapshots are only supported for SQLite databases, BACKUP_INTERVAL is ignored.")
+        elif self.backup_config.interval:
+            self._backup_task = asyncio.create_task(self._backup_periodically())
+
+        self._search_index_task = asyncio.create_task(self._build_search_index())
+
         await self.tree.sync()
 
-    async def send_new_task(self, channel: discord.TextChannel, task: Task) -> discord.Message:
-        """Send a new task into the specified channel. Return the message if successfull."""
+    async def close(self) -> None:
+        for task in (self._backup_task, self._search_index_task, self._reconcile_task):
+            if task:
+                task.cancel()
+
+        await self.render_queue.flush()
+        await self.board_queue.flush()
+        await self.scheduler.close()
+
+        if self._metrics_server:
+            await self._metrics_server.close()
+
+        await super().close()
+        self.db.close()
+
+    async def _run_event(self, coro: Any, event_name: str, *args: Any, **kwargs: Any) -> None:
+        # time every gateway event handler
+        if not self.stats.enabled:
+            return await super()._run_event(coro, event_name, *args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            await super()._run_event(coro, event_name, *args, **kwargs)
+        finally:
+            self.stats.observe('event_handler_seconds', time.perf_counter() - started, {'event': event_name})
+
+    async def on_app_command_completion(self, interaction: discord.Interaction,
+                                        command: app_commands.Command | app_commands.ContextMenu) -> None:
+        self.observe_command(interaction, command, 'ok')
+
+    def observe_command(self, interaction: discord.Interaction, command: Any, status: str) -> None:
+        """Add the run time of an app command, measured from the command tree's interaction check, to the stats."""
+
+        started = interaction.extras.get('started')
+        if started is None:
+            return
+
+        name = command.qualified_name if command else 'unknown'
+        self.stats.observe('command_seconds', time.perf_counter() - started, {'command': name, 'status': status})
+
+    def _collect_gauges(self) -> list[tuple[str, dict[str, str], float]]:
+        """Current cache, queue and render states for the metrics export."""
+
+        gauges = []
+
+        for namespace, values in self.db.api.cache_stats().items():
+            total = values['hits'] + values['misses']
+            gauges.append(('persistence_cache_entries', {'cache': namespace}, values['size']))
+            gauges.append(('persistence_cache_hit_rate', {'cache': namespace}, values['hits'] / total if total else 0))
+
+        gauges.append(('guilds', {}, len(self.guilds)))
+        gauges.append(('handle_cache_entries', {}, len(self.handles)))
+        gauges.append(('handle_cache_hit_rate', {}, self.stats.hit_rate('handle_cache')))
+        gauges.append(('render_pending', {}, self.render_queue.pending))
+        gauges.append(('board_render_pending', {}, self.board_queue.pending))
+
+        for priority, depth in self.scheduler.queue_depths().items():
+            gauges.append(('scheduler_queue_depth', {'priority': priority}, depth))
+
+        return gauges
+
+    def _create_http_trace(self) -> aiohttp.TraceConfig:
+        """Count every HTTP response by status, including rate limited attempts that discord.py retries itself."""
+
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_end(session: Any, context: Any, params: aiohttp.TraceRequestEndParams) -> None:
+            self.stats.count('http_responses', {'method': params.method, 'status': str(params.response.status)})
+
+        trace.on_request_end.append(on_request_end)
+        return trace
+
+    async def _backup_periodically(self) -> None:
+        """
+        Snapshot the database every backup_config.interval seconds and rotate old snapshots.
+        Updates the counters 'backup_snapshots' and 'backup_failures' of the stats.
+        """
+
+        database = self.db.api.config.path
+
+        while True:
+            await asyncio.sleep(self.backup_config.interval)
+
+            # the backup runs in its own thread, so it doesn't queue up behind the database executor
+            try:
+                await asyncio.to_thread(create_snapshot, database, self.backup_config)
+                await asyncio.to_thread(rotate_snapshots, database, self.backup_config)
+                self.stats.increment('backup_snapshots')
+            except BackupFailed as e:
+                self.stats.increment('backup_failures')
+                logger.warning("Periodic database snapshot failed (%s), trying again in the next interval.", e)
+            except Exception:
+                self.stats.increment('backup_failures')
+                logger.exception("Periodic database snapshot failed.")
+
+    async def _build_search_index(self) -> None:
+        """
+        Index tasks that existed before the search index in small chunks. Other database calls queue up behind one
+        chunk at most, so the bot stays responsive while the index of a large database is built.
+        """
+
+        started = time.perf_counter()
+        chunks = 0
+
+        try:
+            while not await self.db.build_search_index(DEFAULT_SEARCH_INDEX_CHUNK_SIZE):
+                chunks += 1
+                await asyncio.sleep(DEFAULT_SEARCH_INDEX_PAUSE)
+        except Exception:
+            logger.exception("Building the search index failed, it is continued on the next start.")
+            return
+
+        if chunks:
+            logger.info("Search index built.", extra={'chunks': chunks,
+                                                      'seconds': round(time.perf_counter() - started, 1)})
+
+    def start_reconciliation(self, replay_reaction: ReactionReplay) -> None:
+        """
+        Reconcile the task messages and threads of all project channels with the database in the background (see
+        reconcile_channels()). Reactions added while the bot was offline are passed to replay_reaction.
+        Only the first call of a process starts it, later ones (e.g. from on_ready after a reconnect) are ignored.
+        """
+
+        if self._reconcile_task is None:
+            self._replay_reaction = replay_reaction
+            self._reconcile_task = asyncio.create_task(reconcile_channels(self, replay_reaction,
+                                                                          self.reconcile_concurrency))
+
+    async def wait_until_reconciled(self) -> None:
+        """Wait until the startup reconciliation has finished. Returns at once if it has not been started."""
+        if self._reconcile_task:
+            await asyncio.shield(self._reconcile_task)
+
+    def _install_rest_call_hook(self) -> None:
+        """Count every REST request that goes through the HTTP client."""
+
+        request = self.http.request
+
+        async def counted_request(route: discord.http.Route, **kwargs: Any) -> Any:
+            self.stats.record_rest_call()
+
+            if not self.stats.enabled:
+                return await request(route, **kwargs)
+
+            labels = {'method': route.method, 'route': route.path, 'status': 'ok'}
+            started = time.perf_counter()
+            try:
+                return await request(route, **kwargs)
+            except discord.HTTPException as e:
+                labels['status'] = str(e.status)
+                raise
+            except Exception:
+                labels['status'] = 'error'
+                raise
+            finally:
+                self.stats.observe('rest_call_seconds', time.perf_counter() - started, {'route': route.path})
+                self.stats.count('rest_requests', labels)
+
+        self.http.request = counted_request
+
+    async def attach_guild(self, guild: discord.Guild, joined: bool = False) -> None:
+        """
+        Assign projects that don't know their guild yet to a guild that became available, if their channel belongs to
+        it. Joined guilds are loaded completely, as the data of a guild is evicted when the bot leaves it.
+        Boards of the guild's projects are refreshed, their counts may have changed while the bot was offline.
+        Assigned projects are reconciled if the startup reconciliation has skipped them.
+        """
+
+        unassigned = [c.id for c in guild.channels
+                      if (p := self.db.api.get_indexed_project(channel_id=c.id)) and not p.guild_id]
+
+        if joined or unassigned:
+            projects = await self.db.load_guild(guild.id, unassigned)
+            logger.debug("Guild loaded.", extra={'guild_id': guild.id, 'shard_id': guild.shard_id,
+                                                 'projects': len(projects)})
+
+        for p in await self.db.get_projects(guild_id=guild.id):
+            self.board_queue.mark_dirty(p.id)
+
+        # the startup reconciliation skips projects without a guild, catch up on them once they are assigned
+        if unassigned and self._replay_reaction:
+            assigned = [p for p in await self.db.get_projects(guild_id=guild.id) if p.channel_id in unassigned]
+            await reconcile_channels(self, self._replay_reaction, self.reconcile_concurrency, assigned)
+
+    async def detach_guild(self, guild: discord.Guild) -> None:
+        """Drop the in-memory data of a guild the bot has left. The stored data is kept in case it rejoins."""
+
+        await self.db.evict_guild(guild.id)
+        for channel in guild.channels:
+            self.handles.remove('channel', channel.id)
+
+        logger.debug("Guild evicted.", extra={'guild_id': guild.id, 'shard_id': guild.shard_id})
+
+    def get_channel_handle(self, channel_id: int, guild_id: int = None) -> discord.abc.Messageable:
+        """Get a channel handle from the handle cache or the gateway cache without any REST call."""
+
+        channel = self.handles.get('channel', channel_id)
+        if channel is None:
+            channel = self.get_channel(channel_id) or self.get_partial_messageable(channel_id, guild_id=guild_id)
+            self.handles.add('channel', channel_id, channel)
+
+        return channel
+
+    def get_partial_task_message(self, channel_id: int, message_id: int,
+                                 guild_id: int = None) -> discord.PartialMessage:
+        """Get a message handle that can be edited or reacted to without any REST call."""
+
+        message = self.handles.get('message', message_id)
+        if message is None:
+            message = self.get_channel_handle(channel_id, guild_id).get_partial_message(message_id)
+            self.handles.add('message', message_id, message)
+
+        return message
+
+    async def get_thread_handle(self, thread_id: int) -> discord.Thread:
+        """Get a thread from the handle cache or the gateway cache. Only fetched if neither knows the thread."""
+
+        thread = self.handles.get('thread', thread_id)
+        if thread is None:
+            thread = self.get_channel(thread_id) or await self.fetch_channel(thread_id)
+            self.handles.add('thread', thread_id, thread)
+
+        return thread
+
+    async def send_new_task(self, channel: discord.TextChannel, task: Task,
+                            seed_reactions: bool = True) -> discord.Message:
+        """
+        Send a new task into the specified channel. Return the message if successfull.
+        If seed_reactions is False, the task actions have to be added with seed_task_reactions().
+        """
 
         # TODO check if channel id is actually a project
         message: discord.Message = await channel.send(self.generate_task_string(task))
+        self.render_queue.remember_message(task)
+
+        if seed_reactions:
+            await self.seed_task_reactions(message)
 
-        task_emojis = self.db.get_task_action_emoji_mapping()
+        return message
 
+    async def publish_unposted_tasks(self, chunk_size: int = DEFAULT_TRANSFER_CHUNK_SIZE,
+                                     projects: list[Project] = None) -> int:
+        """
+        Send all tasks without a message (e.g. imported ones) of projects, or of all loaded projects, to their project
+        channels. Returns the number of sent tasks. Messages are sent with bulk priority, so interactions of a running
+        bot are not held back. Projects are published concurrently, the tasks of a project one after another in the
+        order of their numbers.
+        """
+
+        async def publish_project(project: Project) -> int:
+            # without a gateway cache (e.g. 'import --post') the handle only knows its guild if it is given
+            channel = self.get_channel_handle(project.channel_id, project.guild_id or None)
+            published = 0
+
+            while True:
+                # sent tasks don't match anymore, so the first page always holds the next unposted tasks
+                tasks = await self.db.get_tasks(project.id, limit=chunk_size, unposted=True)
+                if not tasks:
+                    return published
+
+                for t in tasks:
+                    message = await self.scheduler.run(Priority.BULK, ('channel', project.channel_id),
+                                                       self.send_new_task, channel, t, seed_reactions=False)
+                    await self.db.update_task(t.id, message_id=message.id)
+                    await self.seed_task_reactions(message, project.guild_id)
+                    published += 1
+
+        if projects is None:
+            projects = await self.db.get_projects()
+
+        counts = await asyncio.gather(*(publish_project(p) for p in projects))
+        return sum(counts)
+
+    async def seed_task_reactions(self, message: discord.Message, guild_id: int = None) -> None:
+        """
+        Add the task action reactions to a task message, with the emoji mapping of guild_id or else the message's
+        guild. All reactions are sent back to back as a single scheduled request, which keeps the emoji order.
+        """
+
+        if guild_id is None and message.guild:
+            guild_id = message.guild.id
+
+        task_emojis = await self.db.get_task_action_emoji_mapping(guild_id or None)
+        await self.scheduler.run(Priority.REACTION, ('channel', message.channel.id), self._add_task_reactions, message,
+                                 task_emojis)
+
+    async def _add_task_reactions(self, message: discord.Message, task_emojis: dict[str, str]) -> None:
         # add task actions to sent task; task actions are represented with reactions
         for id, emoji in task_emojis.items():
+            if emoji in self._failed_task_emojis:
+                await message.add_reaction(DEFAULT_TASK_EMOJI_MAPPING[id])
+                continue
+
             try:
                 await message.add_reaction(emoji)
             except Exception as e:
 
                 # use default emoji in case of an exception
-                # the most possible exception is that the emoji stored in the database has been deleted on the server
-                print("ERROR! {e} Using fallback emoji from default list.")
+                # if the emoji stored in the database has been deleted on the server, remember the emoji, so following
+                # tasks don't try it again; other errors (rate limits, outages, ...) may pass
+                logger.warning("Task emoji '%s' can't be added (%s), using the default emoji instead.", emoji, e,
+                               extra={'action': id})
+                if isinstance(e, discord.HTTPException) and e.code == UNKNOWN_EMOJI_ERROR_CODE:
+                    self._failed_task_emojis.add(emoji)
                 await message.add_reaction(DEFAULT_TASK_EMOJI_MAPPING[id])
 
-        return message
+    async def update_task_action_emoji(self, emoji_id: str, emoji: str, guild_id: int = 0) -> None:
+        """Update a task action emoji of a guild. Replaced and new emoji are tried again if they failed before."""
+
+        previous = (await self.db.get_task_action_emoji_mapping(guild_id or None)).get(emoji_id)
+        await self.db.update_task_action_emoji(emoji_id, emoji, guild_id)
+
+        self._failed_task_emojis.discard(previous)
+        self._failed_task_emojis.discard(emoji)
 
     def generate_create_task_modal(self, project: str, function) -> Type[ui.Modal]:
         """Generate a modal that creates a new task."""
@@ -103,7 +501,10 @@ class TaskBot(discord.Client):
         return EditTaskModal
 
     async def update_task_status(self, task_id: int, status_id: str) -> None:
-        """Update a task's status and update the message accordingly."""
+        """
+        Update a task's status and schedule the update of its message and thread.
+        Threads of finished tasks get locked, threads of other tasks get unlocked.
+        """
 
         # TODO validate task_id
 
@@ -111,28 +512,12 @@ class TaskBot(discord.Client):
             return
 
         try:
-            t = self.db.update_task(task_id, status=status_id)
+            t = await self.db.update_task(task_id, status=status_id)
         except DiscordTBException:
             return
 
-        p = self.db.get_project(project_id=t.related_project_id)
-        c: discord.TextChannel = await self.fetch_channel(p.channel_id)
-
-        if t.message_id != -1:
-            m = await c.fetch_message(t.message_id)
-            await m.edit(content=self.generate_task_string(t))
-
-        if t.has_thread:
-            thread = await self.fetch_channel(t.message_id)
-            await thread.edit(name=self.generate_task_thread_title(t))
-
-            if status_id != 'done':
-                if thread.archived or thread.locked:
-                    await self.set_thread_read_only_status(thread, False)
-
-            else:
-                if not thread.archived or not thread.locked:
-                    await self.set_thread_read_only_status(thread, True)
+        self.render_queue.mark_dirty(t.id)
+        self.board_queue.mark_dirty(t.related_project_id)
 
     async def set_thread_read_only_status(self, thread: discord.Thread, read_only: bool = False) -> None:
         """Lock/Unlock a thread for further interaction."""
@@ -162,27 +547,144 @@ class TaskBot(discord.Client):
         """Generate a string to use as a Discord thread title."""
         return f"[{task.number}{(', ' + TASK_STATUS_MAPPING[task.status]) if task.status else ''}] {task.title}"
 
+    async def generate_task_page(self, project: Project, status: str = None, assigned_to: int = None,
+                                 after_number: int = 0,
+                                 before_number: int = None) -> tuple[discord.Embed, ui.View]:
+        """
+        Generate a page of a project's task listing: an embed and a view with buttons to the previous and next page.
+        The buttons carry the page's filters and cursor in their custom id (see parse_task_page_id()), so the listing
+        keeps no state. The view is stopped and therefore not stored by discord.py, button presses go to on_interaction.
+        """
+
+        tasks = await self.db.get_tasks(project.id, after_number, TASK_PAGE_SIZE + 1, status=status,
+                                        assigned_to=assigned_to, before_number=before_number)
+
+        # one task more than a page tells if there is another page in the paging direction
+        if before_number is not None:
+            has_previous, has_next = len(tasks) > TASK_PAGE_SIZE, True
+            tasks = tasks[-TASK_PAGE_SIZE:]
+        else:
+            has_previous, has_next = after_number > 0, len(tasks) > TASK_PAGE_SIZE
+            tasks = tasks[:TASK_PAGE_SIZE]
+
+        lines = []
+        for t in tasks:
+            title = t.title if len(t.title) <= 80 else t.title[:79] + '…'
+            line = f"`#{t.number}` **{title}** · {TASK_STATUS_MAPPING.get(t.status, t.status)}"
+            if t.assigned_to and t.assigned_to != -1:
+                line += f" · <@{t.assigned_to}>"
+            if t.message_id != -1:
+                line += f" · [message](https://discord.com/channels/{project.guild_id}/{project.channel_id}/" \
+                        f"{t.message_id})"
+            lines.append(line)
+
+        embed = discord.Embed(title=f"Tasks of '{project.display_name}'",
+                              description='\n'.join(lines) or "No tasks found.")
+        filters = [f"status: {TASK_STATUS_MAPPING.get(status, status)}" if status else '',
+                   f"assigned to: {assigned_to}" if assigned_to is not None else '']
+        if any(filters):
+            embed.set_footer(text=', '.join(f for f in filters if f))
+
+        first = tasks[0].number if tasks else 0
+        last = tasks[-1].number if tasks else 0
+        page_id = f"{TASK_PAGE_ID_PREFIX}:{project.id}:{status or ''}:{assigned_to if assigned_to is not None else ''}"
+
+        view = ui.View(timeout=None)
+        view.add_item(ui.Button(label="Previous", custom_id=f"{page_id}:<{first}", disabled=not has_previous))
+        view.add_item(ui.Button(label="Next", custom_id=f"{page_id}:>{last}", disabled=not has_next))
+        view.stop()
+
+        return embed, view
+
+    @staticmethod
+    def parse_task_page_id(custom_id: str) -> tuple[int, str | None, int | None, int, int | None] | None:
+        """
+        Parse the custom id of a task listing button into project id, status, assignee, after_number and
+        before_number. Returns None if it is no task listing button.
+        """
+
+        parts = custom_id.split(':')
+        if len(parts) != 5 or parts[0] != TASK_PAGE_ID_PREFIX or parts[4][:1] not in ('<', '>'):
+            return None
+
+        try:
+            project_id = int(parts[1])
+            assigned_to = int(parts[3]) if parts[3] else None
+            number = int(parts[4][1:])
+        except ValueError:
+            return None
+
+        if parts[4][0] == '<':
+            return project_id, parts[2] or None, assigned_to, 0, number
+        return project_id, parts[2] or None, assigned_to, number, None
+
+    @staticmethod
+    def board_value_name(project_id: int) -> str:
+        """Name of the values table entry that stores the message id of a project's board."""
+        return f"{BOARD_MESSAGE_VALUE_PREFIX}{project_id}"
+
+    async def get_board_message_id(self, project_id: int) -> int | None:
+        """Get the message id of a project's board, None if it has none."""
+        value = await self.db.get_value(self.board_value_name(project_id))
+        return int(value) if value else None
+
+    async def generate_board_embed(self, project: Project) -> discord.Embed:
+        """Generate a project's board: its number of tasks per status and per assignee."""
+
+        counts = await self.db.get_project_stats(project.id)
+        total = sum(counts['status'].values())
+
+        statuses = '\n'.join(f"{TASK_STATUS_MAPPING.get(status, status)}: **{count}**"
+                              for status, count in counts['status'].items())
+
+        assignees = sorted(counts['assignee'].items(), key=lambda item: (-item[1], item[0]))
+        lines = [f"<@{user_id}>: **{count}**" for user_id, count in assignees[:MAX_BOARD_ASSIGNEES]]
+        if len(assignees) > MAX_BOARD_ASSIGNEES:
+            lines.append(f"{len(assignees) - MAX_BOARD_ASSIGNEES} more")
+        lines.append(f"Unassigned: **{total - sum(counts['assignee'].values())}**")
+
+        embed = discord.Embed(title=f"Board of '{project.display_name}'")
+        embed.add_field(name="Status", value=statuses, inline=True)
+        embed.add_field(name="Assignees", value='\n'.join(lines), inline=True)
+        embed.set_footer(text=f"{total} tasks")
+
+        return embed
+
+    async def post_board(self, project: Project, channel: discord.TextChannel) -> discord.Message:
+        """
+        Send a project's board into its channel, pin it and store its message id. A previous board of the project is
+        deleted. From now on, the board is edited when the project's task counts change.
+        """
+
+        old_message_id = await self.get_board_message_id(project.id)
+
+        embed = await self.generate_board_embed(project)
+        message = await self.scheduler.run(Priority.INTERACTION, ('channel', channel.id), channel.send, embed=embed)
+        await self.db.set_value(self.board_value_name(project.id), message.id)
+        self.board_queue.remember(project.id, embed)
+
+        await self.scheduler.run(Priority.INTERACTION, ('channel', channel.id), message.pin)
+
+        if old_message_id:
+            old_message = self.get_partial_task_message(channel.id, old_message_id)
+            await self.scheduler.enqueue(Priority.CLEANUP, ('channel', channel.id), old_message.delete)
+
+        return message
+
     async def update_task(self, task_id: int, name: str = None, description: str = None, status: str = None,
                           assigned_to: int = None, message_id: int = None, has_thread: bool = None) -> Task:
-        """Update a task and it's connected message content and thread title."""
+        """Update a task and schedule the update of its connected message content and thread title."""
 
         if (name, description, status, assigned_to, message_id, has_thread) == (None, None, None, None, None, None):
             return
 
         try:
-            t = self.db.update_task(task_id, name, description, status, assigned_to, message_id, has_thread)
+            t = await self.db.update_task(task_id, name, description, status, assigned_to, message_id, has_thread)
         except TaskDoesNotExist:
             return
 
-        p = self.db.get_project(project_id=t.related_project_id)
-
-        if t.message_id != -1:
-            task_channel: discord.TextChannel = await self.fetch_channel(p.channel_id)
-            m = await task_channel.fetch_message(t.message_id)
-            await m.edit(content=self.generate_task_string(t))
-
-        if t.has_thread:
-            task_thread = await self.fetch_channel(t.message_id)
-            await task_thread.edit(name=self.generate_task_thread_title(t))
+        self.render_queue.mark_dirty(t.id)
+        if status is not None or assigned_to is not None:
+            self.board_queue.mark_dirty(t.related_project_id)
 
         return t
@@ -0,0 +1,365 @@
+"""
+Configuration from environment variables (usually loaded from the .env file).
+"""
+
+from __future__ import annotations
+
+import os
+
+from .exceptions import InvalidConfiguration
+
+__all__ = ['StorageConfig', 'BackupConfig', 'MetricsConfig', 'LoggingConfig', 'ShardConfig']
+
+
+def _env_str(name: str, default: str) -> str:
+    value = os.getenv(name)
+    return value.strip() if value is not None and value.strip() else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = _env_str(name, str(default))
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidConfiguration(f"'{name}' has to be an integer, not '{value}'.") from None
+
+
+def _env_float(name: str, default: float) -> float:
+    value = _env_str(name, str(default))
+    try:
+        return float(value)
+    except ValueError:
+        raise InvalidConfiguration(f"'{name}' has to be a number, not '{value}'.") from None
+
+
+def _env_choice(name: str, default: str, choices: tuple[str, ...]) -> str:
+    value = _env_str(name, default).upper()
+    if value not in choices:
+        raise InvalidConfiguration(f"'{name}' has to be one of {' | '.join(choices)}, not '{value}'.")
+    return value
+
+
+class StorageConfig:
+    BACKENDS = ('sqlite', 'postgresql')
+    JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+    SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+    ECHO_MODES = ('FALSE', 'TRUE', 'DEBUG')
+
+    def __init__(self, path: str = 'data.db', echo: str = 'FALSE', journal_mode: str = 'WAL',
+                 synchronous: str = 'NORMAL', mmap_size: int = 0, cache_size: int = -2000,
+                 busy_timeout: int = 5000, url: str = '', pool_size: int = 5, max_overflow: int = 5,
+                 pool_timeout: float = 10.0, pool_recycle: float = 1800.0, workers: int = 1) -> None:
+        """
+        Storage profile.
+
+        Attributes:
+            path            SQLite database file path.                              DB_PATH
+            echo            SQL statement logging, FALSE, TRUE or DEBUG.            DB_ECHO
+            journal_mode    SQLite journal mode, e.g. WAL.                          DB_JOURNAL_MODE
+            synchronous     SQLite synchronous mode, e.g. NORMAL.                   DB_SYNCHRONOUS
+            mmap_size       Bytes of the database file mapped into memory.          DB_MMAP_SIZE
+            cache_size      SQLite page cache, pages or -KiB if negative.           DB_CACHE_SIZE
+            busy_timeout    Milliseconds to wait for a locked database.             DB_BUSY_TIMEOUT
+            url             Database URL, e.g. postgresql://user:pw@host/taskbot.   DB_URL
+                            Overrides path, empty for SQLite.
+            pool_size       Connections kept open in the pool.                      DB_POOL_SIZE
+            max_overflow    Connections opened on top of pool_size under load.      DB_POOL_MAX_OVERFLOW
+            pool_timeout    Seconds to wait for a free connection.                  DB_POOL_TIMEOUT
+            pool_recycle    Seconds after which connections are reopened.           DB_POOL_RECYCLE
+            workers         Threads running the bot's database calls.               DB_WORKERS
+                            More than 1 only helps backends with concurrent writers
+                            (PostgreSQL), calls may then complete out of order.
+
+        The environment variable names are listed on the right.
+        """
+
+        self.path = str(path)
+        self._url = str(url or '')
+        self.pool_size = max(1, int(pool_size))
+        self.max_overflow = max(0, int(max_overflow))
+        self.pool_timeout = max(0.0, float(pool_timeout))
+        self.pool_recycle = float(pool_recycle)
+        self.workers = max(1, int(workers))
+        self.echo = str(echo).upper()
+        self.journal_mode = str(journal_mode).upper()
+        self.synchronous = str(synchronous).upper()
+        self.mmap_size = int(mmap_size)
+        self.cache_size = int(cache_size)
+        self.busy_timeout = int(busy_timeout)
+
+        if self.echo not in self.ECHO_MODES:
+            raise InvalidConfiguration(f"Invalid echo mode '{self.echo}'.")
+
+        if self.journal_mode not in self.JOURNAL_MODES:
+            raise InvalidConfiguration(f"Invalid journal mode '{self.journal_mode}'.")
+
+        if self.synchronous not in self.SYNCHRONOUS_MODES:
+            raise InvalidConfiguration(f"Invalid synchronous mode '{self.synchronous}'.")
+
+        if self.backend not in self.BACKENDS:
+            raise InvalidConfiguration(f"Unsupported database '{self.backend}', "
+                                       f"use one of {' | '.join(self.BACKENDS)}.")
+
+    @staticmethod
+    def from_env() -> StorageConfig:
+        """Create a storage profile from environment variables. Unset variables use the defaults."""
+
+        return StorageConfig(
+            path=_env_str('DB_PATH', 'data.db'),
+            echo=_env_choice('DB_ECHO', 'FALSE', StorageConfig.ECHO_MODES),
+            journal_mode=_env_choice('DB_JOURNAL_MODE', 'WAL', StorageConfig.JOURNAL_MODES),
+            synchronous=_env_choice('DB_SYNCHRONOUS', 'NORMAL', StorageConfig.SYNCHRONOUS_MODES),
+            mmap_size=_env_int('DB_MMAP_SIZE', 0),
+            cache_size=_env_int('DB_CACHE_SIZE', -2000),
+            busy_timeout=_env_int('DB_BUSY_TIMEOUT', 5000),
+            url=_env_str('DB_URL', ''),
+            pool_size=_env_int('DB_POOL_SIZE', 5),
+            max_overflow=_env_int('DB_POOL_MAX_OVERFLOW', 5),
+            pool_timeout=_env_float('DB_POOL_TIMEOUT', 10.0),
+            pool_recycle=_env_float('DB_POOL_RECYCLE', 1800.0),
+            workers=_env_int('DB_WORKERS', 1),
+        )
+
+    @property
+    def url(self) -> str:
+        return self._url or f"sqlite:///{self.path}"
+
+    @property
+    def backend(self) -> str:
+        """Database of the URL without driver, e.g. postgresql for postgresql+psycopg2://..."""
+        return self.url.split(':', 1)[0].split('+', 1)[0].lower()
+
+    @property
+    def echo_level(self) -> str | None:
+        """Level of the sqlalchemy.engine logger, None if SQL statements are not logged."""
+        return {'FALSE': None, 'TRUE': 'INFO', 'DEBUG': 'DEBUG'}[self.echo]
+
+    def pragmas(self) -> list[str]:
+        """Get the PRAGMA statements that have to be executed on every SQLite connection."""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA cache_size={self.cache_size}",
+            f"PRAGMA busy_timeout={self.busy_timeout}",
+        ]
+
+
+class BackupConfig:
+
+    def __init__(self, directory: str = 'backups', keep: int = 7, max_age: float = 0.0, interval: float = 0.0,
+                 pages: int = 256, step_sleep: float = 0.005) -> None:
+        """
+        Snapshot profile of the online backup.
+
+        Attributes:
+            directory   Directory the snapshots are stored in.                          BACKUP_DIR
+            keep        Number of kept snapshots, 0 keeps all.                          BACKUP_KEEP
+            max_age     Seconds after which snapshots are deleted, 0 keeps all.         BACKUP_MAX_AGE (hours)
+            interval    Seconds between snapshots of a running bot, 0 disables them.    BACKUP_INTERVAL (minutes)
+            pages       Database pages copied per backup step.                          BACKUP_PAGES
+            step_sleep  Seconds to pause between two backup steps.                      BACKUP_STEP_SLEEP (ms)
+
+        The environment variable names (and their units) are listed on the right.
+        The newest snapshot is never deleted by rotation.
+        """
+
+        self.directory = str(directory)
+        self.keep = max(0, int(keep))
+        self.max_age = max(0.0, float(max_age))
+        self.interval = max(0.0, float(interval))
+        self.pages = max(1, int(pages))
+        self.step_sleep = max(0.0, float(step_sleep))
+
+    @staticmethod
+    def from_env() -> BackupConfig:
+        """Create a snapshot profile from environment variables. Unset variables use the defaults."""
+
+        return BackupConfig(
+            directory=_env_str('BACKUP_DIR', 'backups'),
+            keep=_env_int('BACKUP_KEEP', 7),
+            max_age=_env_float('BACKUP_MAX_AGE', 0.0) * 3600,
+            interval=_env_float('BACKUP_INTERVAL', 0.0) * 60,
+            pages=_env_int('BACKUP_PAGES', 256),
+            step_sleep=_env_float('BACKUP_STEP_SLEEP', 5.0) / 1000,
+        )
+
+
+class MetricsConfig:
+
+    def __init__(self, enabled: bool = False, host: str = '127.0.0.1', port: int = 9464) -> None:
+        """
+        Instrumentation profile.
+
+        Attributes:
+            enabled     Collect latency histograms and labeled counters.              METRICS_ENABLED
+            host        Interface of the metrics endpoint.                            METRICS_HOST
+            port        Port of the metrics endpoint, 0 disables the endpoint.        METRICS_PORT
+
+        The environment variable names are listed on the right.
+        """
+
+        self.enabled = bool(enabled)
+        self.host = str(host)
+        self.port = max(0, int(port))
+
+    @staticmethod
+    def from_env() -> MetricsConfig:
+        """Create an instrumentation profile from environment variables. Unset variables use the defaults."""
+
+        return MetricsConfig(
+            enabled=_env_choice('METRICS_ENABLED', 'FALSE', ('FALSE', 'TRUE')) == 'TRUE',
+            host=_env_str('METRICS_HOST', '127.0.0.1'),
+            port=_env_int('METRICS_PORT', 9464),
+        )
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+
+def _env_mapping(name: str) -> dict[str, str]:
+    """Parse 'key=value,key=value' from an environment variable."""
+
+    mapping = {}
+    for item in _env_str(name, '').split(','):
+        if not item.strip():
+            continue
+
+        key, sep, value = item.partition('=')
+        if not sep or not key.strip() or not value.strip():
+            raise InvalidConfiguration(f"'{name}' has to be a list of key=value pairs, not '{item}'.")
+
+        mapping[key.strip()] = value.strip()
+
+    return mapping
+
+
+class LoggingConfig:
+    LEVELS = ('CRITICAL', 'ERROR', 'WARNING', 'INFO', 'DEBUG')
+    FORMATS = ('JSON', 'TEXT')
+
+    def __init__(self, level: str = 'INFO', fmt: str = 'TEXT', file: str = None, levels: dict[str, str] = None,
+                 sample_rates: dict[str, float] = None) -> None:
+        """
+        Logging profile.
+
+        Attributes:
+            level           Level of all loggers without an own level.                  LOG_LEVEL
+            fmt             Record format, JSON (one object per line) or TEXT.          LOG_FORMAT
+            file            File the records are appended to, stderr if none given.     LOG_FILE
+            levels          Levels per component (logger name), e.g. discord=WARNING.  LOG_LEVELS
+            sample_rates    Share of records below WARNING that is kept per component,  LOG_SAMPLE_RATES
+                            e.g. taskbot.reactions=0.01.
+
+        The environment variable names are listed on the right. Mappings are written as key=value,key=value.
+        """
+
+        self.level = str(level).upper()
+        self.fmt = str(fmt).upper()
+        self.file = file or None
+        self.levels = {k: str(v).upper() for k, v in (levels or {}).items()}
+        self.sample_rates = {k: float(v) for k, v in (sample_rates or {}).items()}
+
+        for level in [self.level, *self.levels.values()]:
+            if level not in self.LEVELS:
+                raise InvalidConfiguration(f"Invalid log level '{level}'.")
+
+        if self.fmt not in self.FORMATS:
+            raise InvalidConfiguration(f"Invalid log format '{self.fmt}'.")
+
+        for component, rate in self.sample_rates.items():
+            if not 0.0 <= rate <= 1.0:
+                raise InvalidConfiguration(f"Sample rate of '{component}' has to be between 0 and 1, not {rate}.")
+
+    @staticmethod
+    def from_env() -> LoggingConfig:
+        """Create a logging profile from environment variables. Unset variables use the defaults."""
+
+        sample_rates = _env_mapping('LOG_SAMPLE_RATES')
+        for component, rate in sample_rates.items():
+            try:
+                sample_rates[component] = float(rate)
+            except ValueError:
+                raise InvalidConfiguration(f"Sample rate of '{component}' has to be a number, not '{rate}'.") from None
+
+        return LoggingConfig(
+            level=_env_choice('LOG_LEVEL', 'INFO', LoggingConfig.LEVELS),
+            fmt=_env_choice('LOG_FORMAT', 'TEXT', LoggingConfig.FORMATS),
+            file=_env_str('LOG_FILE', '') or None,
+            levels=_env_mapping('LOG_LEVELS'),
+            sample_rates=sample_rates,
+        )
+
+
+def _env_id_list(name: str) -> list[int] | None:
+    """Parse a list of integers and ranges like '0,2-3' from an environment variable. None if unset."""
+
+    value = _env_str(name, '')
+    if not value:
+        return None
+
+    ids = []
+    try:
+        for item in filter(None, (i.strip() for i in value.split(','))):
+            first, _, last = item.partition('-')
+            ids.extend(range(int(first), int(last or first) + 1))
+    except ValueError:
+        raise InvalidConfiguration(f"'{name}' has to be a list of integers and ranges (e.g. 0,2-3), "
+                                   f"not '{value}'.") from None
+
+    return ids
+
+
+class ShardConfig:
+
+    def __init__(self, count: int | None = 1, ids: list[int] = None) -> None:
+        """
+        Gateway sharding profile.
+
+        Attributes:
+            count   Total number of shards, None to use the number recommended by Discord.   SHARD_COUNT
+            ids     Shards run by this process, all shards if none given.                     SHARD_IDS
+
+        The environment variable names are listed on the right. SHARD_COUNT is a number or AUTO, SHARD_IDS a list of
+        shard ids and ranges, e.g. 0,2-3. Shards can be split over several processes that share the storage, each
+        with the same count and its own ids. A process only loads the data of its shards' guilds.
+        """
+
+        self.count = int(count) if count is not None else None
+        self.ids = sorted(set(ids)) if ids else None
+
+        if self.count is not None and self.count < 1:
+            raise InvalidConfiguration(f"Shard count has to be at least 1, not {self.count}.")
+
+        if self.ids is not None:
+            if self.count is None:
+                raise InvalidConfiguration("Shard ids require a shard count.")
+
+            if self.ids[0] < 0 or self.ids[-1] >= self.count:
+                raise InvalidConfiguration(f"Shard ids have to be between 0 and {self.count - 1}.")
+
+    @staticmethod
+    def from_env() -> ShardConfig:
+        """Create a sharding profile from environment variables. Unset variables use the defaults."""
+
+        count = _env_str('SHARD_COUNT', '1')
+        if count.upper() == 'AUTO':
+            count = None
+        else:
+            count = _env_int('SHARD_COUNT', 1)
+
+        return ShardConfig(count=count, ids=_env_id_list('SHARD_IDS'))
+
+    @property
+    def partitioned(self) -> bool:
+        """Whether this process runs only a part of the shards."""
+        return self.ids is not None and len(self.ids) < self.count
+
+    def shard_id(self, guild_id: int) -> int:
+        """Shard that receives the events of a guild."""
+        return (int(guild_id) >> 22) % (self.count or 1)
+
+    def owns_guild(self, guild_id: int) -> bool:
+        """Whether the events of a guild are received by a shard of this process."""
+        return not self.partitioned or self.shard_id(guild_id) in self.ids
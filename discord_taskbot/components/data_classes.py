@@ -4,31 +4,83 @@ ORM models as normal classes.
 
 from __future__ import annotations
 
+from collections.abc import Iterable
+from typing import Any
+
 from .models import ORM_Project, ORM_Task, ORM_Value, ORM_Emoji
 
 __all__ = ['Project', 'Task', 'Value', 'Emoji']
 
 
 class Data:
+    __slots__ = ()
+
+    # ORM columns in slot order, used to select rows for from_rows()
+    _orm_columns: tuple = ()
 
     def __init__(self) -> None:
-        """Base class for data classes."""
+        """
+        Base class for data classes.
+
+        Data classes are immutable records with __slots__. The constructor validates and casts every value.
+        Values from trusted sources (the database) skip validation through from_orm() and from_rows().
+        """
+
+    def _set_values(self, values: Iterable[Any]) -> None:
+        for slot, value in zip(self.__slots__, values):
+            object.__setattr__(self, slot, value)
+
+    @classmethod
+    def _make(cls, values: Iterable[Any]) -> Any:
+        """Create an instance from trusted values in slot order without validation."""
+        instance = object.__new__(cls)
+        instance._set_values(values)
+        return instance
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Iterable[Any]]) -> list:
+        """Create instances from result rows of a select over orm_columns()."""
+        make = cls._make
+        return [make(row) for row in rows]
+
+    @classmethod
+    def orm_columns(cls) -> tuple:
+        """Get the ORM columns in the order from_rows() expects them."""
+        return cls._orm_columns
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __reduce__(self) -> tuple:
+        return type(self)._make, (self._values(),)
 
     def __repr__(self) -> str:
         """Generates string representation."""
-        values = [f"{k[1:]}:{v}" for k, v in vars(self).items()]
+        values = [f"{k[1:]}:{getattr(self, k)}" for k in self.__slots__]
         return f"{type(self).__name__} ({', '.join(values)})"
 
 
 class Project(Data):
+    __slots__ = ('_tag', '_id', '_display_name', '_description', '_channel_id', '_guild_id')
+
+    _orm_columns = (ORM_Project.tag, ORM_Project.id, ORM_Project.display_name, ORM_Project.description,
+                    ORM_Project.channel_id, ORM_Project.guild_id)
+
     _tag: str
     _id: int
     _display_name: str
     _description: str
     _channel_id: int
+    _guild_id: int
 
     def __init__(self, tag: str = None, project_id: int = None, display_name: str = None, description: str = None,
-                 channel_id: int = None) -> None:
+                 channel_id: int = None, guild_id: int = None) -> None:
         """
         Project information.
 
@@ -38,13 +90,17 @@ class Project(Data):
             display_name    Project display name.
             description     Project description.
             channel_id      Discord channel id for this project.
+            guild_id        Discord guild id of the project's channel. 0 if not known yet.
         """
 
-        self._tag = str(tag).strip() if tag is not None else None
-        self._id = int(project_id) if project_id is not None else None
-        self._display_name = str(display_name).strip() if display_name is not None else None
-        self._description = str(description).strip() if description is not None else None
-        self._channel_id = int(channel_id) if channel_id is not None else None
+        self._set_values((
+            str(tag).strip() if tag is not None else None,
+            int(project_id) if project_id is not None else None,
+            str(display_name).strip() if display_name is not None else None,
+            str(description).strip() if description is not None else None,
+            int(channel_id) if channel_id is not None else None,
+            int(guild_id) if guild_id is not None else None,
+        ))
 
         super().__init__()
 
@@ -55,8 +111,8 @@ class Project(Data):
         if not isinstance(orm_project, ORM_Project):
             raise TypeError(f"Passed project is type {type(orm_project)} not ORM_Project.")
 
-        return Project(orm_project.tag, orm_project.id, orm_project.display_name, orm_project.description,
-                       orm_project.channel_id)
+        return Project._make((orm_project.tag, orm_project.id, orm_project.display_name, orm_project.description,
+                              orm_project.channel_id, orm_project.guild_id))
 
     @property
     def tag(self) -> str:
@@ -78,8 +134,18 @@ class Project(Data):
     def channel_id(self) -> int:
         return self._channel_id
 
+    @property
+    def guild_id(self) -> int:
+        return self._guild_id
+
 
 class Task(Data):
+    __slots__ = ('_id', '_related_project_id', '_number', '_title', '_description', '_status', '_assigned_to',
+                 '_message_id', '_has_thread')
+
+    _orm_columns = (ORM_Task.id, ORM_Task.related_project_id, ORM_Task.number, ORM_Task.title, ORM_Task.description,
+                    ORM_Task.status, ORM_Task.assigned_to, ORM_Task.message_id, ORM_Task.has_thread)
+
     _id: int
     _related_project_id: int
     _number: int
@@ -109,15 +175,17 @@ class Task(Data):
                                 A thread's channel id equals its origin message id
         """
 
-        self._id = int(task_id) if task_id is not None else None
-        self._related_project_id = int(related_project_id) if related_project_id is not None else None
-        self._number = int(number) if number is not None else None
-        self._title = str(title).strip() if title is not None else None
-        self._description = str(description).strip() if description is not None else None
-        self._status = str(status).strip() if status is not None else None
-        self._assigned_to = int(assigned_to) if assigned_to is not None else None
-        self._message_id = int(message_id) if message_id is not None else None
-        self._has_thread = bool(has_thread) if has_thread is not None else None
+        self._set_values((
+            int(task_id) if task_id is not None else None,
+            int(related_project_id) if related_project_id is not None else None,
+            int(number) if number is not None else None,
+            str(title).strip() if title is not None else None,
+            str(description).strip() if description is not None else None,
+            str(status).strip() if status is not None else None,
+            int(assigned_to) if assigned_to is not None else None,
+            int(message_id) if message_id is not None else None,
+            bool(has_thread) if has_thread is not None else None,
+        ))
 
         super().__init__()
 
@@ -128,8 +196,9 @@ class Task(Data):
         if not isinstance(orm_task, ORM_Task):
             raise TypeError(f"Passed project is type {type(orm_task)} not ORM_Task.")
 
-        return Task(orm_task.id, orm_task.related_project_id, orm_task.number, orm_task.title, orm_task.description,
-                    orm_task.status, orm_task.assigned_to, orm_task.message_id, orm_task.has_thread)
+        return Task._make((orm_task.id, orm_task.related_project_id, orm_task.number, orm_task.title,
+                           orm_task.description, orm_task.status, orm_task.assigned_to, orm_task.message_id,
+                           orm_task.has_thread))
 
     @property
     def id(self) -> int:
@@ -169,6 +238,10 @@ class Task(Data):
 
 
 class Value(Data):
+    __slots__ = ('_name', '_value')
+
+    _orm_columns = (ORM_Value.name, ORM_Value.value)
+
     _name: str
     _value: str
 
@@ -181,8 +254,10 @@ class Value(Data):
             value       The value itself.
         """
 
-        self._name = str(name).strip() if name is not None else None
-        self._value = str(value).strip() if value is not None else None
+        self._set_values((
+            str(name).strip() if name is not None else None,
+            str(value).strip() if value is not None else None,
+        ))
 
         super().__init__()
 
@@ -193,7 +268,7 @@ class Value(Data):
         if not isinstance(orm_value, ORM_Value):
             raise TypeError(f"Passed project is type {type(orm_value)} not ORM_Value.")
 
-        return Value(orm_value.name, orm_value.value)
+        return Value._make((orm_value.name, orm_value.value))
 
     @property
     def name(self) -> str:
@@ -205,6 +280,10 @@ class Value(Data):
 
 
 class Emoji(Data):
+    __slots__ = ('_id', '_emoji', '_position')
+
+    _orm_columns = (ORM_Emoji.id, ORM_Emoji.emoji, ORM_Emoji.position)
+
     _id: str
     _emoji: str
     _position: int
@@ -219,9 +298,11 @@ class Emoji(Data):
             position    Row position of emoji.
         """
 
-        self._id = str(emoji_id).strip() if emoji_id is not None else None
-        self._emoji = str(emoji).strip() if emoji is not None else None
-        self._position = int(position) if position is not None else None
+        self._set_values((
+            str(emoji_id).strip() if emoji_id is not None else None,
+            str(emoji).strip() if emoji is not None else None,
+            int(position) if position is not None else None,
+        ))
 
         super().__init__()
 
@@ -232,7 +313,7 @@ class Emoji(Data):
         if not isinstance(orm_emoji, ORM_Emoji):
             raise TypeError(f"Passed project is type {type(orm_emoji)} not ORM_Emoji.")
 
-        return Emoji(orm_emoji.id, orm_emoji.emoji, orm_emoji.position)
+        return Emoji._make((orm_emoji.id, orm_emoji.emoji, orm_emoji.position))
 
     @property
     def id(self) -> str:
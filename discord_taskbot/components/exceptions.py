@@ -29,3 +29,19 @@ class ProjectDoesNotExist(DiscordTBException):
 
 class TaskDoesNotExist(DiscordTBException):
     """Exception thrown when a task does not exist."""
+
+
+class InvalidConfiguration(DiscordTBException):
+    """Exception thrown when a configuration value is invalid."""
+
+
+class InvalidRecord(DiscordTBException):
+    """Exception thrown when an imported record is malformed or references an unknown project."""
+
+
+class BackupFailed(DiscordTBException):
+    """Exception thrown when a database snapshot could not be created or failed its integrity check."""
+
+
+class InvalidCursor(DiscordTBException):
+    """Exception thrown when a pagination cursor is malformed."""
@@ -0,0 +1,64 @@
+"""
+Bounded cache for Discord channel, thread and message handles.
+"""
+
+from collections import OrderedDict
+from typing import Any
+
+from .stats import BotStats
+
+__all__ = ['HandleCache']
+
+
+class HandleCache:
+
+    def __init__(self, stats: BotStats, maxsize: int) -> None:
+        """
+        LRU cache of Discord objects that can be used for REST calls without fetching them first.
+
+        Handles are stored by (kind, id), as a thread shares its id with the message it originates from.
+        Updates the counters 'handle_cache_hits', 'handle_cache_misses' and 'handle_cache_evictions' of the stats.
+
+        Attributes:
+            maxsize     Maximum number of stored handles. The least recently used handle is evicted first.
+        """
+
+        self._stats = stats
+        self._maxsize = max(1, int(maxsize))
+        self._handles: OrderedDict[tuple[str, int], Any] = OrderedDict()
+
+    @property
+    def maxsize(self) -> int:
+        return self._maxsize
+
+    def __len__(self) -> int:
+        return len(self._handles)
+
+    def get(self, kind: str, handle_id: int) -> Any | None:
+        """Get a handle. Returns None if it is not cached."""
+
+        key = (kind, handle_id)
+        handle = self._handles.get(key)
+
+        if handle is None:
+            self._stats.increment('handle_cache_misses')
+            return None
+
+        self._handles.move_to_end(key)
+        self._stats.increment('handle_cache_hits')
+        return handle
+
+    def add(self, kind: str, handle_id: int, handle: Any) -> None:
+        """Add or replace a handle."""
+
+        key = (kind, handle_id)
+        self._handles[key] = handle
+        self._handles.move_to_end(key)
+
+        while len(self._handles) > self._maxsize:
+            self._handles.popitem(last=False)
+            self._stats.increment('handle_cache_evictions')
+
+    def remove(self, kind: str, handle_id: int) -> None:
+        """Remove a handle, e.g. after the object has been deleted on Discord."""
+        self._handles.pop((kind, handle_id), None)
@@ -2,4 +2,192 @@
 Logging component.
 """
 
-# todo or not todo ¯\_(ツ)_/¯
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any
+
+from .config import LoggingConfig
+
+__all__ = ['get_logger', 'log_context', 'bind_log_context', 'setup_logging', 'shutdown_logging', 'JSONFormatter',
+           'TextFormatter', 'SamplingFilter']
+
+# parent logger of all bot components, e.g. taskbot.reactions
+ROOT_LOGGER = 'taskbot'
+
+# context fields (task_id, project_id, guild_id, ...) of the running task or thread
+_log_context: contextvars.ContextVar[dict[str, Any]] = contextvars.ContextVar('log_context', default={})
+
+# attributes every LogRecord has, everything else was passed as extra
+_RECORD_ATTRIBUTES = frozenset(logging.LogRecord('', 0, '', 0, '', (), None).__dict__) | {'message', 'asctime'}
+
+_listener: logging.handlers.QueueListener | None = None
+
+# whether shutdown_logging() is registered to run at exit
+_shutdown_registered = False
+
+
+def get_logger(component: str) -> logging.Logger:
+    """Get the logger of a bot component. Its level can be set with LOG_LEVELS, e.g. taskbot.reactions=DEBUG."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{component}")
+
+
+@contextmanager
+def log_context(**fields: Any) -> Iterator[None]:
+    """Add context fields (e.g. task_id, guild_id) to all records logged inside the block."""
+
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+
+def bind_log_context(**fields: Any) -> None:
+    """Add context fields to all records logged for the rest of the running asyncio task."""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def _record_fields(record: logging.LogRecord) -> dict[str, Any]:
+    """Context and extra fields of a record."""
+    return {k: v for k, v in record.__dict__.items() if k not in _RECORD_ATTRIBUTES and not k.startswith('_')}
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **_record_fields(record),
+        }
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = record.stack_info
+
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """Format records as human-readable lines with their context fields appended."""
+
+    def __init__(self) -> None:
+        super().__init__('%(asctime)s %(levelname)-8s %(name)s: %(message)s')
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        line = super().formatMessage(record)
+        fields = _record_fields(record)
+        if fields:
+            line += ' [' + ' '.join(f"{k}={v}" for k, v in fields.items()) + ']'
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a share of the records of high-volume components, e.g. {'taskbot.reactions': 0.01}.
+    Records of level WARNING and above are always kept. Rates apply to a logger and all of its children.
+    """
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        super().__init__()
+
+        # longest prefix first, so the most specific rate wins
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return rate >= 1.0 or random.random() < rate
+
+        return True
+
+
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler that attaches the caller's context fields and keeps exceptions as text."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # runs on the logging thread or task, formatting is left to the listener
+        record = logging.makeLogRecord(record.__dict__)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        for name, value in _log_context.get().items():
+            record.__dict__.setdefault(name, value)
+
+        return record
+
+
+def setup_logging(config: LoggingConfig = None) -> None:
+    """
+    Send all records through a queue to a listener thread that formats and writes them, so logging never blocks the
+    event loop on I/O. Replaces the handlers of the root logger. The configuration is read from the environment if
+    none given.
+    """
+
+    global _listener, _shutdown_registered
+
+    config = config or LoggingConfig.from_env()
+    shutdown_logging()
+
+    if config.file:
+        output = logging.FileHandler(config.file, encoding='utf-8')
+    else:
+        output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JSONFormatter() if config.fmt == 'JSON' else TextFormatter())
+
+    handler = _ContextQueueHandler(queue.SimpleQueue())
+    if config.sample_rates:
+        handler.addFilter(SamplingFilter(config.sample_rates))
+
+    root = logging.getLogger()
+    for h in root.handlers[:]:
+        root.removeHandler(h)
+    root.addHandler(handler)
+    root.setLevel(config.level)
+
+    for name, level in config.levels.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+    if not _shutdown_registered:
+        atexit.register(shutdown_logging)
+        _shutdown_registered = True
+
+
+def shutdown_logging() -> None:
+    """Write all queued records and stop the listener thread."""
+
+    global _listener
+
+    if _listener is None:
+        return
+
+    _listener.stop()
+    for h in _listener.handlers:
+        h.close()
+    _listener = None
@@ -0,0 +1,49 @@
+"""
+Local HTTP endpoint for the bot's metrics.
+"""
+
+import json
+
+from aiohttp import web
+
+from .stats import BotStats
+
+__all__ = ['MetricsServer']
+
+
+class MetricsServer:
+
+    def __init__(self, stats: BotStats, host: str, port: int) -> None:
+        """
+        Serve the stats in Prometheus text format on /metrics and as JSON on /stats.json.
+
+        Attributes:
+            host    Interface to listen on. Keep it local unless the network is trusted, there's no authentication.
+            port    Port to listen on.
+        """
+
+        self._stats = stats
+        self._host = host
+        self._port = port
+        self._runner: web.AppRunner | None = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/metrics', self._metrics)
+        app.router.add_get('/stats.json', self._summary)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self._host, self._port).start()
+
+    async def close(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=self._stats.render_prometheus(),
+                            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'})
+
+    async def _summary(self, request: web.Request) -> web.Response:
+        return web.json_response(self._stats.summary(), dumps=lambda data: json.dumps(data, indent=2))
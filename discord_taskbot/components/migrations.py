@@ -0,0 +1,183 @@
+"""
+Versioned schema migrations.
+"""
+
+from collections.abc import Callable
+
+from sqlalchemy import MetaData, Table, String, cast, func, inspect, literal, select, text, true
+from sqlalchemy.engine import Connection, Engine
+
+from .models import ORM_Project, ORM_Task, ORM_ProjectStat, ORM_Value, ORM_Emoji
+
+__all__ = ['SCHEMA_VERSION_NAME', 'SEARCH_INDEX_PROGRESS_NAME', 'SEARCH_INDEX_END_NAME', 'POSTGRESQL_SEARCH_VECTOR',
+           'MIGRATIONS', 'get_schema_version', 'migrate', 'rebuild_project_stats']
+
+SCHEMA_VERSION_NAME = "SCHEMA_VERSION"
+
+# tasks with ids in (progress, end] existed before the search index and have not been indexed yet
+SEARCH_INDEX_PROGRESS_NAME = "SEARCH_INDEX_PROGRESS"
+SEARCH_INDEX_END_NAME = "SEARCH_INDEX_END"
+
+# search document of a task on PostgreSQL, titles weigh more than descriptions
+POSTGRESQL_SEARCH_VECTOR = ("setweight(to_tsvector('simple', title), 'A') || "
+                            "setweight(to_tsvector('simple', description), 'B')")
+
+
+def _migration_add_lookup_indexes(connection: Connection) -> None:
+    """Add indexes for task lookups by message/thread id, task numbers and project ids."""
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_tasks_message_id ON tasks (message_id) WHERE message_id != -1"))
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_tasks_related_project_id_number ON tasks (related_project_id, number)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_projects_id ON projects (id)"))
+
+
+def _rebuild_table(connection: Connection, table: Table, copied_columns: str, added_values: dict[str, str]) -> None:
+    """
+    Recreate a table with its current model definition and copy all rows. Used for changes SQLite can't do in place,
+    like replacing the primary key. added_values maps the columns the old table lacks to SQL expressions.
+    """
+
+    staging = table.to_metadata(MetaData(), name=f"{table.name}_rebuild")
+    staging.create(connection)
+
+    connection.execute(text(f"INSERT INTO {staging.name} ({copied_columns}, {', '.join(added_values)}) "
+                            f"SELECT {copied_columns}, {', '.join(added_values.values())} FROM {table.name}"))
+    connection.execute(text(f"DROP TABLE {table.name}"))
+    connection.execute(text(f"ALTER TABLE {staging.name} RENAME TO {table.name}"))
+
+
+def _migration_partition_by_guild(connection: Connection) -> None:
+    """
+    Add guild ids to projects and task action emojis. Tags and emojis become unique per guild and projects are keyed
+    by their id. Existing rows get guild 0, projects are assigned to their guild when the bot sees their channel.
+    """
+
+    for table, copied_columns in ((ORM_Project.__table__, "id, tag, display_name, description, channel_id"),
+                                  (ORM_Emoji.__table__, "id, emoji, position")):
+        if 'guild_id' not in {c['name'] for c in inspect(connection).get_columns(table.name)}:
+            _rebuild_table(connection, table, copied_columns, {'guild_id': '0'})
+
+    # projects.id is the primary key now
+    connection.execute(text("DROP INDEX IF EXISTS ix_projects_id"))
+
+
+def _migration_add_task_search(connection: Connection) -> None:
+    """
+    Add a full-text index of task titles and descriptions.
+
+    On SQLite, an FTS5 table with the tasks table as content, kept in sync by triggers. Existing tasks are indexed in
+    chunks after startup (PersistenceAPI.build_search_index()), so the migration doesn't block large databases. Until
+    then, the triggers only maintain indexed rows. On PostgreSQL, a GIN index over the weighted search document.
+    """
+
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_tasks_search ON tasks "
+                                f"USING gin (({POSTGRESQL_SEARCH_VECTOR}))"))
+        return
+
+    stored = set(connection.execute(select(ORM_Value.name).where(
+        ORM_Value.name.in_([SEARCH_INDEX_PROGRESS_NAME, SEARCH_INDEX_END_NAME]))).scalars())
+    if not stored:
+        last_id = connection.execute(select(func.max(ORM_Task.id))).scalar() or 0
+        connection.execute(ORM_Value.__table__.insert(), [{'name': SEARCH_INDEX_PROGRESS_NAME, 'value': '0'},
+                                                          {'name': SEARCH_INDEX_END_NAME, 'value': str(last_id)}])
+
+    # rank: bm25 with titles weighing twice as much as descriptions
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(title, description, content='tasks', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2')"))
+    connection.execute(text("INSERT INTO tasks_fts(tasks_fts, rank) VALUES ('rank', 'bm25(2.0, 1.0)')"))
+
+    def value(name: str) -> str:
+        return f"(SELECT CAST(value AS INTEGER) FROM \"values\" WHERE name = '{name}')"
+
+    def indexed(row: str) -> str:
+        return f"{row}.id <= {value(SEARCH_INDEX_PROGRESS_NAME)} OR {row}.id > {value(SEARCH_INDEX_END_NAME)}"
+
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks WHEN {indexed('new')} BEGIN "
+        f"INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks WHEN {indexed('old')} BEGIN "
+        f"INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+        f"VALUES ('delete', old.id, old.title, old.description); END"))
+    connection.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF title, description ON tasks "
+        f"WHEN {indexed('old')} BEGIN "
+        f"INSERT INTO tasks_fts(tasks_fts, rowid, title, description) "
+        f"VALUES ('delete', old.id, old.title, old.description); "
+        f"INSERT INTO tasks_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END"))
+
+
+def _migration_add_listing_indexes(connection: Connection) -> None:
+    """Add indexes for task listings of a project filtered by status or assignee."""
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_related_project_id_status_number "
+                            "ON tasks (related_project_id, status, number)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_tasks_related_project_id_assigned_to_number "
+                            "ON tasks (related_project_id, assigned_to, number)"))
+
+
+def rebuild_project_stats(connection: Connection, project_id: int = None) -> None:
+    """Recount the tasks of all projects, or of one project, per status and per assignee."""
+
+    stats = ORM_ProjectStat.__table__
+    tasks = ORM_Task.__table__
+    columns = ['project_id', 'kind', 'key', 'count']
+
+    delete = stats.delete()
+    condition = true()
+    if project_id is not None:
+        delete = delete.where(stats.c.project_id == int(project_id))
+        condition = tasks.c.related_project_id == int(project_id)
+
+    connection.execute(delete)
+    connection.execute(stats.insert().from_select(columns, select(
+        tasks.c.related_project_id, literal('status'), tasks.c.status, func.count())
+        .where(condition).group_by(tasks.c.related_project_id, tasks.c.status)))
+    connection.execute(stats.insert().from_select(columns, select(
+        tasks.c.related_project_id, literal('assignee'), cast(tasks.c.assigned_to, String), func.count())
+        .where(condition, tasks.c.assigned_to.isnot(None), tasks.c.assigned_to != -1)
+        .group_by(tasks.c.related_project_id, tasks.c.assigned_to)))
+
+
+def _migration_add_project_stats(connection: Connection) -> None:
+    """Count the tasks of existing projects per status and assignee, the table is created with the schema."""
+    rebuild_project_stats(connection)
+
+
+# ordered list of all migrations, the schema version equals the number of applied migrations
+# migrations must be idempotent, as fresh databases already contain the objects created by metadata.create_all()
+MIGRATIONS: list[Callable[[Connection], None]] = [
+    _migration_add_lookup_indexes,
+    _migration_partition_by_guild,
+    _migration_add_task_search,
+    _migration_add_listing_indexes,
+    _migration_add_project_stats,
+]
+
+
+def get_schema_version(connection: Connection) -> int:
+    """Get the schema version stored in the database. Databases without a stored version have version 0."""
+    version = connection.execute(select(ORM_Value.value).where(ORM_Value.name == SCHEMA_VERSION_NAME)).scalar()
+    return int(version) if version is not None else 0
+
+
+def migrate(engine: Engine) -> int:
+    """Apply all pending migrations in place and return the resulting schema version."""
+
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+
+        for migration in MIGRATIONS[version:]:
+            migration(connection)
+
+        if version == 0:
+            connection.execute(ORM_Value.__table__.insert()
+                               .values(name=SCHEMA_VERSION_NAME, value=str(len(MIGRATIONS))))
+        elif version < len(MIGRATIONS):
+            connection.execute(ORM_Value.__table__.update()
+                               .where(ORM_Value.name == SCHEMA_VERSION_NAME)
+                               .values(value=str(len(MIGRATIONS))))
+
+    return max(version, len(MIGRATIONS))
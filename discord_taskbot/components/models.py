@@ -2,25 +2,34 @@
 ORM models.
 """
 
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, BigInteger, Integer, String, Boolean, Index, text
 from sqlalchemy.orm import declarative_base
 
 ORM_BASE = declarative_base()
 
-__all__ = ['ORM_Project', 'ORM_Task', 'ORM_Value', 'ORM_Emoji', 'ORM_BASE']
+__all__ = ['ORM_Project', 'ORM_Task', 'ORM_ProjectStat', 'ORM_Value', 'ORM_Emoji', 'ORM_BASE']
 
 
 # TODO add table constructors
+# Discord ids (snowflakes) have 64 bits and need BigInteger columns on PostgreSQL
 
 class ORM_Project(ORM_BASE):
     """Database table to store all projects."""
     __tablename__ = 'projects'
 
-    tag = Column(String, primary_key=True)
-    id = Column(Integer, nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    tag = Column(String, nullable=False)
     display_name = Column(String, nullable=False)
     description = Column(String, nullable=False, default='')
-    channel_id = Column(Integer, nullable=False, unique=True)
+    channel_id = Column(BigInteger, nullable=False, unique=True)
+
+    # 0 for projects whose guild is not known yet, e.g. imported ones
+    guild_id = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # tags are unique per guild
+        Index('ix_projects_guild_id_tag', 'guild_id', 'tag', unique=True),
+    )
 
 
 class ORM_Task(ORM_BASE):
@@ -33,10 +42,31 @@ class ORM_Task(ORM_BASE):
     title = Column(String, nullable=False)
     description = Column(String, nullable=False, default='')
     status = Column(String, nullable=False)
-    assigned_to = Column(Integer)
-    message_id = Column(Integer, nullable=False, default=-1)
+    assigned_to = Column(BigInteger)
+    message_id = Column(BigInteger, nullable=False, default=-1)
     has_thread = Column(Boolean, nullable=False, default=False)
 
+    __table_args__ = (
+        # tasks without a message share the placeholder -1, so only posted tasks have to be unique
+        Index('ix_tasks_message_id', 'message_id', unique=True, sqlite_where=text('message_id != -1'),
+              postgresql_where=text('message_id != -1')),
+        Index('ix_tasks_related_project_id_number', 'related_project_id', 'number', unique=True),
+        # task listings filtered by status or assignee, in task number order
+        Index('ix_tasks_related_project_id_status_number', 'related_project_id', 'status', 'number'),
+        Index('ix_tasks_related_project_id_assigned_to_number', 'related_project_id', 'assigned_to', 'number'),
+    )
+
+
+class ORM_ProjectStat(ORM_BASE):
+    """Database table to store the number of tasks of a project per status and per assignee."""
+    __tablename__ = 'project_stats'
+
+    # kind is 'status' (key: status id) or 'assignee' (key: user id), unassigned tasks are not counted per assignee
+    project_id = Column(Integer, primary_key=True)
+    kind = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
 
 class ORM_Value(ORM_BASE):
     """Database table to store bot states."""
@@ -50,6 +80,12 @@ class ORM_Emoji(ORM_BASE):
     """Database table to store task action emojis."""
     __tablename__ = 'emojis'
 
+    # guild 0 holds the default mapping, other guilds only have rows once they changed an emoji
+    guild_id = Column(BigInteger, primary_key=True, default=0)
     id = Column(String, primary_key=True)
-    emoji = Column(String, nullable=False, unique=True)
+    emoji = Column(String, nullable=False)
     position = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index('ix_emojis_guild_id_emoji', 'guild_id', 'emoji', unique=True),
+    )
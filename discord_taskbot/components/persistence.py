@@ -2,107 +2,176 @@
 Database component.
 """
 
+import asyncio
 import copy
+import functools
+import logging
+import re
+import threading
+import time
 
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
-from sqlalchemy import create_engine
+from sqlalchemy import func, select, update
 from sqlalchemy.engine import Engine
 from sqlalchemy.orm import Session
 
-from discord_taskbot.utils.constants import TASK_EMOJI_IDS, DEFAULT_TASK_EMOJI_MAPPING, TASK_STATUS_IDS
+from discord_taskbot.utils.constants import TASK_EMOJI_IDS, DEFAULT_TASK_EMOJI_MAPPING, TASK_STATUS_IDS, \
+    DEFAULT_TASK_CACHE_SIZE, DEFAULT_TASK_CACHE_TTL, DEFAULT_SEARCH_INDEX_CHUNK_SIZE
+from discord_taskbot.utils.emojis import normalize_emoji
+from .backends import StorageBackend, create_backend
 from .cache import PersistenceCache
-from .exceptions import ChannelAlreadyInUse, EmojiDoesNotExist, CannotBeUpdated, ProjectDoesNotExist, TaskDoesNotExist
-from .models import ORM_Project, ORM_Task, ORM_Value, ORM_Emoji, ORM_BASE
+from .config import StorageConfig
+from .migrations import migrate, rebuild_project_stats
+from .exceptions import ChannelAlreadyInUse, EmojiDoesNotExist, CannotBeUpdated, ProjectDoesNotExist, \
+    TaskDoesNotExist, InvalidCursor
+from .models import ORM_Project, ORM_Task, ORM_ProjectStat, ORM_Value, ORM_Emoji, ORM_BASE
 from .data_classes import Project, Task, Emoji, Value
+from .stats import BotStats
 
-__all__ = ['PersistenceAPI']
+__all__ = ['PersistenceAPI', 'AsyncPersistenceAPI']
 
 
 class PersistenceAPI:
 
-    def __init__(self) -> None:
-        """Class that provides an api for accessing and modifying the persistence layer."""
+    def __init__(self, config: StorageConfig = None, counter_block_size: int = 1,
+                 task_cache_size: int = DEFAULT_TASK_CACHE_SIZE, task_cache_ttl: float = DEFAULT_TASK_CACHE_TTL,
+                 guild_filter: Callable[[int], bool] = None) -> None:
+        """
+        Class that provides an api for accessing and modifying the persistence layer.
+
+        Attributes:
+            config              Storage profile. If none given, it is read from the environment on startup.
+            counter_block_size  Number of task numbers reserved per counter update. 1 (default) allocates every
+                                number within the transaction that inserts the task, which keeps numbers gap-free
+                                on SQLite. On PostgreSQL, task numbers come from sequences that cache this many
+                                numbers per connection.
+            task_cache_size     Maximum number of cached task lookups.
+            task_cache_ttl      Seconds a cached task stays valid.
+            guild_filter        If given, only projects and emoji mappings of guilds it returns True for are loaded
+                                on startup, e.g. the guilds of this process' shards. Projects without a guild (0) are
+                                always loaded. Other guilds can be loaded with load_guild().
+        """
 
         self._engine: Engine
+        self._backend: StorageBackend
         self._cache: PersistenceCache = PersistenceCache()
 
+        # counters: mirror of the counters (values table or sequences, depending on the backend)
+        # projects: write-through index of all loaded projects by ('tag', guild_id, tag), ('id', project_id) and
+        #           ('channel', channel_id)
+        # tasks: bounded lookup cache by ('id', task_id) and ('message', message_id)
+        # emojis: forward and reverse task action emoji maps by ('maps', guild_id), guild 0 holds the default maps
+        self._cache.configure('counters')
+        self._cache.configure('projects')
+        self._cache.configure('tasks', maxsize=task_cache_size, ttl=task_cache_ttl)
+        self._cache.configure('emojis')
+
+        # hi/lo block allocation of task numbers {counter name: (next number, last reserved number)}
+        self._counter_block_size: int = max(1, int(counter_block_size))
+        self._counter_blocks: dict[str, tuple[int, int]] = {}
+        self._counter_lock = threading.Lock()
+
+        # write-through set of all message ids (== thread ids) that belong to a task
+        self._task_message_ids: set[int] = set()
+
+        self._guild_filter = guild_filter
+
+        self._config = config
         self._engine = None
+        self._backend = None
+
+    @property
+    def config(self) -> StorageConfig | None:
+        return self._config
+
+    @property
+    def backend(self) -> StorageBackend | None:
+        """Storage backend of the database, None before startup."""
+        return self._backend
 
     def startup(self) -> None:
         """Create the database and do some startup things."""
 
         # create engine and tables
-        self._engine = create_engine("sqlite:///data.db", echo=True)
+        self._engine = self._create_engine()
         ORM_BASE.metadata.create_all(self._engine)
 
+        # bring existing databases up to the current schema version
+        migrate(self._engine)
+
         # execute specialized database startup functions
-        self._startup_create_runtime_vals()
-        self._startup_project_id_value()
+        self._startup_counters()
         self._startup_task_action_emojis()
+        self._startup_project_index()
+        self._startup_task_message_index()
+
+    def close(self) -> None:
+        """Close all pooled database connections."""
+        if self._engine is not None:
+            self._engine.dispose()
+
+    def _create_engine(self) -> Engine:
+        """Create the database engine with the backend of the storage profile's database URL."""
 
-    def _startup_create_runtime_vals(self) -> None:
-        """Create and store runtime values in database and cache."""
+        if self._config is None:
+            self._config = StorageConfig.from_env()
 
-        # define static runtime values
-        values = [
-            ORM_Value(name="PROJECT_ID_COUNT", value="0")
-        ]
-        val_dict = {k.name: k for k in values}
+        # statements are logged through the logging pipeline instead of SQLAlchemy's own stdout handler
+        if self._config.echo_level:
+            logging.getLogger('sqlalchemy.engine').setLevel(self._config.echo_level)
 
-        for v in val_dict.values():
-            self._cache.add(v.name, v.value)
+        self._backend = create_backend(self._config, self._counter_block_size)
+        return self._backend.create_engine()
+
+    def _startup_counters(self) -> None:
+        """Create missing counters of project ids and task numbers and mirror all counters in the cache."""
 
         with Session(self._engine) as session:
-            db_vals: list[ORM_Value] = session.query(ORM_Value).all()
+            counters = self._backend.read_counters(session)
+            project_ids = session.scalars(select(ORM_Project.id)).all()
 
-            # update existing env vars in cache
-            for var in list(filter(lambda x: x.name in val_dict, db_vals)):
-                self._cache.update(var.name, var.value)
+            for name in ["PROJECT_ID_COUNT", *map(str, project_ids)]:
+                if name in counters:
+                    continue
 
-            # remove all values that exist in db
-            for var in db_vals:
-                val_dict.pop(var.name, None)
+                # start after the highest existing value, e.g. of a database that has been filled by another backend
+                if name == "PROJECT_ID_COUNT":
+                    value = session.execute(select(func.max(ORM_Project.id))).scalar()
+                else:
+                    value = session.execute(select(func.max(ORM_Task.number))
+                                            .where(ORM_Task.related_project_id == int(name))).scalar()
 
-            # add non-existing env vars to db
-            for var in val_dict.values():
-                session.add(var)
+                counters[name] = value or 0
+                self._backend.set_counter(session, name, counters[name])
 
             session.commit()
 
-    def _startup_project_id_value(self) -> None:
-        """Add project ids to Values table"""
+        for name, value in counters.items():
+            self._cache.set(name, str(value), namespace='counters')
 
-        def is_int_value(x: ORM_Value) -> bool:
-            """Small function to check if both name and value of a Value can be cast to an int."""
-            try:
-                int(x.name)
-                int(x.value)
-            except ValueError:
-                return False
+    def _owns_guild(self, guild_id: int) -> bool:
+        """Whether the data of a guild is loaded on startup, see guild_filter."""
+        return not guild_id or self._guild_filter is None or self._guild_filter(guild_id)
 
-            return True
+    def _startup_task_action_emojis(self) -> None:
+        """Update and ensure correct task action emoji order and values of the default and all guild mappings."""
 
         with Session(self._engine) as session:
-            # get existing projects from database
-            existing_projects: Iterable[int] = map(lambda x: int(x[0]), session.query(ORM_Project.id).all())
+            guild_ids = set(session.execute(select(ORM_Emoji.guild_id).distinct()).scalars())
 
-            # map all valid (see function above) values from database into a dict
-            existing_values: dict[int, int] = {int(v.name): int(v.value)
-                                               for v in filter(is_int_value, session.query(ORM_Value).all())}
+        # the default mapping goes first, guild mappings are completed with it
+        for guild_id in sorted(guild_ids | {0}):
+            if self._owns_guild(guild_id):
+                self._normalize_task_action_emojis(guild_id)
 
-            for p in existing_projects:
-                if p not in existing_values:
-                    self._cache.add(str(p), 0)
-                    session.add(ORM_Value(name=p, value=0))
-                else:
-                    self._cache.add(str(p), existing_values[p])
+    def _normalize_task_action_emojis(self, guild_id: int) -> None:
+        """Update and ensure correct task action emoji order and values of a guild's mapping in database."""
 
-            session.commit()
-
-    def _startup_task_action_emojis(self) -> None:
-        """Update and ensure correct task action emoji order and values in database."""
-        existing_emojis = self.get_task_action_emoji_mapping()
+        self._load_task_action_emojis(guild_id)
+        existing_emojis = {e.id: e.emoji for e in self._guild_emoji_maps(guild_id)[0].values()}
 
         # if query result and emoji_ids have equivalent ids, return
         if DEFAULT_TASK_EMOJI_MAPPING.keys() == existing_emojis.keys():
@@ -111,26 +180,96 @@ class PersistenceAPI:
         # only keep those emojis with valid ids
         valid_existing_emoji_ids = filter(lambda x: x in TASK_EMOJI_IDS, existing_emojis.keys())
 
-        # use stored emojis for existing ids, use default emojis for new ids
-        emoji_mapping = DEFAULT_TASK_EMOJI_MAPPING.copy()
+        # use stored emojis for existing ids, use default emojis (of the default mapping for guilds) for new ids
+        emoji_mapping = DEFAULT_TASK_EMOJI_MAPPING.copy() if not guild_id else self.get_task_action_emoji_mapping()
         for e_id in valid_existing_emoji_ids:
             emoji_mapping[e_id] = existing_emojis[e_id]
 
         position_count = 1
         with Session(self._engine) as session:
 
-            # delete all existing emojis in table
-            session.query(ORM_Emoji).delete()
+            # delete all existing emojis of the guild
+            session.query(ORM_Emoji).filter(ORM_Emoji.guild_id == guild_id).delete()
 
             # (re) add emojis while considering their order
             for e_id, emoji in emoji_mapping.items():
-                session.add(ORM_Emoji(id=e_id, emoji=emoji, position=position_count))
+                session.add(ORM_Emoji(guild_id=guild_id, id=e_id, emoji=emoji, position=position_count))
                 position_count += 1
 
             session.commit()
 
-    def add_project(self, tag: str, display_name: str, description: str, channel_id: int) -> Project:
-        """Create a new project."""
+        self._load_task_action_emojis(guild_id)
+
+    def _load_task_action_emojis(self, guild_id: int = 0) -> None:
+        """(Re)build the in-memory forward and reverse task action emoji maps of a guild."""
+
+        with Session(self._engine) as session:
+            emojis = Emoji.from_rows(session.execute(select(*Emoji.orm_columns())
+                                                     .where(ORM_Emoji.guild_id == guild_id)
+                                                     .order_by(ORM_Emoji.position)))
+
+        if not emojis:
+            self._cache.remove(('maps', guild_id), namespace='emojis')
+            return
+
+        # swap both maps at once, so readers never see a partially built state
+        self._cache.set(('maps', guild_id), ({e.id: e for e in emojis}, {normalize_emoji(e.emoji): e for e in emojis}),
+                        namespace='emojis')
+
+    def _guild_emoji_maps(self, guild_id: int) -> tuple[dict[str, Emoji], dict[str, Emoji]]:
+        """A guild's own task action emojis as ({id: emoji}, {normalized emoji: emoji}), empty if it has none."""
+        return self._cache.get(('maps', guild_id), namespace='emojis') or ({}, {})
+
+    def _emoji_maps(self, guild_id: int = None) -> tuple[dict[str, Emoji], dict[str, Emoji]]:
+        """Task action emojis of a guild, or the default emojis if the guild has no own mapping."""
+
+        if guild_id:
+            maps = self._cache.get(('maps', int(guild_id)), namespace='emojis')
+            if maps:
+                return maps
+
+        return self._guild_emoji_maps(0)
+
+    def _startup_project_index(self) -> None:
+        """Load all projects into the in-memory project index."""
+
+        self._cache.clear('projects')
+
+        with Session(self._engine) as session:
+            for project in Project.from_rows(session.execute(select(*Project.orm_columns()))):
+                if self._owns_guild(project.guild_id):
+                    self._cache_project(project)
+
+    def _cache_project(self, project: Project) -> None:
+        """Store a project in the project index under all of its unique values."""
+        self._cache.set(('tag', project.guild_id, project.tag), project, namespace='projects')
+        self._cache.set(('id', project.id), project, namespace='projects')
+        self._cache.set(('channel', project.channel_id), project, namespace='projects')
+
+    def _cache_task(self, task: Task) -> None:
+        """Store a task in the task cache."""
+        self._cache.set(('id', task.id), task, namespace='tasks')
+
+        if task.message_id != -1:
+            self._cache.set(('message', task.message_id), task, namespace='tasks')
+
+    def _startup_task_message_index(self) -> None:
+        """Load the message ids of all tasks of loaded projects into the in-memory message index."""
+
+        with Session(self._engine) as session:
+            if self._guild_filter is None:
+                message_ids = session.query(ORM_Task.message_id).filter(ORM_Task.message_id != -1).all()
+                self._task_message_ids = {m[0] for m in message_ids}
+                return
+
+            project_ids = {p.id for p in self.get_projects()}
+            rows = session.execute(select(ORM_Task.message_id, ORM_Task.related_project_id)
+                                   .where(ORM_Task.message_id != -1))
+            self._task_message_ids = {message_id for message_id, project_id in rows if project_id in project_ids}
+
+    def add_project(self, tag: str, display_name: str, description: str, channel_id: int,
+                    guild_id: int = 0) -> Project:
+        """Create a new project. Tags are unique per guild."""
 
         display_name = str(display_name).strip()
         description = str(description).strip()
@@ -144,29 +283,35 @@ class PersistenceAPI:
             # add project
             p = ORM_Project(
                 tag=tag,
-                id=self._generate_project_id(),
+                id=self._generate_project_id(session),
                 display_name=display_name,
                 description=description,
                 channel_id=int(channel_id),
+                guild_id=int(guild_id or 0),
             )
             session.add(p)
 
-            # add project task counter to cache and static values
-            v = ORM_Value(name=p.id, value=0)
-            self._cache.add(str(v.name), v.value)
-            session.add(v)
+            # add project task counter
+            self._backend.set_counter(session, str(p.id), 0)
 
             session.commit()
 
-            return Project.from_orm(p)
+            project = Project.from_orm(p)
+            self._cache_project(project)
+            self._cache.set(str(project.id), 0, namespace='counters')
+            self._cache.set("PROJECT_ID_COUNT", str(project.id), namespace='counters')
+
+            return project
 
-    def update_project(self, tag: str, display_name: str = None, description: str = None) -> Project:
-        """Update a project's display name and description."""
+    def update_project(self, tag: str, display_name: str = None, description: str = None,
+                       guild_id: int = 0) -> Project:
+        """Update a project's display name and description. The project is identified by its guild and tag."""
         display_name = str(display_name).strip() if display_name is not None else None
         description = str(description).strip() if description is not None else None
 
         with Session(self._engine) as session:
-            p: ORM_Project = session.get(ORM_Project, tag)
+            p: ORM_Project = session.query(ORM_Project).filter(ORM_Project.guild_id == int(guild_id or 0),
+                                                               ORM_Project.tag == str(tag)).first()
 
             if not p:
                 raise ProjectDoesNotExist(f"Project with tag '{tag}' does not exist.")
@@ -179,7 +324,10 @@ class PersistenceAPI:
 
             session.commit()
 
-            return Project.from_orm(p)
+            project = Project.from_orm(p)
+            self._cache_project(project)
+
+            return project
 
     def add_task(self, related_project_id: int, name: str, description: str) -> Task:
         """Create a new task for a project."""
@@ -192,22 +340,85 @@ class PersistenceAPI:
 
         with Session(self._engine) as session:
             # add task
-            t = ORM_Task(
-                related_project_id=related_project_id,
-                number=self._generate_task_number(related_project_id),
-                title=name,
-                description=description,
-                status='pending',
-            )
-            session.add(t)
+            row = {
+                'related_project_id': related_project_id,
+                'number': self._generate_task_numbers(session, related_project_id)[0],
+                'title': name,
+                'description': description,
+                'status': 'pending',
+            }
+            task, = Task.from_rows(self._backend.insert(session, ORM_Task.__table__, [row], Task.orm_columns()))
+            self._backend.add_project_stats(session, {(related_project_id, 'status', 'pending'): 1})
+
+            session.commit()
+
+            self._cache_task(task)
+            self._cache.set(str(related_project_id), str(task.number), namespace='counters')
+
+            return task
+
+    def add_tasks(self, related_project_id: int, tasks: Iterable[tuple],
+                  progress: tuple[str, str] = None) -> list[Task]:
+        """
+        Create multiple tasks for a project within a single transaction.
+        All task numbers are allocated with one counter update.
+
+        Tasks are tuples of (name, description) or (name, description, status, assigned_to). Unknown statuses are
+        replaced with 'pending'. If progress (name, value) is given, the value is stored within the same transaction,
+        e.g. to resume an interrupted import.
+        """
+
+        related_project_id = int(related_project_id)
+        rows = []
+
+        for name, description, *optional in tasks:
+            status = str(optional[0]).strip() if optional and optional[0] is not None else 'pending'
+            assigned_to = int(optional[1]) if len(optional) > 1 and optional[1] is not None else None
+
+            rows.append((str(name).strip(), str(description).strip(),
+                         status if status in TASK_STATUS_IDS else 'pending', assigned_to))
+
+        if not rows:
+            if progress:
+                self.set_value(*progress)
+            return []
+
+        with Session(self._engine) as session:
+            numbers = self._generate_task_numbers(session, related_project_id, len(rows))
+
+            created = Task.from_rows(self._backend.insert(session, ORM_Task.__table__, [
+                {
+                    'related_project_id': related_project_id,
+                    'number': number,
+                    'title': name,
+                    'description': description,
+                    'status': status,
+                    'assigned_to': assigned_to,
+                }
+                for number, (name, description, status, assigned_to) in zip(numbers, rows)
+            ], Task.orm_columns()))
+
+            deltas = {}
+            for t in created:
+                key = (related_project_id, 'status', t.status)
+                deltas[key] = deltas.get(key, 0) + 1
+                if t.assigned_to is not None and t.assigned_to != -1:
+                    key = (related_project_id, 'assignee', str(t.assigned_to))
+                    deltas[key] = deltas.get(key, 0) + 1
+            self._backend.add_project_stats(session, deltas)
+
+            if progress:
+                session.merge(ORM_Value(name=str(progress[0]), value=str(progress[1])))
 
             session.commit()
 
-            return Task.from_orm(t)
+            self._cache.set(str(related_project_id), str(max(t.number for t in created)), namespace='counters')
+
+            return created
 
     def update_task(self, task_id: int, title: str = None, description: str = None, status: str = None,
                     assigned_to: int = None, message_id: int = None, has_thread: bool = None) -> Task:
-        """Update a task."""
+        """Update a task. The project's task counts follow status and assignee changes in the same transaction."""
 
         title = str(title).strip() if title is not None else None
         description = str(description).strip() if description is not None else None
@@ -218,10 +429,13 @@ class PersistenceAPI:
 
         with Session(self._engine) as session:
 
-            t: ORM_Task = session.get(ORM_Task, task_id)
+            # the row lock (PostgreSQL) keeps concurrent updates from counting the same transition twice
+            t: ORM_Task = session.get(ORM_Task, task_id, with_for_update=True)
             if not t:
                 raise TaskDoesNotExist(f"Task with id '{task_id}' does not exist.")
 
+            old_status, old_assigned_to = t.status, t.assigned_to
+
             if title:
                 t.title = title
 
@@ -243,41 +457,106 @@ class PersistenceAPI:
             if has_thread is not None:
                 t.has_thread = has_thread
 
+            deltas = {}
+            if t.status != old_status:
+                deltas[(t.related_project_id, 'status', old_status)] = -1
+                deltas[(t.related_project_id, 'status', t.status)] = 1
+            if t.assigned_to != old_assigned_to:
+                for user_id, delta in ((old_assigned_to, -1), (t.assigned_to, 1)):
+                    if user_id is not None and user_id != -1:
+                        deltas[(t.related_project_id, 'assignee', str(user_id))] = delta
+            self._backend.add_project_stats(session, deltas)
+
+            # read before the commit expires the row, which would load it again
+            task = Task.from_orm(t)
+            session.commit()
+
+            if message_id:
+                self._task_message_ids.add(message_id)
+
+            self._cache_task(task)
+
+            return task
+
+    def detach_task_message(self, task_id: int) -> Task:
+        """
+        Unlink a task from its message and thread, e.g. after its message has been deleted. The task becomes unposted
+        and can be sent again (see TaskBot.publish_unposted_tasks()).
+        """
+
+        with Session(self._engine) as session:
+            t: ORM_Task = session.get(ORM_Task, int(task_id))
+            if not t:
+                raise TaskDoesNotExist(f"Task with id '{task_id}' does not exist.")
+
+            message_id = t.message_id
+            t.message_id = -1
+            t.has_thread = False
+
+            task = Task.from_orm(t)
             session.commit()
 
-            return Task.from_orm(t)
+        self._task_message_ids.discard(message_id)
+        self._cache.remove(('message', message_id), namespace='tasks')
+        self._cache_task(task)
+
+        return task
 
-    def get_project(self, tag: str = None, project_id: int = None, channel_id: int = None) -> Project | None:
-        """Get a project from a unique project value. Returns the Project or None if no results."""
+    def get_project(self, tag: str = None, project_id: int = None, channel_id: int = None,
+                    guild_id: int = 0) -> Project | None:
+        """
+        Get a project from a unique project value. Returns the Project or None if no results.
+        Tags are looked up within the passed guild.
+        Lookups are answered from the in-memory project index. Only tags and ids of projects that are not indexed
+        (e.g. created by another process) are looked up in the database.
+        """
 
         # ensure values have correct types
         try:
             tag = str(tag) if tag is not None else None
             project_id = int(project_id) if project_id is not None else None
             channel_id = int(channel_id) if channel_id is not None else None
+            guild_id = int(guild_id or 0)
         except TypeError:
             raise
         except ValueError:
             raise
 
+        project = self.get_indexed_project(tag, project_id, channel_id, guild_id)
+        if project:
+            return project
+
         p: ORM_Project
 
-        with Session(self._engine) as session:
+        if tag or project_id:
+            with Session(self._engine) as session:
+
+                if tag:
+                    p = session.query(ORM_Project).filter(ORM_Project.guild_id == guild_id,
+                                                          ORM_Project.tag == tag).first()
+                    if p:
+                        project = Project.from_orm(p)
+                        self._cache_project(project)
+                        return project
 
-            if tag:
-                p = session.get(ORM_Project, tag)
-                if p:
-                    return Project.from_orm(p)
+                if project_id:
+                    p = session.get(ORM_Project, project_id)
+                    if p:
+                        project = Project.from_orm(p)
+                        self._cache_project(project)
+                        return project
 
-            if project_id:
-                p = session.query(ORM_Project).filter(ORM_Project.id == project_id).first()
-                if p:
-                    return Project.from_orm(p)
+        return None
+
+    def get_indexed_project(self, tag: str = None, project_id: int = None, channel_id: int = None,
+                            guild_id: int = 0) -> Project | None:
+        """Get a project from the in-memory project index only. Returns the Project or None if it is not indexed."""
 
-            if channel_id:
-                p = session.query(ORM_Project).filter(ORM_Project.channel_id == channel_id).first()
-                if p:
-                    return Project.from_orm(p)
+        for key in (('tag', int(guild_id or 0), tag), ('id', project_id), ('channel', channel_id)):
+            if key[-1]:
+                project = self._cache.get(key, namespace='projects')
+                if project:
+                    return project
 
         return None
 
@@ -299,112 +578,296 @@ class PersistenceAPI:
         except ValueError:
             raise
 
-        t: ORM_Task
+        t: Task
+
+        if task_id:
+            t = self._cache.get_or_load(('id', task_id), lambda: self._load_task(ORM_Task.id == task_id),
+                                        namespace='tasks')
+            if t:
+                return t
+
+        if message_id and message_id != -1:
+            t = self._get_task_by_message(message_id)
+            if t:
+                return t
+
+        return None
+
+    def _get_task_by_message(self, message_id: int) -> Task | None:
+        """
+        Get the task of a message from the task cache or the database. Messages missing from the message index may
+        have been posted by another process (e.g. 'import --post'); they are added to the index if their task belongs
+        to a loaded project.
+        """
+
+        # SQLite only uses the partial index ix_tasks_message_id if the query repeats its condition
+        condition = (ORM_Task.message_id == message_id) & (ORM_Task.message_id != -1)
+
+        def load() -> Task | None:
+            # tasks of other processes' guilds are not cached, they would only take up room of the task cache
+            task = self._load_task(condition)
+            return task if task and self._is_loaded_task(task) else None
+
+        t = self._cache.get_or_load(('message', message_id), load, namespace='tasks')
+
+        if not t or message_id in self._task_message_ids:
+            return t
+
+        # tasks cached by id are not checked on load
+        if not self._is_loaded_task(t):
+            return None
+
+        self._task_message_ids.add(message_id)
+        return t
+
+    def _is_loaded_task(self, task: Task) -> bool:
+        """Whether a task belongs to a loaded project of an owned guild."""
+
+        project = self.get_project(project_id=task.related_project_id)
+        return project is not None and self._owns_guild(project.guild_id)
+
+    def _load_task(self, condition) -> Task | None:
+        """Load a task from the database. Callers store it in the task cache."""
 
         with Session(self._engine) as session:
+            tasks = Task.from_rows(session.execute(select(*Task.orm_columns()).where(condition).limit(1)))
 
-            if task_id:
-                t = session.get(ORM_Task, task_id)
-                if t:
-                    return Task.from_orm(t)
+        return tasks[0] if tasks else None
 
-            if message_id and message_id != -1:
-                t = session.query(ORM_Task).filter(ORM_Task.message_id == message_id).first()
-                if t:
-                    return Task.from_orm(t)
+    def get_projects(self, guild_id: int = None) -> list[Project]:
+        """
+        Get all loaded projects, or those of a guild, ordered by id. Answered from the in-memory project index.
+        Without a guild_filter, all projects are loaded.
+        """
 
-        return None
+        projects = {}
+        for key, project in self._cache.items(namespace='projects'):
+            if key[0] == 'id' and (guild_id is None or project.guild_id == guild_id):
+                projects[project.id] = project
 
-    def is_channel_in_use(self, channel_id) -> bool:
-        """Check if passed channel id is already taken (== a project)."""
+        return [projects[project_id] for project_id in sorted(projects)]
+
+    def get_tasks(self, related_project_id: int, after_number: int = 0, limit: int = 100, unposted: bool = False,
+                  status: str = None, assigned_to: int = None, before_number: int = None) -> list[Task]:
+        """
+        Get up to limit tasks of a project with a task number greater than after_number, ordered by number.
+        Pass the number of the last returned task as after_number to get the next page. If before_number is given,
+        get the last up to limit tasks with a smaller number instead (the previous page), still ordered by number.
+        If unposted is True, only tasks without a message are returned. Tasks can be filtered by status and assignee.
+        Pages are read from an index in number order, so their cost doesn't depend on their position.
+        """
 
+        condition = ORM_Task.related_project_id == int(related_project_id)
+        if before_number is not None:
+            condition &= ORM_Task.number < int(before_number)
+        else:
+            condition &= ORM_Task.number > int(after_number)
+        if unposted:
+            condition &= ORM_Task.message_id == -1
+        if status is not None:
+            condition &= ORM_Task.status == status
+        if assigned_to is not None:
+            condition &= ORM_Task.assigned_to == int(assigned_to)
+
+        order = ORM_Task.number.desc() if before_number is not None else ORM_Task.number
         with Session(self._engine) as session:
-            p: ORM_Project = session.query(ORM_Project).filter(ORM_Project.channel_id == channel_id).first()
+            tasks = Task.from_rows(session.execute(
+                select(*Task.orm_columns()).where(condition).order_by(order).limit(int(limit))))
 
-        # the query returns either something or None, and bool(None) -> False
-        return bool(p)
+        return tasks[::-1] if before_number is not None else tasks
 
-    def _generate_project_id(self) -> int:
-        """Calculates, stores and returns a new project id integer from existing counters."""
+    def search_tasks(self, query: str, project_ids: Iterable[int] = None, status: str = None, assigned_to: int = None,
+                     after: str = None, limit: int = 10) -> tuple[list[Task], str | None]:
+        """
+        Full-text search over task titles and descriptions for tasks containing all words of the query, best matches
+        first. Titles weigh more than descriptions, words ending with * match as prefix (e.g. migrat*). Results can be
+        filtered by projects, status and assignee.
+
+        Returns a page of tasks and the cursor of the next page (pass it as after), or None on the last page. Tasks
+        that existed before the search index was added are found once build_search_index() has indexed them.
+        """
 
-        # retrieve counter from cache
-        # no need to check if the value exists in cache.
-        # it is in the cache UNLESS some other unknown code manipulates the cache.
-        id_count = int(self._cache.get("PROJECT_ID_COUNT"))
+        terms = [(word, bool(prefix)) for word, prefix in re.findall(r'(\w+)(\*?)', query)]
+        if not terms or (project_ids is not None and not project_ids):
+            return [], None
 
-        # increase counter
-        id_count += 1
+        conditions = []
+        if project_ids is not None:
+            conditions.append(ORM_Task.related_project_id.in_([int(i) for i in project_ids]))
+        if status is not None:
+            conditions.append(ORM_Task.status == status)
+        if assigned_to is not None:
+            conditions.append(ORM_Task.assigned_to == int(assigned_to))
 
-        # update value in database
+        position = None
+        if after:
+            try:
+                task_id, _, score = after.partition(':')
+                position = (float(score), int(task_id))
+            except ValueError:
+                raise InvalidCursor(f"Invalid search cursor '{after}'.") from None
+
+        limit = max(1, int(limit))
         with Session(self._engine) as session:
-            v: ORM_Value = session.query(ORM_Value).filter(ORM_Value.name == "PROJECT_ID_COUNT").first()
-            v.value = str(id_count)
+            rows = self._backend.search(session, terms, conditions, position, limit + 1, Task.orm_columns())
 
-            session.commit()
+        tasks = Task.from_rows(row[:-1] for row in rows[:limit])
+        next_cursor = f"{rows[limit - 1][0]}:{rows[limit - 1][-1]!r}" if len(rows) > limit else None
 
-        # update value in cache if database storing was successful
-        self._cache.update("PROJECT_ID_COUNT", str(id_count))
+        return tasks, next_cursor
 
-        # return generated id
-        return id_count
+    def build_search_index(self, chunk_size: int = DEFAULT_SEARCH_INDEX_CHUNK_SIZE) -> bool:
+        """
+        Add the next chunk of tasks that existed before the search index to it. Returns True once all tasks are
+        indexed. Each chunk is a short transaction, call this repeatedly in the background until it returns True.
+        """
 
-    def _generate_task_number(self, related_project_id: int) -> int:
-        """Calculates, stores and returns a task number integer for the related project from existing counters."""
+        with Session(self._engine) as session:
+            done = self._backend.build_search_index(session, max(1, int(chunk_size)))
+            session.commit()
 
-        # cast project id to string
-        related_project_id = str(related_project_id)
+        return done
 
-        # retrieve counter from cache
-        # no need to check if the value exists in cache.
-        # it is in the cache UNLESS some other unknown code manipulates the cache.
-        task_number = int(self._cache.get(related_project_id))
+    def get_project_stats(self, project_id: int) -> dict[str, dict[str, int]]:
+        """
+        Get the task counts of a project per status (all statuses, including empty ones) and per assignee (user ids
+        as strings, only assignees with tasks), e.g. {'status': {'pending': 3, ...}, 'assignee': {'1234': 2}}.
+        Answered from the stored counts, which are updated together with the tasks.
+        """
 
-        # increase counter
-        task_number += 1
+        counts = {'status': dict.fromkeys(TASK_STATUS_IDS, 0), 'assignee': {}}
 
-        # update value in database
         with Session(self._engine) as session:
-            v: ORM_Value = session.query(ORM_Value).filter(ORM_Value.name == related_project_id).first()
-            v.value = str(task_number)
+            for kind, key, count in session.execute(
+                    select(ORM_ProjectStat.kind, ORM_ProjectStat.key, ORM_ProjectStat.count)
+                    .where(ORM_ProjectStat.project_id == int(project_id))):
+                if kind in counts and count:
+                    counts[kind][key] = count
+
+        return counts
 
+    def recount_project_stats(self, project_id: int = None) -> None:
+        """Rebuild the task counts of all projects, or of one project, from the tasks."""
+
+        with Session(self._engine) as session:
+            rebuild_project_stats(session.connection(), project_id)
             session.commit()
 
-        # update value in cache if database storing was successful
-        self._cache.update(related_project_id, str(task_number))
+    def get_value(self, name: str) -> str | None:
+        """Get a stored bot state from the values table. Returns None if it does not exist."""
+
+        with Session(self._engine) as session:
+            v: ORM_Value = session.get(ORM_Value, str(name))
+            return v.value if v else None
 
-        # return generated number
-        return task_number
+    def set_value(self, name: str, value: str) -> None:
+        """Add or replace a stored bot state in the values table."""
 
-    def get_emojis(self) -> list[Emoji]:
-        """Get all emojis."""
         with Session(self._engine) as session:
-            e_list: list[ORM_Emoji] = session.query(ORM_Emoji).all()
-            return [Emoji.from_orm(e) for e in e_list]
+            session.merge(ORM_Value(name=str(name), value=str(value)))
+            session.commit()
 
-    def get_emoji(self, emoji_id: str = None, emoji: str = None) -> Emoji | None:
-        """Get the emoji to the id."""
+    def is_channel_in_use(self, channel_id) -> bool:
+        """Check if passed channel id is already taken (== a project). Answered from the in-memory project index."""
+        return self._cache.get(('channel', int(channel_id)), namespace='projects') is not None
 
-        emoji_id = str(emoji_id).strip()
-        emoji = str(emoji).strip()
+    def is_task_message(self, message_id: int) -> bool:
+        """
+        Check if passed message id belongs to a task. Answered from the in-memory message index, misses are looked up
+        in the database (see _get_task_by_message()).
+        As a thread's channel id equals its origin message id, this works for thread ids as well.
+        """
 
-        with Session(self._engine) as session:
+        message_id = int(message_id)
+        if self.is_indexed_task_message(message_id):
+            return True
+
+        return message_id != -1 and self._get_task_by_message(message_id) is not None
+
+    def is_indexed_task_message(self, message_id: int) -> bool:
+        """Check if passed message id is in the in-memory message index only."""
+        return int(message_id) in self._task_message_ids
+
+    def _generate_project_id(self, session: Session) -> int:
+        """Allocate a new project id within the session's transaction."""
+        return self._backend.allocate(session, "PROJECT_ID_COUNT")[0]
+
+    def _generate_task_numbers(self, session: Session, related_project_id: int, count: int = 1) -> Sequence[int]:
+        """
+        Allocate task numbers for the related project.
+
+        By default, numbers are allocated within the session's transaction. In block allocation mode, they are handed
+        out from blocks that are reserved in their own transaction. This saves the counter update for most tasks, but
+        the unused rest of a block is lost when the bot stops. Backends with sequence counters reserve blocks
+        themselves.
+        """
 
-            if emoji_id:
-                e: ORM_Emoji = session.get(ORM_Emoji, emoji_id)
-                if e :
-                    return Emoji.from_orm(e)
+        # counters of project task numbers are named by the project id
+        name = str(related_project_id)
 
-            if emoji:
-                e: ORM_Emoji = session.query(ORM_Emoji).filter(ORM_Emoji.emoji == emoji).first()
-                if e:
-                    return Emoji.from_orm(e)
+        if self._counter_block_size == 1 or self._backend.sequence_counters:
+            return self._backend.allocate(session, name, count)
+
+        with self._counter_lock:
+            next_number, last_number = self._counter_blocks.get(name, (1, 0))
+
+            # reserve a new block if the current one is too small
+            if next_number + count - 1 > last_number:
+                block_size = max(count, self._counter_block_size)
+
+                with Session(self._engine) as block_session:
+                    next_number = self._backend.allocate(block_session, name, block_size)[0]
+                    block_session.commit()
+
+                last_number = next_number + block_size - 1
+
+            self._counter_blocks[name] = (next_number + count, last_number)
+
+        return range(next_number, next_number + count)
+
+    def cache_stats(self) -> dict[str, dict[str, int]]:
+        """Get size, hit, miss, eviction and expiration counts per cache namespace."""
+        return self._cache.stats()
+
+    def get_emojis(self, guild_id: int = None) -> list[Emoji]:
+        """Get all emojis of a guild's mapping, or of the default mapping."""
+        return list(self._emoji_maps(guild_id)[0].values())
+
+    def get_emoji(self, emoji_id: str = None, emoji: str = None, guild_id: int = None) -> Emoji | None:
+        """
+        Get an emoji by its id or by the emoji itself. Answered from the in-memory emoji maps of the guild.
+        Custom server emojis are matched by their Discord emoji id.
+        """
+
+        emojis_by_id, emojis_by_emoji = self._emoji_maps(guild_id)
+
+        if emoji_id is not None:
+            e = emojis_by_id.get(str(emoji_id).strip())
+            if e:
+                return e
+
+        if emoji is not None:
+            return emojis_by_emoji.get(normalize_emoji(emoji))
 
         return None
 
-    def update_task_action_emoji(self, task_id: str, emoji: str) -> None:
-        """Update a task action emoji."""
+    def update_task_action_emoji(self, task_id: str, emoji: str, guild_id: int = 0) -> None:
+        """
+        Update a task action emoji of a guild, or of the default mapping if guild_id is 0.
+        A guild's first update creates its own mapping as a copy of the default one.
+        """
+
+        guild_id = int(guild_id or 0)
+
         with Session(self._engine) as session:
-            e: ORM_Emoji = session.query(ORM_Emoji).filter(ORM_Emoji.id == task_id).first()
+            emojis: list[ORM_Emoji] = session.query(ORM_Emoji).filter(ORM_Emoji.guild_id == guild_id).all()
+
+            if not emojis and guild_id:
+                emojis = [ORM_Emoji(guild_id=guild_id, id=e.id, emoji=e.emoji, position=e.position)
+                          for e in self.get_emojis()]
+                session.add_all(emojis)
+
+            e = next((e for e in emojis if e.id == task_id), None)
             if not e:
                 raise EmojiDoesNotExist(f"Emoji '{task_id}' cannot be updated because it does not exist.")
 
@@ -414,9 +877,224 @@ class PersistenceAPI:
 
             session.commit()
 
-    def get_task_action_emoji_mapping(self) -> dict[str, str]:
-        """Get all task action emoji in a map {id: emoji}."""
+        self._load_task_action_emojis(guild_id)
+
+    def get_task_action_emoji_mapping(self, guild_id: int = None) -> dict[str, str]:
+        """Get all task action emoji of a guild in a map {id: emoji}, ordered by position."""
+        return {e.id: e.emoji for e in self._emoji_maps(guild_id)[0].values()}
+
+    def load_guild(self, guild_id: int, channel_ids: Iterable[int] = ()) -> list[Project]:
+        """
+        Load the projects, task message ids and emoji mapping of a guild into memory, e.g. after joining it or when
+        its shard connects. Projects without a guild whose channel is one of channel_ids are assigned to the guild
+        first. Returns the guild's projects.
+        """
+
+        guild_id = int(guild_id)
+        channel_ids = [int(c) for c in channel_ids]
+
         with Session(self._engine) as session:
-            emojis: list[ORM_Emoji] = session.query(ORM_Emoji).order_by(ORM_Emoji.position).all()
+            if channel_ids:
+                session.execute(update(ORM_Project)
+                                .where(ORM_Project.guild_id == 0, ORM_Project.channel_id.in_(channel_ids))
+                                .values(guild_id=guild_id))
+
+            projects = Project.from_rows(session.execute(select(*Project.orm_columns())
+                                                         .where(ORM_Project.guild_id == guild_id)))
+
+            message_ids = session.execute(select(ORM_Task.message_id)
+                                          .where(ORM_Task.related_project_id.in_([p.id for p in projects]),
+                                                 ORM_Task.message_id != -1)).scalars().all()
+
+            session.commit()
+
+        for project in projects:
+            # projects that have just been assigned were indexed without a guild
+            unassigned = self._cache.get(('tag', 0, project.tag), namespace='projects')
+            if unassigned and unassigned.id == project.id:
+                self._cache.remove(('tag', 0, project.tag), namespace='projects')
+
+            self._cache_project(project)
+
+        self._task_message_ids.update(message_ids)
+        self._load_task_action_emojis(guild_id)
+
+        return projects
+
+    def evict_guild(self, guild_id: int) -> None:
+        """
+        Remove the projects, cached tasks, task message ids and emoji mapping of a guild from memory, e.g. after the
+        bot has left it. The stored data is kept.
+        """
+
+        guild_id = int(guild_id)
+        if not guild_id:
+            return
+
+        projects = self.get_projects(guild_id)
+        project_ids = {p.id for p in projects}
+
+        for p in projects:
+            self._cache.remove(('tag', p.guild_id, p.tag), namespace='projects')
+            self._cache.remove(('id', p.id), namespace='projects')
+            self._cache.remove(('channel', p.channel_id), namespace='projects')
+
+        for key, task in self._cache.items(namespace='tasks'):
+            if task.related_project_id in project_ids:
+                self._cache.remove(key, namespace='tasks')
+
+        if project_ids:
+            with Session(self._engine) as session:
+                message_ids = session.execute(select(ORM_Task.message_id)
+                                              .where(ORM_Task.related_project_id.in_(project_ids),
+                                                     ORM_Task.message_id != -1)).scalars().all()
+
+            self._task_message_ids.difference_update(message_ids)
+
+        self._cache.remove(('maps', guild_id), namespace='emojis')
+
+
+class AsyncPersistenceAPI:
+
+    def __init__(self, api: PersistenceAPI = None, stats: BotStats = None) -> None:
+        """
+        Non-blocking variant of the PersistenceAPI for use inside the event loop.
+
+        Every call is executed on a dedicated executor, so database I/O (and SQLite fsyncs) never stall event
+        handlers or the gateway heartbeat. The executor has config.workers threads, started on startup. A single
+        worker (default) serializes all writes to the database. Return types equal those of the PersistenceAPI.
+
+        Attributes:
+            api     The wrapped synchronous PersistenceAPI.
+            stats   If given and enabled, every executor call is timed in 'db_call_seconds' by method name
+                    (including the time waiting for the executor).
+        """
+
+        self._api: PersistenceAPI = api or PersistenceAPI()
+        self._stats = stats
+        self._executor: ThreadPoolExecutor | None = None
+
+    @property
+    def api(self) -> PersistenceAPI:
+        return self._api
+
+    def startup(self) -> None:
+        """Create the database and do some startup things. Blocking, call before the event loop runs."""
+        self._api.startup()
+        self._executor = ThreadPoolExecutor(max_workers=self._api.config.workers,
+                                            thread_name_prefix='taskbot-persistence')
+
+    def close(self) -> None:
+        """Wait for pending database calls, shut down the executor and close the database connections."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self._api.close()
+
+    async def _run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Execute a blocking PersistenceAPI call on the persistence executor."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+
+        if self._stats is None or not self._stats.enabled:
+            return await loop.run_in_executor(self._executor, call)
+
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, call)
+        except Exception:
+            self._stats.count('db_call_errors', {'method': func.__name__})
+            raise
+        finally:
+            self._stats.observe('db_call_seconds', time.perf_counter() - started, {'method': func.__name__})
+
+    async def add_project(self, tag: str, display_name: str, description: str, channel_id: int,
+                          guild_id: int = 0) -> Project:
+        return await self._run(self._api.add_project, tag, display_name, description, channel_id, guild_id)
+
+    async def update_project(self, tag: str, display_name: str = None, description: str = None,
+                             guild_id: int = 0) -> Project:
+        return await self._run(self._api.update_project, tag, display_name, description, guild_id)
+
+    async def add_task(self, related_project_id: int, name: str, description: str) -> Task:
+        return await self._run(self._api.add_task, related_project_id, name, description)
+
+    async def add_tasks(self, related_project_id: int, tasks: Iterable[tuple],
+                        progress: tuple[str, str] = None) -> list[Task]:
+        return await self._run(self._api.add_tasks, related_project_id, list(tasks), progress)
+
+    async def update_task(self, task_id: int, title: str = None, description: str = None, status: str = None,
+                          assigned_to: int = None, message_id: int = None, has_thread: bool = None) -> Task:
+        return await self._run(self._api.update_task, task_id, title, description, status, assigned_to, message_id,
+                               has_thread)
+
+    async def detach_task_message(self, task_id: int) -> Task:
+        return await self._run(self._api.detach_task_message, task_id)
+
+    async def get_project(self, tag: str = None, project_id: int = None, channel_id: int = None,
+                          guild_id: int = 0) -> Project | None:
+        # indexed projects are served from memory, skip the executor round trip
+        project = self._api.get_indexed_project(tag, project_id, channel_id, guild_id)
+        if project or (tag is None and project_id is None):
+            return project
+
+        return await self._run(self._api.get_project, tag, project_id, channel_id, guild_id)
+
+    async def get_task(self, task_id: int = None, message_id: int = None, thread_id: int = None) -> Task | None:
+        return await self._run(self._api.get_task, task_id, message_id, thread_id)
+
+    async def get_projects(self, guild_id: int = None) -> list[Project]:
+        return self._api.get_projects(guild_id)
+
+    async def get_tasks(self, related_project_id: int, after_number: int = 0, limit: int = 100,
+                        unposted: bool = False, status: str = None, assigned_to: int = None,
+                        before_number: int = None) -> list[Task]:
+        return await self._run(self._api.get_tasks, related_project_id, after_number, limit, unposted, status,
+                               assigned_to, before_number)
+
+    async def search_tasks(self, query: str, project_ids: Iterable[int] = None, status: str = None,
+                           assigned_to: int = None, after: str = None,
+                           limit: int = 10) -> tuple[list[Task], str | None]:
+        project_ids = list(project_ids) if project_ids is not None else None
+        return await self._run(self._api.search_tasks, query, project_ids, status, assigned_to, after, limit)
+
+    async def build_search_index(self, chunk_size: int = DEFAULT_SEARCH_INDEX_CHUNK_SIZE) -> bool:
+        return await self._run(self._api.build_search_index, chunk_size)
+
+    async def get_project_stats(self, project_id: int) -> dict[str, dict[str, int]]:
+        return await self._run(self._api.get_project_stats, project_id)
+
+    async def get_value(self, name: str) -> str | None:
+        return await self._run(self._api.get_value, name)
+
+    async def set_value(self, name: str, value: str) -> None:
+        return await self._run(self._api.set_value, name, value)
+
+    async def is_channel_in_use(self, channel_id) -> bool:
+        return self._api.is_channel_in_use(channel_id)
+
+    async def is_task_message(self, message_id: int) -> bool:
+        # hits of the message index are answered without an executor hop
+        if self._api.is_indexed_task_message(message_id):
+            return True
+        return await self._run(self._api.is_task_message, message_id)
+
+    async def cache_stats(self) -> dict[str, dict[str, int]]:
+        return self._api.cache_stats()
+
+    async def get_emojis(self, guild_id: int = None) -> list[Emoji]:
+        return self._api.get_emojis(guild_id)
+
+    async def get_emoji(self, emoji_id: str = None, emoji: str = None, guild_id: int = None) -> Emoji | None:
+        return self._api.get_emoji(emoji_id, emoji, guild_id)
+
+    async def update_task_action_emoji(self, task_id: str, emoji: str, guild_id: int = 0) -> None:
+        return await self._run(self._api.update_task_action_emoji, task_id, emoji, guild_id)
+
+    async def get_task_action_emoji_mapping(self, guild_id: int = None) -> dict[str, str]:
+        return self._api.get_task_action_emoji_mapping(guild_id)
+
+    async def load_guild(self, guild_id: int, channel_ids: Iterable[int] = ()) -> list[Project]:
+        return await self._run(self._api.load_guild, guild_id, list(channel_ids))
 
-        return {e.id: e.emoji for e in emojis}
+    async def evict_guild(self, guild_id: int) -> None:
+        return await self._run(self._api.evict_guild, guild_id)
@@ -0,0 +1,266 @@
+"""
+Reconciliation of project channels with the database after the bot has been offline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from typing import TYPE_CHECKING
+
+import discord
+
+from discord_taskbot.utils.constants import DEFAULT_RECONCILE_CONCURRENCY, RECONCILE_MARK_VALUE_PREFIX, \
+    RECONCILE_PROGRESS_INTERVAL, DEFAULT_TRANSFER_CHUNK_SIZE, TASK_STATUS_IDS
+from .data_classes import Project
+from .logger import get_logger, log_context
+from .scheduler import Priority
+
+if TYPE_CHECKING:
+    from .client import TaskBot
+
+__all__ = ['ReconcileResult', 'ReactionReplay', 'reconcile_mark_name', 'reconcile_channels']
+
+logger = get_logger('reconcile')
+
+# handler of reactions that were added while the bot was offline, e.g. the bot's on_raw_reaction_add handler
+ReactionReplay = Callable[[discord.RawReactionActionEvent], Awaitable[None]]
+
+
+class ReconcileResult:
+    __slots__ = ('channels', 'failed_channels', 'messages', 'threads', 'orphans', 'reactions', 'conflicts',
+                 'detached_tasks', 'seconds')
+
+    def __init__(self) -> None:
+        """Summary of a reconciliation."""
+
+        self.channels = 0
+        self.failed_channels = 0
+        self.messages = 0
+        self.threads = 0
+        self.orphans = 0
+        self.reactions = 0
+        self.conflicts = 0
+        self.detached_tasks = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (f"<ReconcileResult channels={self.channels} failed_channels={self.failed_channels} "
+                f"messages={self.messages} threads={self.threads} orphans={self.orphans} "
+                f"reactions={self.reactions} conflicts={self.conflicts} detached_tasks={self.detached_tasks} "
+                f"seconds={self.seconds:.1f}>")
+
+
+def reconcile_mark_name(channel_id: int) -> str:
+    """Name of the values table entry that stores where the history walk of a project channel stops."""
+    return f"{RECONCILE_MARK_VALUE_PREFIX}{channel_id}"
+
+
+def _reconciled_here(client: TaskBot, project: Project) -> bool:
+    """
+    Whether a project channel is reconciled by this process. Processes of other shards share the storage and load
+    the projects without a guild as well, so only channels of known guilds of this process' shards that the client
+    can see are read. Projects without a guild are reconciled once attach_guild() has assigned them.
+    """
+
+    return (bool(project.guild_id) and client.shard_config.owns_guild(project.guild_id)
+            and client.get_channel(project.channel_id) is not None)
+
+
+async def reconcile_channels(client: TaskBot, replay_reaction: ReactionReplay,
+                             concurrency: int = DEFAULT_RECONCILE_CONCURRENCY,
+                             projects: list[Project] = None) -> ReconcileResult:
+    """
+    Bring the database in line with the project channels after the bot has been offline. The history of every
+    project channel of this process (see _reconciled_here()), or of projects if given, is read once, newest message
+    first, down to the channel's mark (see _reconcile_channel()):
+
+    - tasks get has_thread fixed if their thread has been created or deleted
+    - reactions to task messages are passed to replay_reaction, one call per user and emoji, except for conflicting
+      status reactions (see _reconcile_task_message())
+    - bot messages that belong to no task and user messages are deleted, like on_message does for a running bot
+    - tasks whose message has been deleted are unlinked from it and sent again, with all other unposted tasks of
+      the reconciled projects
+
+    Up to concurrency channels are read at the same time. Reads are rate limited by discord.py per channel, writes go
+    through the scheduler with the priorities of the running bot. Progress is logged per channel. Every channel is
+    reconciled once per process, channels in client.reconciled_channels are skipped.
+    """
+
+    started = time.perf_counter()
+    result = ReconcileResult()
+
+    if projects is None:
+        projects = await client.db.get_projects()
+
+    # claim the channels before the first await, so concurrent reconciliations don't read a channel twice
+    projects = [p for p in projects if _reconciled_here(client, p) and p.channel_id not in client.reconciled_channels]
+    client.reconciled_channels.update(p.channel_id for p in projects)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def reconcile_project(project: Project) -> None:
+        async with semaphore:
+            with log_context(project_id=project.id, channel_id=project.channel_id):
+                channel_started = time.perf_counter()
+                try:
+                    messages = await _reconcile_channel(client, project, replay_reaction, result)
+                except discord.HTTPException as e:
+                    result.failed_channels += 1
+                    logger.warning("Channel can't be reconciled (%s).", e)
+                    return
+                except Exception:
+                    result.failed_channels += 1
+                    logger.exception("Reconciling the channel failed.")
+                    return
+
+                result.channels += 1
+                logger.info("Channel reconciled.", extra={'messages': messages,
+                                                          'done': result.channels + result.failed_channels,
+                                                          'channels': len(projects),
+                                                          'seconds': round(time.perf_counter() - channel_started, 1)})
+
+    await asyncio.gather(*(reconcile_project(p) for p in projects))
+
+    # projects without a guild are loaded by the processes of all shards, only the reconciling process sends them
+    if result.detached_tasks:
+        try:
+            await client.publish_unposted_tasks(projects=projects)
+        except Exception:
+            logger.exception("Sending the tasks that lost their message failed.")
+
+    result.seconds = time.perf_counter() - started
+    logger.info("Reconciliation finished.", extra={'channels': result.channels,
+                                                   'failed_channels': result.failed_channels,
+                                                   'messages': result.messages, 'threads': result.threads,
+                                                   'orphans': result.orphans, 'reactions': result.reactions,
+                                                   'conflicts': result.conflicts,
+                                                   'detached_tasks': result.detached_tasks,
+                                                   'seconds': round(result.seconds, 1)})
+    return result
+
+
+async def _reconcile_channel(client: TaskBot, project: Project, replay_reaction: ReactionReplay,
+                             result: ReconcileResult) -> int:
+    """
+    Reconcile a project channel. Returns the number of read messages.
+
+    The walk stops at the channel's mark, the oldest task message of the previous walk: new tasks are always sent
+    below the existing ones, so older messages hold no tasks. Messages sent after the walk has started are left to
+    the event handlers. A channel without a mark is read completely.
+    """
+
+    channel = client.get_channel_handle(project.channel_id, project.guild_id or None)
+    mark_name = reconcile_mark_name(project.channel_id)
+    mark = int(await client.db.get_value(mark_name) or 0)
+    board_message_id = await client.get_board_message_id(project.id)
+    end = discord.utils.time_snowflake(discord.utils.utcnow())
+
+    task_message_ids: set[int] = set()
+    orphans: list[discord.Message] = []
+    messages = 0
+
+    async for message in channel.history(limit=None, before=discord.Object(end),
+                                         after=discord.Object(mark - 1) if mark else None, oldest_first=False):
+        messages += 1
+        if messages % RECONCILE_PROGRESS_INTERVAL == 0:
+            logger.info("Reconciling channel.", extra={'messages': messages})
+
+        if await client.db.is_task_message(message.id):
+            task_message_ids.add(message.id)
+            await _reconcile_task_message(client, project, message, replay_reaction, result)
+
+        # interaction responses of the bot have their own message type, followups are sent through a webhook
+        elif message.id != board_message_id and (message.author.id != client.user.id or (
+                message.type == discord.MessageType.default and not message.webhook_id)):
+            orphans.append(message)
+
+    result.messages += messages
+
+    # without a mark, messages below the oldest task message were sent before the channel became a project
+    oldest = mark or min(task_message_ids, default=end)
+    for message in orphans:
+        if message.id > oldest:
+            await client.scheduler.enqueue(Priority.CLEANUP, ('channel', project.channel_id), message.delete)
+            result.orphans += 1
+
+    # every task message between the mark and the start of the walk has been read, tasks without one lost it
+    after_number = 0
+    while tasks := await client.db.get_tasks(project.id, after_number, DEFAULT_TRANSFER_CHUNK_SIZE):
+        for t in tasks:
+            if mark <= t.message_id < end and t.message_id not in task_message_ids:
+                await client.db.detach_task_message(t.id)
+                client.render_queue.forget(t.id)
+                client.handles.remove('message', t.message_id)
+                result.detached_tasks += 1
+
+        after_number = tasks[-1].number
+
+    await client.db.set_value(mark_name, min(task_message_ids, default=end))
+    return messages
+
+
+async def _reconcile_task_message(client: TaskBot, project: Project, message: discord.Message,
+                                  replay_reaction: ReactionReplay, result: ReconcileResult) -> None:
+    """
+    Fix the has_thread of a task message's task and replay the reactions of other users to it. If the reactions ask
+    for more than one status, none of them is replayed.
+    """
+
+    task = await client.db.get_task(message_id=message.id)
+    if not task:
+        return
+
+    has_thread = message.thread is not None
+    if task.has_thread != has_thread:
+        if has_thread:
+            await client.update_task(task.id, has_thread=True)
+        else:
+            await client.db.update_task(task.id, has_thread=False)
+            client.render_queue.forget(task.id, message=False)
+
+        result.threads += 1
+
+    # reactions of other users as (emoji, user, status id if the emoji sets a status)
+    reactions: list[tuple[discord.PartialEmoji, discord.abc.User, str | None]] = []
+
+    for reaction in message.reactions:
+        if reaction.count <= (1 if reaction.me else 0):
+            continue
+
+        emoji = discord.PartialEmoji.from_str(str(reaction.emoji))
+        action = await client.db.get_emoji(emoji=str(emoji), guild_id=project.guild_id or None)
+        status = action.id if action and action.id in TASK_STATUS_IDS else None
+
+        async for user in reaction.users():
+            if user.id != client.user.id:
+                reactions.append((emoji, user, status))
+
+    # Discord doesn't tell in which order reactions were added, so different statuses can't be replayed in the order
+    # they were chosen. The task keeps its status, the conflicting reactions are removed like replayed ones.
+    statuses = {status for _, _, status in reactions if status}
+    conflict = len(statuses) > 1
+
+    if conflict:
+        logger.warning("Conflicting status reactions are skipped, the task keeps its status.",
+                       extra={'task_id': task.id, 'statuses': ', '.join(sorted(statuses))})
+        result.conflicts += 1
+
+    for emoji, user, status in reactions:
+        if conflict and status:
+            await client.scheduler.enqueue(Priority.CLEANUP, ('channel', project.channel_id), message.remove_reaction,
+                                           emoji, user)
+            continue
+
+        data = {'message_id': message.id, 'channel_id': project.channel_id, 'user_id': user.id, 'type': 0}
+        if project.guild_id:
+            data['guild_id'] = project.guild_id
+
+        payload = discord.RawReactionActionEvent(data, emoji, 'REACTION_ADD')
+        payload.member = user if isinstance(user, discord.Member) else None
+
+        # the handler binds the task to the log context, which must not stick to the rest of the channel
+        with log_context(message_id=message.id, user_id=user.id):
+            await replay_reaction(payload)
+        result.reactions += 1
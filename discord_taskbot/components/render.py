@@ -0,0 +1,261 @@
+"""
+Coalescing render queues for task messages, threads and project boards.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from typing import TYPE_CHECKING, Any
+
+import discord
+
+from discord_taskbot.utils.constants import DEFAULT_RENDER_CACHE_SIZE
+
+from .cache import PersistenceCache
+from .data_classes import Task
+from .logger import get_logger
+from .scheduler import Priority
+
+if TYPE_CHECKING:
+    from .client import TaskBot
+
+__all__ = ['TaskRenderQueue', 'BoardRenderQueue']
+
+logger = get_logger('render')
+
+
+def _digest(rendering: Any) -> bytes:
+    """Short digest of a rendering (JSON serializable), stored instead of the rendering to compare against it."""
+    return hashlib.blake2b(json.dumps(rendering, sort_keys=True).encode(), digest_size=16).digest()
+
+
+class TaskRenderQueue:
+
+    def __init__(self, client: TaskBot, delay: float, cache_size: int = DEFAULT_RENDER_CACHE_SIZE) -> None:
+        """
+        Debounced rendering of task messages and thread titles.
+
+        Changed tasks are marked dirty. After a short window, the final state of every dirty task is rendered once.
+        Renderings equal to the last one that was sent are not sent again. Digests of the last renderings are kept
+        for the cache_size most recently rendered tasks, others are sent again on their next change.
+
+        Updates the counters 'render_coalesced', 'render_skipped_messages', 'render_skipped_threads',
+        'render_message_edits' and 'render_thread_edits' of the client's stats.
+
+        Attributes:
+            delay       Seconds between the first change of a task and its rendering.
+            cache_size  Maximum number of tasks whose last message and thread rendering is remembered.
+        """
+
+        self._client = client
+        self._delay = delay
+
+        # scheduled renderings {task_id: flush task} and number of renderings in progress
+        self._pending: dict[int, asyncio.Task] = {}
+        self._rendering = 0
+
+        # digests of the last rendered message content and thread state (title, read only) by task id
+        self._rendered = PersistenceCache()
+        self._rendered.configure('messages', maxsize=cache_size)
+        self._rendered.configure('threads', maxsize=cache_size)
+
+    @property
+    def delay(self) -> float:
+        return self._delay
+
+    @property
+    def pending(self) -> int:
+        """Number of tasks waiting for their rendering or being rendered."""
+        return len(self._pending) + self._rendering
+
+    def mark_dirty(self, task_id: int) -> None:
+        """Schedule a task for rendering. Changes within the render window are coalesced into one rendering."""
+
+        if task_id in self._pending:
+            self._client.stats.increment('render_coalesced')
+            return
+
+        self._pending[task_id] = asyncio.create_task(self._render_later(task_id))
+
+    def remember_message(self, task: Task) -> None:
+        """Register the message content of a task that has been sent without the render queue."""
+        self._rendered.set(task.id, _digest(self._client.generate_task_string(task)), namespace='messages')
+
+    def remember_thread(self, task: Task) -> None:
+        """Register the thread state of a task whose thread has been created without the render queue."""
+        self._rendered.set(task.id, _digest(self._thread_state(task)), namespace='threads')
+
+    def forget(self, task_id: int, message: bool = True, thread: bool = True) -> None:
+        """Drop the last renderings of a task, e.g. after its message or thread has been deleted."""
+
+        if message:
+            self._rendered.remove(task_id, namespace='messages')
+
+        if thread:
+            self._rendered.remove(task_id, namespace='threads')
+
+    async def flush(self) -> None:
+        """Render all dirty tasks immediately."""
+
+        pending, self._pending = self._pending, {}
+
+        for task_id, flush_task in pending.items():
+            flush_task.cancel()
+            await self._render(task_id)
+
+    async def _render_later(self, task_id: int) -> None:
+        await asyncio.sleep(self._delay)
+        self._pending.pop(task_id, None)
+
+        self._rendering += 1
+        try:
+            await self._render(task_id)
+        finally:
+            self._rendering -= 1
+
+    def _thread_state(self, task: Task) -> tuple[str, bool]:
+        """Thread title and read only status (finished tasks have a locked thread)."""
+        return self._client.generate_task_thread_title(task), task.status == 'done'
+
+    async def _render(self, task_id: int) -> None:
+        """Send the current state of a task to its message and thread, if it differs from the last rendering."""
+
+        try:
+            t = await self._client.db.get_task(task_id=task_id)
+            if not t:
+                return
+
+            if t.message_id != -1:
+                content = self._client.generate_task_string(t)
+                digest = _digest(content)
+
+                if self._rendered.get(t.id, namespace='messages') == digest:
+                    self._client.stats.increment('render_skipped_messages')
+                else:
+                    p = await self._client.db.get_project(project_id=t.related_project_id)
+                    m = self._client.get_partial_task_message(p.channel_id, t.message_id)
+                    await self._client.scheduler.run(Priority.TASK_EDIT, ('channel', p.channel_id), m.edit,
+                                                     content=content)
+
+                    self._rendered.set(t.id, digest, namespace='messages')
+                    self._client.stats.increment('render_message_edits')
+
+            if t.has_thread:
+                title, read_only = thread_state = self._thread_state(t)
+                digest = _digest(thread_state)
+
+                if self._rendered.get(t.id, namespace='threads') == digest:
+                    self._client.stats.increment('render_skipped_threads')
+                else:
+                    # title and (un)locking are sent in a single edit, as archived threads can't be renamed
+                    thread = await self._client.get_thread_handle(t.message_id)
+                    thread = await self._client.scheduler.run(Priority.TASK_EDIT, ('channel', thread.id), thread.edit,
+                                                              name=title, archived=read_only, locked=read_only)
+                    self._client.handles.add('thread', thread.id, thread)
+
+                    self._rendered.set(t.id, digest, namespace='threads')
+                    self._client.stats.increment('render_thread_edits')
+
+        except discord.NotFound:
+            # message or thread has been deleted in the meantime, handles are cached by message (== thread) id
+            self.forget(task_id)
+            self._client.handles.remove('message', t.message_id)
+            self._client.handles.remove('thread', t.message_id)
+        except Exception:
+            logger.exception("Rendering a task failed.", extra={'task_id': task_id})
+
+
+class BoardRenderQueue:
+
+    def __init__(self, client: TaskBot, delay: float, cache_size: int = DEFAULT_RENDER_CACHE_SIZE) -> None:
+        """
+        Debounced rendering of project boards, the pinned messages with a project's task counts.
+
+        A changed project is rendered once after the window, so its board is edited at most once per window however
+        many tasks change. Boards equal to the last rendering are not sent again, digests of the last renderings are
+        kept for the cache_size most recently rendered boards.
+
+        Updates the counters 'board_coalesced', 'board_skipped' and 'board_edits' of the client's stats.
+
+        Attributes:
+            delay       Seconds between the first change of a project and the rendering of its board.
+            cache_size  Maximum number of boards whose last rendering is remembered.
+        """
+
+        self._client = client
+        self._delay = delay
+
+        # scheduled renderings {project_id: flush task}, number of renderings in progress and digests of the last
+        # rendered boards by project id
+        self._pending: dict[int, asyncio.Task] = {}
+        self._rendering = 0
+        self._rendered = PersistenceCache()
+        self._rendered.configure('boards', maxsize=cache_size)
+
+    @property
+    def pending(self) -> int:
+        """Number of boards waiting for their rendering or being rendered."""
+        return len(self._pending) + self._rendering
+
+    def mark_dirty(self, project_id: int) -> None:
+        """Schedule a project's board for rendering. Changes within the render window are coalesced."""
+
+        if project_id in self._pending:
+            self._client.stats.increment('board_coalesced')
+            return
+
+        self._pending[project_id] = asyncio.create_task(self._render_later(project_id))
+
+    def remember(self, project_id: int, embed: discord.Embed) -> None:
+        """Register the board of a project that has been sent without the render queue."""
+        self._rendered.set(project_id, _digest(embed.to_dict()), namespace='boards')
+
+    async def flush(self) -> None:
+        """Render all dirty boards immediately."""
+
+        pending, self._pending = self._pending, {}
+
+        for project_id, flush_task in pending.items():
+            flush_task.cancel()
+            await self._render(project_id)
+
+    async def _render_later(self, project_id: int) -> None:
+        await asyncio.sleep(self._delay)
+        self._pending.pop(project_id, None)
+
+        self._rendering += 1
+        try:
+            await self._render(project_id)
+        finally:
+            self._rendering -= 1
+
+    async def _render(self, project_id: int) -> None:
+        """Send the current task counts to the project's board message, if it has one and they changed."""
+
+        try:
+            p = await self._client.db.get_project(project_id=project_id)
+            message_id = await self._client.get_board_message_id(project_id)
+            if not p or not message_id:
+                return
+
+            embed = await self._client.generate_board_embed(p)
+            digest = _digest(embed.to_dict())
+
+            if self._rendered.get(project_id, namespace='boards') == digest:
+                self._client.stats.increment('board_skipped')
+                return
+
+            m = self._client.get_partial_task_message(p.channel_id, message_id)
+            await self._client.scheduler.run(Priority.TASK_EDIT, ('channel', p.channel_id), m.edit, embed=embed)
+
+            self._rendered.set(project_id, digest, namespace='boards')
+            self._client.stats.increment('board_edits')
+
+        except discord.NotFound:
+            # the board has been deleted, a new one can be posted with /board
+            self._rendered.remove(project_id, namespace='boards')
+            await self._client.db.set_value(self._client.board_value_name(project_id), '')
+        except Exception:
+            logger.exception("Rendering a project board failed.", extra={'project_id': project_id})
@@ -0,0 +1,233 @@
+"""
+Prioritized scheduler for outgoing Discord requests.
+"""
+
+import asyncio
+import collections
+import heapq
+import itertools
+from collections.abc import Awaitable, Callable, Hashable
+from enum import IntEnum
+from typing import Any
+
+from .logger import get_logger
+from .stats import BotStats
+
+__all__ = ['Priority', 'OutboundScheduler']
+
+logger = get_logger('scheduler')
+
+
+class Priority(IntEnum):
+    """Priority classes of outgoing requests, lower values are sent first."""
+
+    INTERACTION = 0
+    TASK_EDIT = 1
+    REACTION = 2
+    CLEANUP = 3
+    BULK = 4
+
+
+class _Request:
+    __slots__ = ('priority', 'sequence', 'bucket', 'func', 'future', 'event')
+
+    def __init__(self, priority: Priority, sequence: int, bucket: Hashable, func: Callable[[], Awaitable[Any]],
+                 future: asyncio.Future | None, event: list[int] | None) -> None:
+        self.priority = priority
+        self.sequence = sequence
+        self.bucket = bucket
+        self.func = func
+        self.future = future
+        self.event = event
+
+    def __lt__(self, other: '_Request') -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class OutboundScheduler:
+
+    def __init__(self, stats: BotStats, concurrency: int, queue_size: int) -> None:
+        """
+        Central queue for Discord writes.
+
+        Requests are sent by priority class. Requests of the same bucket (e.g. ('channel', channel_id), the major
+        parameter of Discord's rate limits) are sent one after another, requests of different buckets concurrently.
+        A free worker sends the most urgent request whose bucket is idle: requests of a busy bucket are put aside until
+        the bucket's request in flight has finished, so they neither hold a worker nor delay other buckets.
+        Queues are bounded per priority, requests put aside included: enqueueing into a full queue waits until there
+        is room again. Interaction responses are not queued, as they have to be sent within a few seconds.
+
+        Updates the counters 'scheduler_queued', 'scheduler_deferred', 'scheduler_completed', 'scheduler_failed' and
+        'scheduler_backpressure' of the stats.
+
+        Attributes:
+            concurrency     Maximum number of requests in flight.
+            queue_size      Maximum number of waiting requests per priority.
+        """
+
+        self._stats = stats
+        self._concurrency = max(1, int(concurrency))
+
+        # waiting requests: new ones in queues, requests of busy buckets in per bucket heaps, and requests whose
+        # bucket has become idle in the ready heap. Every waiting request holds room in its priority's queue.
+        self._queues: dict[Priority, collections.deque[_Request]] = {p: collections.deque() for p in Priority}
+        self._deferred: dict[Hashable, list[_Request]] = {}
+        self._ready: list[_Request] = []
+        self._room: dict[Priority, asyncio.Semaphore] = {p: asyncio.Semaphore(max(1, int(queue_size)))
+                                                         for p in Priority}
+        self._waiting: dict[Priority, int] = {p: 0 for p in Priority}
+        self._queued = asyncio.Semaphore(0)
+        self._sequence = itertools.count()
+
+        # buckets with a request in flight and the number of requests in flight
+        self._busy: set[Hashable] = set()
+        self._running = 0
+
+        self._workers: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        """Start sending queued requests."""
+
+        if self._workers:
+            return
+
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self._concurrency)]
+
+    async def close(self) -> None:
+        """Stop sending requests. Queued requests are discarded."""
+
+        for worker in self._workers:
+            worker.cancel()
+
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        waiting = [r for q in self._queues.values() for r in q] + [r for d in self._deferred.values() for r in d]
+        waiting += self._ready
+
+        for queue in self._queues.values():
+            queue.clear()
+        self._deferred.clear()
+        self._ready.clear()
+
+        for request in waiting:
+            self._remove(request)
+            if request.future is not None:
+                request.future.cancel()
+
+    def queue_depths(self) -> dict[str, int]:
+        """Get the number of waiting requests per priority."""
+        return {p.name.lower(): n for p, n in self._waiting.items()}
+
+    @property
+    def pending(self) -> int:
+        """Number of requests waiting or in flight."""
+        return sum(self._waiting.values()) + self._running
+
+    async def run(self, priority: Priority, bucket: Hashable, func: Callable[..., Awaitable[Any]], *args: Any,
+                  **kwargs: Any) -> Any:
+        """Queue a request and wait for its result."""
+
+        future = asyncio.get_running_loop().create_future()
+        await self._put(priority, bucket, lambda: func(*args, **kwargs), future)
+
+        return await future
+
+    async def enqueue(self, priority: Priority, bucket: Hashable, func: Callable[..., Awaitable[Any]], *args: Any,
+                      **kwargs: Any) -> None:
+        """Queue a request without waiting for its result. Waits only if the queue is full."""
+        await self._put(priority, bucket, lambda: func(*args, **kwargs), None)
+
+    async def _put(self, priority: Priority, bucket: Hashable, func: Callable[[], Awaitable[Any]],
+                   future: asyncio.Future | None) -> None:
+        room = self._room[priority]
+
+        if room.locked():
+            self._stats.increment('scheduler_backpressure')
+
+        await room.acquire()
+
+        self._queues[priority].append(_Request(priority, next(self._sequence), bucket, func, future,
+                                               self._stats.current_event()))
+        self._waiting[priority] += 1
+        self._stats.increment('scheduler_queued')
+        self._queued.release()
+
+    def _remove(self, request: _Request) -> None:
+        """Give the room of a request that is no longer waiting back to its queue."""
+        self._waiting[request.priority] -= 1
+        self._room[request.priority].release()
+
+    def _next_request(self) -> _Request:
+        """Get the first request of the highest non-empty priority, requests whose bucket has become idle first."""
+
+        for priority in Priority:
+            if self._ready and self._ready[0].priority <= priority:
+                return heapq.heappop(self._ready)
+
+            queue = self._queues[priority]
+            if queue:
+                return queue.popleft()
+
+        raise RuntimeError("Scheduler has been released without a queued request.")
+
+    def _release_bucket(self, bucket: Hashable) -> None:
+        """Mark a bucket idle and make its most urgent request put aside ready to be sent."""
+
+        self._busy.discard(bucket)
+
+        deferred = self._deferred.get(bucket)
+        if not deferred:
+            return
+
+        heapq.heappush(self._ready, heapq.heappop(deferred))
+        if not deferred:
+            del self._deferred[bucket]
+
+        self._queued.release()
+
+    async def _work(self) -> None:
+        while True:
+            await self._queued.acquire()
+            request = self._next_request()
+
+            if request.future is not None and request.future.cancelled():
+                self._remove(request)
+                continue
+
+            # put the request aside instead of waiting for the bucket, the worker takes the next one
+            if request.bucket in self._busy:
+                heapq.heappush(self._deferred.setdefault(request.bucket, []), request)
+                self._stats.increment('scheduler_deferred')
+                continue
+
+            self._remove(request)
+            self._busy.add(request.bucket)
+            self._running += 1
+
+            try:
+                with self._stats.continue_event(request.event):
+                    result = await request.func()
+
+            except asyncio.CancelledError:
+                if request.future is not None:
+                    request.future.cancel()
+                raise
+
+            except Exception as e:
+                self._stats.increment('scheduler_failed')
+
+                if request.future is None:
+                    logger.exception("Queued request failed.", extra={'bucket': request.bucket})
+                elif not request.future.done():
+                    request.future.set_exception(e)
+
+            else:
+                self._stats.increment('scheduler_completed')
+
+                if request.future is not None and not request.future.done():
+                    request.future.set_result(result)
+
+            finally:
+                self._running -= 1
+                self._release_bucket(request.bucket)
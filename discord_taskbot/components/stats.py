@@ -0,0 +1,263 @@
+"""
+Runtime statistics of the bot.
+"""
+
+import bisect
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+__all__ = ['BotStats', 'Histogram', 'LATENCY_BUCKETS']
+
+# per-event REST call counter, set while an event is tracked with BotStats.count_rest_calls()
+_event_rest_calls: ContextVar[list[int] | None] = ContextVar('event_rest_calls', default=None)
+
+# upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# metric labels as sorted (name, value) pairs
+Labels = tuple[tuple[str, str], ...]
+
+# collector of gauges, returns (name, labels, value) tuples
+GaugeCollector = Callable[[], Iterable[tuple[str, dict[str, str], float]]]
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        """Cumulative-on-export histogram of observed values with fixed bucket bounds."""
+
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls into. Values above all bounds give inf."""
+
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+        return float('inf')
+
+
+def _labels(labels: dict[str, str] | None) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items())) if labels else ()
+
+
+def _format_labels(labels: Labels, extra: tuple[str, str] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+
+    escaped = (v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class BotStats:
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Collection of named counters describing what the bot is doing.
+
+        REST calls are counted globally and per tracked event. As each event handler runs in its own asyncio task
+        (and therefore in its own context), concurrent events do not mix up their counts.
+
+        If enabled, labeled counters, latency histograms and gauges are collected as well and can be exported in
+        Prometheus text format. While disabled, those calls return right away. Hot paths should check enabled
+        before measuring anything.
+
+        Methods:
+            increment
+            get
+            snapshot
+            hit_rate
+            record_rest_call
+            count_rest_calls
+            current_event
+            continue_event
+            count
+            observe
+            timer
+            add_gauge_collector
+            summary
+            render_prometheus
+        """
+
+        self.enabled = enabled
+
+        self._counters: defaultdict[str, int] = defaultdict(int)
+        self._labeled_counters: defaultdict[tuple[str, Labels], int] = defaultdict(int)
+        self._histograms: dict[tuple[str, Labels], Histogram] = {}
+        self._gauge_collectors: list[GaugeCollector] = []
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        """Increase a counter."""
+        self._counters[name] += amount
+
+    def get(self, name: str) -> int:
+        """Get the value of a counter. Unknown counters are 0."""
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> dict[str, int]:
+        """Get a copy of all counters."""
+        return dict(self._counters)
+
+    def hit_rate(self, name: str) -> float:
+        """Get the hit rate of a cache from its counters '<name>_hits' and '<name>_misses'."""
+
+        hits = self.get(f'{name}_hits')
+        total = hits + self.get(f'{name}_misses')
+
+        return hits / total if total else 0.0
+
+    def record_rest_call(self) -> None:
+        """Count an outgoing REST call, both globally and for the currently tracked event."""
+        self._counters['rest_calls'] += 1
+
+        event_counter = _event_rest_calls.get()
+        if event_counter is not None:
+            event_counter[0] += 1
+
+    @contextmanager
+    def count_rest_calls(self, event: str) -> Iterator[None]:
+        """
+        Track the REST calls made while handling an event.
+        Updates the counters '<event>_events' and '<event>_rest_calls'.
+        """
+
+        token = _event_rest_calls.set([0])
+        try:
+            yield
+        finally:
+            rest_calls = _event_rest_calls.get()[0]
+            _event_rest_calls.reset(token)
+
+            self._counters[f'{event}_events'] += 1
+            self._counters[f'{event}_rest_calls'] += rest_calls
+
+    def current_event(self) -> list[int] | None:
+        """Get the REST call counter of the currently tracked event, to hand it over to another task."""
+        return _event_rest_calls.get()
+
+    @contextmanager
+    def continue_event(self, event_counter: list[int] | None) -> Iterator[None]:
+        """Count the REST calls of a block for an event that is tracked in another task."""
+
+        token = _event_rest_calls.set(event_counter)
+        try:
+            yield
+        finally:
+            _event_rest_calls.reset(token)
+
+    def count(self, name: str, labels: dict[str, str], amount: int = 1) -> None:
+        """Increase a labeled counter. Ignored while disabled."""
+        if self.enabled:
+            self._labeled_counters[(name, _labels(labels))] += amount
+
+    def observe(self, name: str, seconds: float, labels: dict[str, str] = None) -> None:
+        """Add a duration to a latency histogram. Ignored while disabled."""
+
+        if not self.enabled:
+            return
+
+        key = (name, _labels(labels))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, labels: dict[str, str] = None) -> Iterator[None]:
+        """Observe the duration of a block in a latency histogram."""
+
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    def add_gauge_collector(self, collector: GaugeCollector) -> None:
+        """Register a function that reports current values (e.g. queue depths) whenever metrics are exported."""
+        self._gauge_collectors.append(collector)
+
+    def _gauges(self) -> list[tuple[str, Labels, float]]:
+        return [(name, _labels(labels), value) for collector in self._gauge_collectors
+                for name, labels, value in collector()]
+
+    def summary(self) -> dict:
+        """Get all metrics as a JSON-serializable dict, with p50 and p99 estimates of the histograms."""
+
+        def key(name: str, labels: Labels) -> str:
+            return name + _format_labels(labels)
+
+        return {
+            'enabled': self.enabled,
+            'counters': dict(sorted(self._counters.items())),
+            'labeled_counters': {key(*k): v for k, v in sorted(self._labeled_counters.items())},
+            'histograms': {
+                key(*k): {'count': h.count, 'sum': h.sum, 'mean': h.sum / h.count if h.count else 0.0,
+                          'p50': h.quantile(0.5), 'p99': h.quantile(0.99)}
+                for k, h in sorted(self._histograms.items())
+            },
+            'gauges': {key(name, labels): value for name, labels, value in self._gauges()},
+        }
+
+    def render_prometheus(self, prefix: str = 'taskbot') -> str:
+        """Export all metrics in the Prometheus text format."""
+
+        lines = []
+
+        def header(name: str, kind: str, declared: set[str]) -> None:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        declared: set[str] = set()
+
+        for name, value in sorted(self._counters.items()):
+            header(f"{prefix}_{name}_total", 'counter', declared)
+            lines.append(f"{prefix}_{name}_total {value}")
+
+        for (name, labels), value in sorted(self._labeled_counters.items()):
+            header(f"{prefix}_{name}_total", 'counter', declared)
+            lines.append(f"{prefix}_{name}_total{_format_labels(labels)} {value}")
+
+        for (name, labels), h in sorted(self._histograms.items()):
+            metric = f"{prefix}_{name}"
+            header(metric, 'histogram', declared)
+
+            cumulative = 0
+            for bound, count in zip(h.bounds, h.counts):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+
+            lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {h.count}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {h.sum}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {h.count}")
+
+        for name, labels, value in sorted(self._gauges()):
+            header(f"{prefix}_{name}", 'gauge', declared)
+            lines.append(f"{prefix}_{name}{_format_labels(labels)} {value}")
+
+        return '\n'.join(lines) + '\n'
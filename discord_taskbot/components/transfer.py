@@ -0,0 +1,260 @@
+"""
+Streaming import and export of projects and tasks.
+"""
+
+import csv
+import json
+import os
+from collections.abc import Iterable, Iterator
+from typing import Any, TextIO
+
+from discord_taskbot.utils.constants import DEFAULT_TRANSFER_CHUNK_SIZE
+from .data_classes import Project, Task
+from .exceptions import InvalidRecord
+from .persistence import PersistenceAPI
+
+__all__ = ['RECORD_FIELDS', 'ImportResult', 'detect_format', 'read_records', 'write_records',
+           'export_records', 'import_records', 'import_progress_name']
+
+# all fields of a record; projects use tag, guild_id, display_name, description and channel_id,
+# tasks use project (the project's tag), guild_id (the project's guild), number, title, description, status,
+# assigned_to, message_id and has_thread; a missing guild_id is read as 0 (not known yet)
+RECORD_FIELDS = ('type', 'tag', 'guild_id', 'display_name', 'channel_id', 'project', 'number', 'title', 'description',
+                 'status', 'assigned_to', 'message_id', 'has_thread')
+
+
+class ImportResult:
+    __slots__ = ('records', 'skipped_records', 'projects', 'existing_projects', 'tasks')
+
+    def __init__(self) -> None:
+        """Summary of an import."""
+
+        self.records = 0
+        self.skipped_records = 0
+        self.projects = 0
+        self.existing_projects = 0
+        self.tasks = 0
+
+    def __repr__(self) -> str:
+        return (f"<ImportResult records={self.records} skipped_records={self.skipped_records} "
+                f"projects={self.projects} existing_projects={self.existing_projects} tasks={self.tasks}>")
+
+
+def detect_format(path: str) -> str:
+    """Guess the record format from a file name. Defaults to jsonl."""
+    return 'csv' if str(path).lower().endswith('.csv') else 'jsonl'
+
+
+def read_records(fp: TextIO, fmt: str) -> Iterator[dict[str, Any]]:
+    """Lazily read records from a JSONL or CSV file. Empty CSV cells are read as None."""
+
+    if fmt == 'jsonl':
+        for line_number, line in enumerate(fp, start=1):
+            if not line.strip():
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise InvalidRecord(f"Line {line_number} is not valid JSON: {e}") from None
+
+            if not isinstance(record, dict):
+                raise InvalidRecord(f"Line {line_number} is not a JSON object.")
+
+            yield record
+
+    elif fmt == 'csv':
+        for row in csv.DictReader(fp):
+            yield {k: (v if v != '' else None) for k, v in row.items() if k is not None}
+
+    else:
+        raise ValueError(f"Unknown record format '{fmt}'.")
+
+
+def write_records(fp: TextIO, fmt: str, records: Iterable[dict[str, Any]]) -> int:
+    """Write records to a JSONL or CSV file. Returns the number of written records."""
+
+    count = 0
+
+    if fmt == 'jsonl':
+        for record in records:
+            fp.write(json.dumps(record, ensure_ascii=False))
+            fp.write('\n')
+            count += 1
+
+    elif fmt == 'csv':
+        writer = csv.DictWriter(fp, fieldnames=RECORD_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+        for record in records:
+            writer.writerow(record)
+            count += 1
+
+    else:
+        raise ValueError(f"Unknown record format '{fmt}'.")
+
+    return count
+
+
+def _project_record(p: Project) -> dict[str, Any]:
+    return {
+        'type': 'project',
+        'tag': p.tag,
+        'guild_id': p.guild_id,
+        'display_name': p.display_name,
+        'description': p.description,
+        'channel_id': p.channel_id,
+    }
+
+
+def _task_record(t: Task, p: Project) -> dict[str, Any]:
+    return {
+        'type': 'task',
+        'project': p.tag,
+        'guild_id': p.guild_id,
+        'number': t.number,
+        'title': t.title,
+        'description': t.description,
+        'status': t.status,
+        'assigned_to': t.assigned_to,
+        'message_id': t.message_id,
+        'has_thread': t.has_thread,
+    }
+
+
+def export_records(db: PersistenceAPI, chunk_size: int = DEFAULT_TRANSFER_CHUNK_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Lazily export all projects, each followed by its tasks ordered by number.
+    Tasks are read in chunks by their (project, number) key, so memory use does not grow with the number of tasks.
+    """
+
+    for p in db.get_projects():
+        yield _project_record(p)
+
+        after_number = 0
+        while True:
+            tasks = db.get_tasks(p.id, after_number=after_number, limit=chunk_size)
+
+            for t in tasks:
+                yield _task_record(t, p)
+
+            if len(tasks) < chunk_size:
+                break
+
+            after_number = tasks[-1].number
+
+
+def import_progress_name(path: str) -> str:
+    """Name of the value that stores how many records of a file have been imported."""
+    return f"IMPORT_PROGRESS:{os.path.abspath(path)}"
+
+
+def _required(record: dict[str, Any], field: str, index: int) -> Any:
+    value = record.get(field)
+    if value is None or str(value).strip() == '':
+        raise InvalidRecord(f"Record {index} has no '{field}'.")
+    return value
+
+
+def _int(record: dict[str, Any], field: str, index: int, required: bool = False) -> int | None:
+    value = _required(record, field, index) if required else record.get(field)
+    if value is None or str(value).strip() == '':
+        return None
+
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidRecord(f"Field '{field}' of record {index} has to be an integer, not '{value}'.") from None
+
+
+def import_records(db: PersistenceAPI, records: Iterable[dict[str, Any]], progress_name: str = None,
+                   chunk_size: int = DEFAULT_TRANSFER_CHUNK_SIZE) -> ImportResult:
+    """
+    Import projects and tasks from records (see RECORD_FIELDS), e.g. read with read_records().
+
+    Projects are created if their tag doesn't exist in their guild yet. Tasks are inserted in chunks of chunk_size,
+    one transaction per chunk and project. Imported tasks get new numbers from the project's task counter and are not
+    posted yet; their exported number, message_id and has_thread are ignored.
+
+    If progress_name is given, the number of imported records is stored within each chunk's transaction under this
+    name. An interrupted import with the same progress_name continues after the last completed chunk.
+    """
+
+    chunk_size = max(1, int(chunk_size))
+    result = ImportResult()
+
+    done = int(db.get_value(progress_name) or 0) if progress_name else 0
+    projects: dict[tuple[int, str], Project] = {}
+
+    chunk: list[tuple] = []
+    chunk_project_id: int | None = None
+
+    def flush(index: int) -> None:
+        nonlocal chunk
+        progress = (progress_name, str(index)) if progress_name else None
+
+        if chunk:
+            db.add_tasks(chunk_project_id, chunk, progress=progress)
+            result.tasks += len(chunk)
+        elif progress:
+            db.set_value(*progress)
+
+        chunk = []
+
+    def get_project(guild_id: int, tag: str, index: int) -> Project:
+        p = projects.get((guild_id, tag)) or db.get_project(tag=tag, guild_id=guild_id)
+        if not p:
+            raise InvalidRecord(f"Record {index} references the unknown project '{tag}'.")
+
+        projects[(guild_id, tag)] = p
+        return p
+
+    index = 0
+    for index, record in enumerate(records, start=1):
+        result.records += 1
+
+        if index <= done:
+            result.skipped_records += 1
+            continue
+
+        record_type = str(record.get('type') or '').strip().lower()
+        guild_id = _int(record, 'guild_id', index) or 0
+
+        if record_type == 'project':
+            tag = str(_required(record, 'tag', index)).strip()
+
+            # a project that already exists is kept as is, e.g. after resuming an import
+            if db.get_project(tag=tag, guild_id=guild_id):
+                result.existing_projects += 1
+                continue
+
+            projects[(guild_id, tag)] = db.add_project(
+                tag=tag,
+                display_name=_required(record, 'display_name', index),
+                description=record.get('description') or '',
+                channel_id=_int(record, 'channel_id', index, required=True),
+                guild_id=guild_id,
+            )
+            result.projects += 1
+
+        elif record_type == 'task':
+            p = get_project(guild_id, str(_required(record, 'project', index)).strip(), index)
+
+            if chunk and (p.id != chunk_project_id or len(chunk) >= chunk_size):
+                flush(index - 1)
+
+            chunk_project_id = p.id
+            chunk.append((
+                _required(record, 'title', index),
+                record.get('description') or '',
+                record.get('status'),
+                _int(record, 'assigned_to', index),
+            ))
+
+        else:
+            raise InvalidRecord(f"Record {index} has an unknown type '{record.get('type')}'.")
+
+    if index > done:
+        flush(index)
+
+    return result
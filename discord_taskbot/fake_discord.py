@@ -0,0 +1,629 @@
+"""
+Local stand-in for the Discord gateway and REST API, for end-to-end load tests of the bot.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+from typing import Any
+
+import aiohttp
+from aiohttp import web
+
+__all__ = ['RestCall', 'FakeDiscord', 'patch_discord']
+
+API_PREFIX = '/api/v10'
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _json_response(data: Any, status: int = 200, headers: dict[str, str] = None) -> web.Response:
+    # discord.py only decodes bodies whose content type is exactly 'application/json' (no charset)
+    return web.Response(body=json.dumps(data).encode(), status=status,
+                        headers={'Content-Type': 'application/json', **(headers or {})})
+
+
+class RestCall:
+    __slots__ = ('method', 'route', 'status', 'started', 'duration')
+
+    def __init__(self, method: str, route: str, status: int, started: float, duration: float) -> None:
+        """A REST call received by the fake server. started is a time.perf_counter() value, duration in seconds."""
+
+        self.method = method
+        self.route = route
+        self.status = status
+        self.started = started
+        self.duration = duration
+
+    def __repr__(self) -> str:
+        return f"<RestCall {self.method} {self.route} status={self.status} duration={self.duration:.4f}>"
+
+
+def patch_discord(rest_url: str, gateway_url: str) -> None:
+    """Point discord.py's REST, webhook and gateway URLs to a fake server, e.g. in a separate shard process."""
+    import discord.http
+    import discord.webhook.async_
+    from discord.gateway import DiscordWebSocket
+
+    discord.http.Route.BASE = rest_url
+    discord.webhook.async_.Route.BASE = rest_url
+
+    # discord.py >= 2.3 connects to a fixed gateway instead of asking GET /gateway
+    if hasattr(DiscordWebSocket, 'DEFAULT_GATEWAY'):
+        import yarl
+        DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(gateway_url)
+
+
+class _GatewaySession:
+    __slots__ = ('ws', 'sequence', 'shard')
+
+    def __init__(self, ws: web.WebSocketResponse) -> None:
+        self.ws = ws
+        self.sequence = 0
+
+        # (shard id, shard count) sent with identify, None if the client is not sharded
+        self.shard: tuple[int, int] | None = None
+
+    def receives(self, guild_id: int) -> bool:
+        """Whether the events of a guild are sent to this session's shard."""
+        return self.shard is None or (guild_id >> 22) % self.shard[1] == self.shard[0]
+
+    async def send(self, payload: dict[str, Any]) -> None:
+        await self.ws.send_str(json.dumps(payload))
+
+    async def dispatch(self, event: str, data: dict[str, Any]) -> None:
+        self.sequence += 1
+        await self.send({'op': 0, 't': event, 's': self.sequence, 'd': data})
+
+
+class FakeDiscord:
+
+    def __init__(self, channels: int = 1, rate_limit: tuple[int, float] = (5, 5.0), latency: float = 0.0,
+                 guilds: int = 1) -> None:
+        """
+        Minimal Discord gateway and REST server with one or more guilds.
+
+        The gateway answers the identify handshake with READY and GUILD_CREATE, acknowledges heartbeats and
+        forwards events passed to dispatch(). Sharded clients only get the guilds and events of their shards, like
+        on Discord (shard id = (guild id >> 22) % shard count). The REST API implements the routes the bot uses
+        (messages, reactions, threads, users, interactions and webhooks, command sync). Unknown messages are created
+        on first access, so tasks can be seeded with arbitrary message ids. Channel histories list the stored
+        messages with their reactions and threads; add_message(), add_reaction(), remove_message() and
+        remove_thread() change them without gateway events, like changes while the bot is offline.
+
+        Every REST call is recorded with its route, status and duration. Rate limits are simulated per route and
+        major parameter with Discord's headers; exceeding them is answered with 429.
+
+        Attributes:
+            channels    Number of text channels per guild.
+            guilds      Number of guilds. Their ids are spread evenly over the shards.
+            rate_limit  (requests, seconds) allowed per rate limit bucket. Interaction responses are not limited.
+            latency     Seconds every REST response is delayed, to simulate the network round trip.
+        """
+
+        self._snowflakes = itertools.count(1_100_000_000_000_000_000)
+        self._rate_limit = rate_limit
+        self._latency = latency
+
+        # consecutive guilds differ in the timestamp part of their id, which decides their shard
+        first_guild_id = self.snowflake()
+        self.guild_ids = [first_guild_id + (i << 22) for i in range(max(1, guilds))]
+        self.guild_id = self.guild_ids[0]
+
+        self.application_id = self.snowflake()
+        self.bot_user = self._user(self.application_id, 'taskbot', bot=True)
+
+        # {channel id: guild id}, channels of all guilds
+        self.channel_guilds = {self.snowflake(): g for g in self.guild_ids for _ in range(max(1, channels))}
+        self.channel_ids = list(self.channel_guilds)
+
+        self.calls: list[RestCall] = []
+        self.interaction_responses: dict[int, float] = {}
+
+        self._messages: dict[int, dict[str, Any]] = {}
+
+        # {message id: {emoji: [user ids in reaction order]}}
+        self._reactions: dict[int, dict[str, list[int]]] = {}
+        self._threads: dict[int, dict[str, Any]] = {}
+        self._buckets: dict[tuple, list[float | int]] = {}
+        self._sessions: set[_GatewaySession] = set()
+        self._identified = asyncio.Condition()
+
+        self._runner: web.AppRunner | None = None
+        self._port: int | None = None
+
+    # -- lifecycle --
+
+    @property
+    def port(self) -> int | None:
+        return self._port
+
+    @property
+    def rest_url(self) -> str:
+        return f"http://127.0.0.1:{self._port}{API_PREFIX}"
+
+    @property
+    def gateway_url(self) -> str:
+        return f"ws://127.0.0.1:{self._port}/"
+
+    async def start(self, port: int = 0) -> None:
+        """Start the server on localhost. Port 0 picks a free port."""
+
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get('/', self._gateway)
+        self._add_rest_routes(app.router)
+
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+
+        await web.TCPSite(self._runner, '127.0.0.1', port).start()
+        self._port = self._runner.addresses[0][1]
+
+    async def close(self) -> None:
+        for session in list(self._sessions):
+            await session.ws.close()
+
+        if self._runner:
+            await self._runner.cleanup()
+
+    def patch_discord(self) -> None:
+        """Point discord.py's REST, webhook and gateway URLs to this server."""
+        patch_discord(self.rest_url, self.gateway_url)
+
+    async def wait_until_identified(self, sessions: int = 1, timeout: float = 30.0) -> None:
+        """Wait until the given number of gateway sessions (one per shard) has identified."""
+
+        async def identified() -> None:
+            async with self._identified:
+                await self._identified.wait_for(lambda: len(self._sessions) >= sessions)
+
+        await asyncio.wait_for(identified(), timeout)
+
+    # -- payloads --
+
+    def snowflake(self) -> int:
+        return next(self._snowflakes)
+
+    def _user(self, user_id: int, name: str, bot: bool = False) -> dict[str, Any]:
+        return {'id': str(user_id), 'username': name, 'global_name': name, 'discriminator': '0', 'avatar': None,
+                'bot': bot}
+
+    def member(self, user_id: int, name: str = None) -> dict[str, Any]:
+        """Guild member payload of a (non-bot) user."""
+        return {'user': self._user(user_id, name or f"user{user_id}"), 'roles': [], 'joined_at': _now_iso(),
+                'deaf': False, 'mute': False, 'flags': 0}
+
+    def _channel(self, channel_id: int, position: int) -> dict[str, Any]:
+        return {'id': str(channel_id), 'type': 0, 'guild_id': str(self.channel_guilds[channel_id]),
+                'name': f"project-{position}",
+                'position': position, 'permission_overwrites': [], 'nsfw': False, 'parent_id': None, 'topic': None,
+                'last_message_id': None, 'rate_limit_per_user': 0, 'flags': 0}
+
+    def _guild(self, guild_id: int) -> dict[str, Any]:
+        bot_member = {'user': self.bot_user, 'roles': [], 'joined_at': _now_iso(), 'deaf': False, 'mute': False,
+                      'flags': 0}
+
+        return {
+            'id': str(guild_id), 'name': 'Load Test', 'icon': None, 'splash': None, 'discovery_splash': None,
+            'owner_id': str(self.application_id), 'afk_channel_id': None, 'afk_timeout': 300,
+            'verification_level': 0, 'default_message_notifications': 0, 'explicit_content_filter': 0,
+            'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': str(2 ** 41 - 1),
+                       'position': 0, 'color': 0, 'hoist': False, 'managed': False, 'mentionable': False,
+                       'flags': 0}],
+            'emojis': [], 'stickers': [], 'features': [], 'mfa_level': 0, 'application_id': None,
+            'system_channel_id': None, 'system_channel_flags': 0, 'rules_channel_id': None, 'vanity_url_code': None,
+            'description': None, 'banner': None, 'premium_tier': 0, 'premium_subscription_count': 0,
+            'preferred_locale': 'en-US', 'public_updates_channel_id': None, 'nsfw_level': 0,
+            'premium_progress_bar_enabled': False, 'joined_at': _now_iso(), 'large': False, 'unavailable': False,
+            'member_count': 1, 'members': [bot_member], 'voice_states': [], 'presences': [], 'threads': [],
+            'stage_instances': [], 'guild_scheduled_events': [],
+            'channels': [self._channel(c, i) for i, c in enumerate(self.channel_ids)
+                         if self.channel_guilds[c] == guild_id],
+        }
+
+    def message(self, channel_id: int, message_id: int = None, content: str = '',
+                author: dict[str, Any] = None) -> dict[str, Any]:
+        """Message payload. The bot is the author if none given."""
+        return {'id': str(message_id or self.snowflake()), 'channel_id': str(channel_id),
+                'guild_id': str(self.channel_guilds.get(channel_id, self.guild_id)), 'author': author or self.bot_user,
+                'content': content, 'timestamp': _now_iso(), 'edited_timestamp': None, 'tts': False,
+                'mention_everyone': False,
+                'mentions': [], 'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0,
+                'flags': 0, 'components': []}
+
+    def thread(self, channel_id: int, thread_id: int, name: str, newly_created: bool = False) -> dict[str, Any]:
+        """Public thread payload."""
+        return {'id': str(thread_id), 'guild_id': str(self.channel_guilds[channel_id]), 'parent_id': str(channel_id),
+                'owner_id': str(self.application_id), 'name': name, 'type': 11, 'last_message_id': None,
+                'message_count': 0, 'member_count': 1, 'rate_limit_per_user': 0, 'flags': 0,
+                'thread_metadata': {'archived': False, 'auto_archive_duration': 1440,
+                                    'archive_timestamp': _now_iso(), 'locked': False},
+                'newly_created': newly_created}
+
+    def interaction(self, name: str, channel_id: int, user_id: int, options: dict[str, Any] = None) -> dict[str, Any]:
+        """Slash command interaction payload."""
+        return {
+            'id': str(self.snowflake()), 'application_id': str(self.application_id), 'type': 2,
+            'token': f"token-{self.snowflake()}", 'version': 1, 'guild_id': str(self.channel_guilds[channel_id]),
+            'channel_id': str(channel_id), 'channel': self._channel(channel_id, self.channel_ids.index(channel_id)),
+            'member': {**self.member(user_id), 'permissions': str(2 ** 41 - 1)},
+            'app_permissions': str(2 ** 41 - 1), 'locale': 'en-US', 'guild_locale': 'en-US', 'entitlements': [],
+            'authorizing_integration_owners': {'0': str(self.channel_guilds[channel_id])},
+            'attachment_size_limit': 10 * 1024 * 1024,
+            'data': {'id': str(self.snowflake()), 'name': name, 'type': 1,
+                     'options': [{'name': k, 'type': 3, 'value': v} for k, v in (options or {}).items()]},
+        }
+
+    # -- changes while the bot is offline --
+
+    def add_message(self, channel_id: int, message_id: int = None, content: str = '',
+                    author: dict[str, Any] = None) -> int:
+        """Store a message without a gateway event, e.g. a task message sent before the bot started. Returns its id."""
+        message = self.message(channel_id, message_id, content, author)
+        self._messages[int(message['id'])] = message
+        return int(message['id'])
+
+    def add_reaction(self, message_id: int, emoji: str, user_id: int) -> None:
+        """Add a reaction to a stored message without a gateway event."""
+        users = self._reactions.setdefault(message_id, {}).setdefault(emoji, [])
+        if user_id not in users:
+            users.append(user_id)
+
+    def remove_message(self, message_id: int) -> None:
+        """Delete a stored message with its reactions and thread without a gateway event."""
+        self._messages.pop(message_id, None)
+        self._reactions.pop(message_id, None)
+        self._threads.pop(message_id, None)
+
+    def remove_thread(self, thread_id: int) -> None:
+        """Delete a thread without a gateway event."""
+        self._threads.pop(thread_id, None)
+
+    # -- gateway --
+
+    async def dispatch(self, event: str, data: dict[str, Any]) -> None:
+        """Send a gateway event to all identified clients, or only to the shard of the event's guild."""
+
+        guild_id = int(data['guild_id']) if data.get('guild_id') else None
+
+        for session in list(self._sessions):
+            if guild_id is None or session.receives(guild_id):
+                await session.dispatch(event, data)
+
+    async def _gateway(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        session = _GatewaySession(ws)
+        await session.send({'op': 10, 'd': {'heartbeat_interval': 41250}})
+
+        try:
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    continue
+
+                payload = json.loads(msg.data)
+                op = payload.get('op')
+
+                if op == 1:
+                    await session.send({'op': 11})
+
+                elif op == 2:
+                    shard = (payload.get('d') or {}).get('shard')
+                    session.shard = tuple(shard) if shard else None
+                    guild_ids = [g for g in self.guild_ids if session.receives(g)]
+
+                    await session.dispatch('READY', {
+                        'v': 10, 'user': self.bot_user, 'guilds': [{'id': str(g), 'unavailable': True}
+                                                                   for g in guild_ids],
+                        'session_id': f"session-{self.snowflake()}", 'resume_gateway_url': self.gateway_url,
+                        'application': {'id': str(self.application_id), 'flags': 0}, 'private_channels': [],
+                        'relationships': [], 'shard': shard,
+                    })
+                    for guild_id in guild_ids:
+                        await session.dispatch('GUILD_CREATE', self._guild(guild_id))
+
+                    async with self._identified:
+                        self._sessions.add(session)
+                        self._identified.notify_all()
+
+                elif op == 6:
+                    # sessions can't be resumed, the client identifies again
+                    await session.send({'op': 9, 'd': False})
+        finally:
+            self._sessions.discard(session)
+
+        return ws
+
+    # -- REST --
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler: Callable[[web.Request], Awaitable[web.StreamResponse]]
+                          ) -> web.StreamResponse:
+        if not request.path.startswith(API_PREFIX):
+            return await handler(request)
+
+        started = time.perf_counter()
+        resource = request.match_info.route.resource
+        route = resource.canonical[len(API_PREFIX):] if resource is not None else request.path
+
+        if self._latency:
+            await asyncio.sleep(self._latency)
+
+        headers = self._take_rate_limit(request, route)
+
+        if headers.get('Retry-After'):
+            retry_after = float(headers['Retry-After'])
+            response = _json_response({'message': "You are being rate limited.", 'retry_after': retry_after,
+                                       'global': False, 'code': 0}, status=429, headers=headers)
+        else:
+            response = await handler(request)
+            response.headers.update(headers)
+
+        self.calls.append(RestCall(request.method, route, response.status, started, time.perf_counter() - started))
+        return response
+
+    def _take_rate_limit(self, request: web.Request, route: str) -> dict[str, str]:
+        """Count a request against its bucket. Returns rate limit headers, with Retry-After if it is exhausted."""
+
+        # discord.py treats 429s without a Via header as a Cloudflare ban
+        headers = {'Via': '1.1 google'}
+
+        if route.startswith('/interactions') or route.startswith('/users/@me') or route.startswith('/oauth2'):
+            return headers
+
+        limit, window = self._rate_limit
+        major = next((request.match_info[k] for k in ('channel_id', 'guild_id', 'webhook_id')
+                      if k in request.match_info), None)
+        key = (request.method, route, major)
+
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket[0] <= now:
+            bucket = self._buckets[key] = [now + window, limit]
+
+        reset_after = bucket[0] - now
+        headers.update({
+            'X-RateLimit-Limit': str(limit),
+            'X-RateLimit-Reset': f"{time.time() + reset_after:.3f}",
+            'X-RateLimit-Reset-After': f"{reset_after:.3f}",
+            'X-RateLimit-Bucket': f"{abs(hash((request.method, route))):x}",
+        })
+
+        if bucket[1] <= 0:
+            headers.update({'X-RateLimit-Remaining': '0', 'X-RateLimit-Scope': 'user',
+                            'Retry-After': f"{reset_after:.3f}"})
+            return headers
+
+        bucket[1] -= 1
+        headers['X-RateLimit-Remaining'] = str(bucket[1])
+        return headers
+
+    def _add_rest_routes(self, router: web.UrlDispatcher) -> None:
+        p = API_PREFIX
+        router.add_get(p + '/gateway', self._get_gateway)
+        router.add_get(p + '/gateway/bot', self._get_gateway)
+        router.add_get(p + '/users/@me', self._get_me)
+        router.add_get(p + '/oauth2/applications/@me', self._get_application)
+        router.add_get(p + '/users/{user_id}', self._get_user)
+        router.add_put(p + '/applications/{application_id}/commands', self._put_commands)
+        router.add_put(p + '/applications/{application_id}/guilds/{guild_id}/commands', self._put_commands)
+        router.add_get(p + '/channels/{channel_id}', self._get_channel)
+        router.add_patch(p + '/channels/{channel_id}', self._patch_channel)
+        router.add_get(p + '/channels/{channel_id}/messages', self._get_messages)
+        router.add_post(p + '/channels/{channel_id}/messages', self._post_message)
+        router.add_get(p + '/channels/{channel_id}/messages/{message_id}', self._get_message)
+        router.add_patch(p + '/channels/{channel_id}/messages/{message_id}', self._patch_message)
+        router.add_delete(p + '/channels/{channel_id}/messages/{message_id}', self._delete_message)
+        router.add_get(p + '/channels/{channel_id}/messages/{message_id}/reactions/{emoji}', self._get_reactions)
+        router.add_put(p + '/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/{user_id}',
+                       self._put_reaction)
+        router.add_delete(p + '/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/{user_id}',
+                          self._delete_reaction)
+        router.add_post(p + '/channels/{channel_id}/messages/{message_id}/threads', self._post_thread)
+        router.add_put(p + '/channels/{channel_id}/messages/pins/{message_id}', self._no_content)
+        router.add_put(p + '/channels/{channel_id}/pins/{message_id}', self._no_content)
+        router.add_post(p + '/interactions/{interaction_id}/{token}/callback', self._post_interaction_callback)
+        router.add_post(p + '/webhooks/{webhook_id}/{token}', self._post_webhook_message)
+        router.add_get(p + '/webhooks/{webhook_id}/{token}/messages/{message_id}', self._get_webhook_message)
+        router.add_patch(p + '/webhooks/{webhook_id}/{token}/messages/{message_id}', self._get_webhook_message)
+        router.add_delete(p + '/webhooks/{webhook_id}/{token}/messages/{message_id}', self._no_content)
+        router.add_route('*', p + '/{tail:.*}', self._not_found)
+
+    async def _body(self, request: web.Request) -> dict[str, Any]:
+        """JSON body of a request, also from multipart requests (messages with attachments or followups)."""
+
+        if request.content_type == 'application/json':
+            return await request.json()
+
+        if request.content_type.startswith('multipart/'):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.name == 'payload_json':
+                    return json.loads(await part.text())
+
+        return {}
+
+    async def _not_found(self, request: web.Request) -> web.Response:
+        return _json_response({'message': '404: Not Found', 'code': 0}, status=404)
+
+    async def _no_content(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def _get_gateway(self, request: web.Request) -> web.Response:
+        return _json_response({'url': self.gateway_url, 'shards': 1,
+                               'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0,
+                                                       'max_concurrency': 1}})
+
+    async def _get_me(self, request: web.Request) -> web.Response:
+        return _json_response({**self.bot_user, 'verified': True, 'mfa_enabled': False, 'flags': 0})
+
+    async def _get_application(self, request: web.Request) -> web.Response:
+        return _json_response({
+            'id': str(self.application_id), 'name': 'taskbot', 'icon': None, 'description': '', 'summary': '',
+            'rpc_origins': [], 'bot_public': True, 'bot_require_code_grant': False, 'owner': self._user(1, 'owner'),
+            'verify_key': '0' * 64, 'team': None, 'flags': 0, 'tags': [], 'redirect_uris': [],
+        })
+
+    async def _get_user(self, request: web.Request) -> web.Response:
+        user_id = int(request.match_info['user_id'])
+        return _json_response(self._user(user_id, f"user{user_id}"))
+
+    async def _put_commands(self, request: web.Request) -> web.Response:
+        commands = await self._body(request)
+        return _json_response([
+            {'type': 1, 'options': [], 'default_member_permissions': None, 'dm_permission': True, 'nsfw': False,
+             **c, 'id': str(self.snowflake()), 'application_id': str(self.application_id),
+             'version': str(self.snowflake())}
+            for c in commands
+        ])
+
+    async def _get_channel(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+
+        if channel_id in self._threads:
+            return _json_response(self._threads[channel_id])
+
+        if channel_id in self.channel_ids:
+            return _json_response(self._channel(channel_id, self.channel_ids.index(channel_id)))
+
+        return await self._not_found(request)
+
+    async def _patch_channel(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        body = await self._body(request)
+
+        thread = self._threads.get(channel_id)
+        if thread is None:
+            return await self._get_channel(request)
+
+        if 'name' in body:
+            thread['name'] = body['name']
+        for key in ('archived', 'locked'):
+            if key in body:
+                thread['thread_metadata'][key] = body[key]
+
+        return _json_response(thread)
+
+    def _stored_message(self, channel_id: int, message_id: int) -> dict[str, Any]:
+        message = self._messages.get(message_id)
+        if message is None:
+            message = self._messages[message_id] = self.message(channel_id, message_id)
+        return message
+
+    def _history_message(self, message: dict[str, Any]) -> dict[str, Any]:
+        """Stored message with its reactions and thread, as listed in a channel's history."""
+
+        message_id = int(message['id'])
+        reactions = [{'emoji': {'id': None, 'name': emoji}, 'count': len(users), 'me': self.application_id in users,
+                      'me_burst': False, 'count_details': {'burst': 0, 'normal': len(users)}, 'burst_colors': []}
+                     for emoji, users in self._reactions.get(message_id, {}).items() if users]
+
+        message = {**message, 'reactions': reactions}
+        if message_id in self._threads:
+            message['thread'] = self._threads[message_id]
+        return message
+
+    async def _get_messages(self, request: web.Request) -> web.Response:
+        channel_id = int(request.match_info['channel_id'])
+        before = int(request.query.get('before', 2 ** 63))
+        after = int(request.query.get('after', 0))
+        limit = int(request.query.get('limit', 50))
+
+        message_ids = sorted((m for m, message in self._messages.items()
+                              if int(message['channel_id']) == channel_id and after < m < before),
+                             reverse='after' not in request.query)
+
+        # Discord lists the messages newest first, also those after a message
+        return _json_response(sorted((self._history_message(self._messages[m]) for m in message_ids[:limit]),
+                                     key=lambda message: int(message['id']), reverse=True))
+
+    async def _delete_message(self, request: web.Request) -> web.Response:
+        self.remove_message(int(request.match_info['message_id']))
+        return web.Response(status=204)
+
+    def _reaction_user_id(self, request: web.Request) -> int:
+        user_id = request.match_info['user_id']
+        return self.application_id if user_id == '@me' else int(user_id)
+
+    async def _get_reactions(self, request: web.Request) -> web.Response:
+        users = self._reactions.get(int(request.match_info['message_id']), {}).get(request.match_info['emoji'], [])
+        after = int(request.query.get('after', 0))
+        limit = int(request.query.get('limit', 25))
+
+        return _json_response([self._user(u, f"user{u}", bot=u == self.application_id)
+                               for u in sorted(users) if u > after][:limit])
+
+    async def _put_reaction(self, request: web.Request) -> web.Response:
+        self.add_reaction(int(request.match_info['message_id']), request.match_info['emoji'],
+                          self._reaction_user_id(request))
+        return web.Response(status=204)
+
+    async def _delete_reaction(self, request: web.Request) -> web.Response:
+        users = self._reactions.get(int(request.match_info['message_id']), {}).get(request.match_info['emoji'], [])
+        user_id = self._reaction_user_id(request)
+        if user_id in users:
+            users.remove(user_id)
+        return web.Response(status=204)
+
+    async def _post_message(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        message = self.message(int(request.match_info['channel_id']), content=body.get('content') or '')
+        self._messages[int(message['id'])] = message
+        return _json_response(message)
+
+    async def _get_message(self, request: web.Request) -> web.Response:
+        return _json_response(self._stored_message(int(request.match_info['channel_id']),
+                                                   int(request.match_info['message_id'])))
+
+    async def _patch_message(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        message = self._stored_message(int(request.match_info['channel_id']), int(request.match_info['message_id']))
+
+        if 'content' in body:
+            message['content'] = body['content']
+        message['edited_timestamp'] = _now_iso()
+
+        return _json_response(message)
+
+    async def _post_thread(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        channel_id = int(request.match_info['channel_id'])
+        thread_id = int(request.match_info['message_id'])
+
+        thread = self._threads[thread_id] = self.thread(channel_id, thread_id, body.get('name', 'thread'))
+
+        # like Discord, announce the new thread on the gateway
+        asyncio.create_task(self.dispatch('THREAD_CREATE', {**thread, 'newly_created': True}))
+        return _json_response(thread)
+
+    async def _post_interaction_callback(self, request: web.Request) -> web.Response:
+        interaction_id = int(request.match_info['interaction_id'])
+        self.interaction_responses.setdefault(interaction_id, time.perf_counter())
+
+        # discord.py >= 2.5 asks for the callback response
+        if request.query.get('with_response', '').lower() not in ('1', 'true'):
+            return web.Response(status=204)
+
+        body = await self._body(request)
+        resource: dict[str, Any] = {'type': body.get('type', 4)}
+        if resource['type'] in (4, 7):
+            resource['message'] = self.message(self.channel_ids[0], content=body.get('data', {}).get('content') or '')
+
+        return _json_response({
+            'interaction': {'id': str(interaction_id), 'type': 2, 'response_message_loading': resource['type'] == 5,
+                            'response_message_ephemeral': False},
+            'resource': resource,
+        })
+
+    async def _post_webhook_message(self, request: web.Request) -> web.Response:
+        body = await self._body(request)
+        return _json_response(self.message(self.channel_ids[0], content=body.get('content') or ''))
+
+    async def _get_webhook_message(self, request: web.Request) -> web.Response:
+        return _json_response(self.message(self.channel_ids[0]))
@@ -0,0 +1,378 @@
+"""
+Load driver for end-to-end tests of the bot against the local fake Discord server.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from discord_taskbot.components.reconcile import reconcile_mark_name
+from discord_taskbot.fake_discord import FakeDiscord, patch_discord
+
+__all__ = ['SCENARIOS', 'run_load_test', 'run_shard_scaling_test']
+
+# scenario: gateway event sent per step
+SCENARIOS = {
+    'reaction': 'MESSAGE_REACTION_ADD',
+    'message': 'MESSAGE_CREATE',
+    'thread': 'THREAD_CREATE',
+    'command': 'INTERACTION_CREATE',
+}
+
+# seconds between the checks whether the bot has finished the work of a scenario
+_DRAIN_POLL_INTERVAL = 0.05
+
+# task actions used by the reaction scenario (opening discussions creates threads once per task only)
+_REACTION_ACTIONS = ('pending', 'in_progress', 'pending_merge', 'self_assign', 'done')
+
+
+def _latencies(samples: list[float]) -> dict[str, float]:
+    """Summary of durations (seconds) in milliseconds."""
+
+    if not samples:
+        return {'count': 0}
+
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000
+
+    return {'count': len(ordered), 'p50_ms': percentile(0.50), 'p99_ms': percentile(0.99),
+            'max_ms': ordered[-1] * 1000}
+
+
+def _seed_tasks(api: Any, fake: FakeDiscord, tasks: int) -> list[tuple[int, int]]:
+    """
+    Create one project per channel of the fake server and spread posted tasks over them.
+    Returns (channel id, message id) of every task.
+    """
+
+    task_messages: list[tuple[int, int]] = []
+
+    for i, channel_id in enumerate(fake.channel_ids):
+        project = api.add_project(f"LT{i}", f"Load test {i}", "Load test project.", channel_id,
+                                  fake.channel_guilds[channel_id])
+        share = tasks // len(fake.channel_ids) + (1 if i < tasks % len(fake.channel_ids) else 0)
+
+        for t in api.add_tasks(project.id, [(f"Task {n}", "Load test task.") for n in range(share)]):
+            message_id = fake.snowflake()
+            api.update_task(t.id, message_id=message_id)
+            task_messages.append((channel_id, message_id))
+
+        # the seeded messages exist on first access only, the startup reconciliation must not take them as deleted
+        api.set_value(reconcile_mark_name(channel_id), fake.snowflake())
+
+    return task_messages
+
+
+def _reaction_event(fake: FakeDiscord, rng: random.Random, channel_id: int, message_id: int, user_id: int,
+                    emojis: dict[str, str]) -> dict[str, Any]:
+    return {
+        'user_id': str(user_id), 'channel_id': str(channel_id), 'message_id': str(message_id),
+        'guild_id': str(fake.channel_guilds[channel_id]), 'member': fake.member(user_id), 'burst': False, 'type': 0,
+        'emoji': {'id': None, 'name': emojis[rng.choice(_REACTION_ACTIONS)]},
+    }
+
+
+async def _wait_until_quiet(fake: FakeDiscord, quiet: float, timeout: float) -> None:
+    """Wait until the bot has not made a REST call for quiet seconds (pending renders and queued writes are done)."""
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        last = fake.calls[-1].started + fake.calls[-1].duration if fake.calls else 0.0
+        if time.perf_counter() - last >= quiet:
+            return
+        await asyncio.sleep(quiet / 4)
+
+
+async def _wait_until_drained(client: Any, fake: FakeDiscord, handlers_running: Callable[[], int],
+                              interactions: Iterable[int], timeout: float) -> bool:
+    """
+    Wait until the work caused by the events of a scenario is done: no event handler is running, the render queues
+    and the scheduler are empty and every sent interaction has been answered. Work can hand over to the next stage
+    across an await, so the bot has to be idle on two consecutive polls. Returns False on timeout.
+    """
+
+    deadline = time.monotonic() + timeout
+    idle_polls = 0
+
+    while time.monotonic() < deadline:
+        idle = (not handlers_running() and not client.render_queue.pending and not client.board_queue.pending
+                and not client.scheduler.pending and all(i in fake.interaction_responses for i in interactions))
+
+        idle_polls = idle_polls + 1 if idle else 0
+        if idle_polls >= 2:
+            return True
+
+        await asyncio.sleep(_DRAIN_POLL_INTERVAL)
+
+    return False
+
+
+async def run_load_test(scenarios: list[str], rate: float = 20.0, duration: float = 10.0, tasks: int = 100,
+                        users: int = 20, channels: int = 2, rate_limit: tuple[int, float] = (5, 5.0),
+                        latency: float = 0.0, seed: int = 0, drain_timeout: float = 600.0) -> dict[str, Any]:
+    """
+    Run the bot against a fake Discord server and send events of each scenario at rate events per second for
+    duration seconds. Returns a JSON-serializable report per scenario.
+
+    Handler latency is measured around every event handler the client runs (Client._run_event). Commands are not
+    run as client events, so for them the time from sending the interaction until the bot's interaction response
+    is reported instead. REST calls per event count every call of a scenario, including deferred renders and queued
+    writes: a scenario ends when all of them are done and every interaction has been answered. drained is False if
+    that took longer than drain_timeout seconds.
+
+    The bot uses a temporary database seeded with one project per channel and tasks posted in those channels.
+    """
+
+    rng = random.Random(seed)
+    fake = FakeDiscord(channels=channels, rate_limit=rate_limit, latency=latency)
+    await fake.start()
+    fake.patch_discord()
+
+    tmp = tempfile.TemporaryDirectory()
+
+    # the bot reads its configuration from the environment when it is imported
+    os.environ.update({'DB_PATH': str(Path(tmp.name) / 'loadtest.db'), 'DB_ECHO': 'FALSE', 'BACKUP_INTERVAL': '0'})
+    from discord_taskbot.bot import BOT
+
+    # seed projects and posted tasks
+    task_messages = _seed_tasks(BOT.db.api, fake, tasks)
+
+    user_ids = [fake.snowflake() for _ in range(max(1, users))]
+    emojis = BOT.db.api.get_task_action_emoji_mapping()
+
+    # time every event handler and count the running ones
+    handler_times: list[tuple[str, float, float]] = []
+    handlers_running = 0
+    run_event = BOT._run_event
+
+    async def timed_run_event(coro, event_name: str, *args: Any, **kwargs: Any) -> None:
+        nonlocal handlers_running
+
+        started = time.perf_counter()
+        handlers_running += 1
+        try:
+            await run_event(coro, event_name, *args, **kwargs)
+        finally:
+            handlers_running -= 1
+            handler_times.append((event_name, started, time.perf_counter() - started))
+
+    BOT._run_event = timed_run_event
+
+    bot_task = asyncio.create_task(BOT.start('fake-token'))
+    report: dict[str, Any] = {}
+
+    try:
+        await fake.wait_until_identified()
+        await BOT.wait_until_ready()
+        await _wait_until_quiet(fake, quiet=1.0, timeout=30.0)
+
+        # on_ready starts the reconciliation of the project channels, both are kept out of the scenarios
+        while not any(event_name == 'on_ready' for event_name, _, _ in handler_times):
+            await asyncio.sleep(0.05)
+        await BOT.wait_until_reconciled()
+
+        for scenario in scenarios:
+            if scenario not in SCENARIOS:
+                raise ValueError(f"Unknown scenario '{scenario}'.")
+
+            first_call = len(fake.calls)
+            first_handler = len(handler_times)
+            sent_interactions: dict[int, float] = {}
+            events = max(1, int(rate * duration))
+            started = time.perf_counter()
+
+            for n in range(events):
+                # keep the event rate independent of how long dispatching takes
+                delay = started + n / rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                channel_id, message_id = rng.choice(task_messages)
+                user_id = rng.choice(user_ids)
+
+                if scenario == 'reaction':
+                    await fake.dispatch('MESSAGE_REACTION_ADD',
+                                        _reaction_event(fake, rng, channel_id, message_id, user_id, emojis))
+
+                elif scenario == 'message':
+                    await fake.dispatch('MESSAGE_CREATE', {
+                        **fake.message(channel_id, content=f"message {n}", author=fake.member(user_id)['user']),
+                        'member': fake.member(user_id),
+                    })
+
+                elif scenario == 'thread':
+                    await fake.dispatch('THREAD_CREATE', fake.thread(channel_id, message_id, f"thread {n}",
+                                                                     newly_created=True))
+
+                elif scenario == 'command':
+                    interaction = fake.interaction('newtask', channel_id, user_id,
+                                                   {'title': f"Load test task {n}", 'description': "Created."})
+                    sent_interactions[int(interaction['id'])] = time.perf_counter()
+                    await fake.dispatch('INTERACTION_CREATE', interaction)
+
+            send_seconds = time.perf_counter() - started
+            drained = await _wait_until_drained(BOT, fake, lambda: handlers_running, sent_interactions,
+                                                timeout=drain_timeout)
+
+            calls = fake.calls[first_call:]
+            handlers: defaultdict[str, list[float]] = defaultdict(list)
+            for event_name, _, seconds in handler_times[first_handler:]:
+                handlers[event_name].append(seconds)
+
+            result = {
+                'event': SCENARIOS[scenario],
+                'events': events,
+                'target_rate': rate,
+                'achieved_rate': events / send_seconds if send_seconds else 0.0,
+                'handler_latency': {name: _latencies(samples) for name, samples in sorted(handlers.items())},
+                'rest_calls': len(calls),
+                'rest_calls_per_event': len(calls) / events,
+                'rate_limited': sum(1 for c in calls if c.status == 429),
+                'rest_routes': dict(Counter(f"{c.method} {c.route}" for c in calls).most_common()),
+                'rest_latency': _latencies([c.duration for c in calls]),
+                'drained': drained,
+            }
+
+            if sent_interactions:
+                result['response_latency'] = _latencies([
+                    fake.interaction_responses[i] - sent for i, sent in sent_interactions.items()
+                    if i in fake.interaction_responses
+                ])
+                result['unanswered_interactions'] = sum(1 for i in sent_interactions
+                                                        if i not in fake.interaction_responses)
+
+            report[scenario] = result
+
+    finally:
+        await BOT.close()
+        await asyncio.gather(bot_task, return_exceptions=True)
+        await fake.close()
+        tmp.cleanup()
+
+    return report
+
+
+# REST call every handled task reaction makes
+_REACTION_REMOVAL_ROUTE = ('DELETE', '/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/{user_id}')
+
+
+def _run_shard_process(rest_url: str, gateway_url: str, environment: dict[str, str]) -> None:
+    """Entry point of a shard process: run the bot against the fake server until the process is terminated."""
+
+    os.environ.update(environment)
+    patch_discord(rest_url, gateway_url)
+
+    from discord_taskbot.bot import BOT
+    asyncio.run(BOT.start('fake-token'))
+
+
+async def _measure_shards(shards: int, events: int, guilds: int, tasks: int, users: int, latency: float,
+                          seed: int, directory: str) -> dict[str, Any]:
+    """Reaction throughput of the bot split into one process per shard."""
+
+    rng = random.Random(seed)
+    fake = FakeDiscord(guilds=guilds, rate_limit=(10 ** 9, 1.0), latency=latency)
+    await fake.start()
+
+    # seed the shared database before the shards load it
+    from discord_taskbot.components.config import StorageConfig
+    from discord_taskbot.components.persistence import PersistenceAPI
+
+    database = str(Path(directory) / f"shards-{shards}.db")
+    api = PersistenceAPI(StorageConfig(path=database))
+    api.startup()
+    task_messages = _seed_tasks(api, fake, tasks)
+    emojis = api.get_task_action_emoji_mapping()
+    api.close()
+
+    user_ids = [fake.snowflake() for _ in range(max(1, users))]
+
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_run_shard_process, daemon=True, args=(fake.rest_url, fake.gateway_url, {
+            'DB_PATH': database, 'DB_ECHO': 'FALSE', 'BACKUP_INTERVAL': '0', 'METRICS_ENABLED': 'FALSE',
+            'SHARD_COUNT': str(shards), 'SHARD_IDS': str(shard_id),
+        }))
+        for shard_id in range(shards)
+    ]
+
+    try:
+        for process in processes:
+            process.start()
+
+        await fake.wait_until_identified(sessions=shards, timeout=60.0)
+        await _wait_until_quiet(fake, quiet=1.0, timeout=60.0)
+
+        first_call = len(fake.calls)
+        started = time.perf_counter()
+
+        for _ in range(events):
+            channel_id, message_id = rng.choice(task_messages)
+            await fake.dispatch('MESSAGE_REACTION_ADD', _reaction_event(fake, rng, channel_id, message_id,
+                                                                        rng.choice(user_ids), emojis))
+
+        # every handled reaction is removed again, the last removal marks the end of the run
+        deadline = started + max(60.0, events / 10)
+        handled, finished = 0, started
+        while time.perf_counter() < deadline:
+            removals = [c for c in fake.calls[first_call:] if (c.method, c.route) == _REACTION_REMOVAL_ROUTE]
+            handled = len(removals)
+            if handled >= events:
+                finished = max(c.started + c.duration for c in removals)
+                break
+            await asyncio.sleep(0.05)
+
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        await fake.close()
+
+    seconds = finished - started if handled >= events else None
+
+    return {
+        'shards': shards,
+        'events': events,
+        'handled': handled,
+        'seconds': seconds,
+        'events_per_second': events / seconds if seconds else None,
+    }
+
+
+async def run_shard_scaling_test(shard_counts: list[int], events: int = 2000, guilds: int = 8, tasks: int = 400,
+                                 users: int = 20, latency: float = 0.0, seed: int = 0) -> dict[str, Any]:
+    """
+    Measure how reaction throughput scales with the number of shards. For every shard count, the bot runs as one
+    process per shard over a shared database, each process connected to the fake server with its own shard id.
+
+    All events are sent at once and spread over the tasks of all guilds. Throughput is the number of events divided
+    by the time until the last reaction removal (the REST call every handled reaction makes). Rate limits are not
+    simulated, so Discord's limits don't cap the measured throughput. Speedup and efficiency are relative to the
+    first shard count; shards only scale with enough CPU cores for them and the fake server.
+    """
+
+    runs = []
+
+    with tempfile.TemporaryDirectory() as directory:
+        for shards in shard_counts:
+            if shards < 1:
+                raise ValueError(f"Invalid shard count {shards}.")
+            runs.append(await _measure_shards(shards, events, guilds, tasks, users, latency, seed, directory))
+
+    base = runs[0] if runs and runs[0]['events_per_second'] else None
+    for run in runs:
+        if base and run['events_per_second']:
+            run['speedup'] = run['events_per_second'] / base['events_per_second']
+            run['efficiency'] = run['speedup'] / (run['shards'] / base['shards'])
+
+    return {'guilds': guilds, 'tasks': tasks, 'cpus': os.cpu_count(), 'runs': runs}
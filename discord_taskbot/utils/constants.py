@@ -26,6 +26,9 @@ TASK_EMOJI_IDS = [
 
 DEFAULT_TASK_EMOJI_MAPPING = dict(zip(TASK_EMOJI_IDS, DEFAULT_TASK_EMOJIS))
 
+# Discord's error code for reactions with an emoji that doesn't exist (anymore)
+UNKNOWN_EMOJI_ERROR_CODE = 10014
+
 TASK_STATUS_IDS = [
     'pending',
     'in_progress',
@@ -41,3 +44,51 @@ TASK_STATUS_NAMES = [
 ]
 
 TASK_STATUS_MAPPING = dict(zip(TASK_STATUS_IDS, TASK_STATUS_NAMES))
+
+# seconds a task's message and thread rendering is delayed to coalesce quick successive changes
+DEFAULT_RENDER_DELAY = 1.0
+
+# maximum number of tasks and boards whose last rendering is remembered to skip unchanged edits
+DEFAULT_RENDER_CACHE_SIZE = 10000
+
+# maximum number of cached channel, thread and message handles
+DEFAULT_HANDLE_CACHE_SIZE = 1024
+
+# maximum number of outgoing requests in flight and of waiting requests per priority
+DEFAULT_SCHEDULER_CONCURRENCY = 4
+DEFAULT_SCHEDULER_QUEUE_SIZE = 1000
+
+# maximum number and lifetime (seconds) of cached task lookups
+DEFAULT_TASK_CACHE_SIZE = 10000
+DEFAULT_TASK_CACHE_TTL = 300.0
+
+# file formats of imports and exports and number of records per transaction and per read
+TRANSFER_FORMATS = ('jsonl', 'csv')
+DEFAULT_TRANSFER_CHUNK_SIZE = 1000
+
+# tasks added to the search index per transaction and seconds between the transactions of the background build
+DEFAULT_SEARCH_INDEX_CHUNK_SIZE = 2000
+DEFAULT_SEARCH_INDEX_PAUSE = 0.05
+
+# number of results per search page, titles are shortened so a page fits into one message
+MAX_SEARCH_RESULTS = 10
+
+# tasks per page of a task listing and prefix of the custom ids of its page buttons
+TASK_PAGE_SIZE = 15
+TASK_PAGE_ID_PREFIX = 'tasks'
+
+# seconds between the first task change of a project and the edit of its board message, at most one edit per window
+DEFAULT_BOARD_RENDER_DELAY = 5.0
+
+# values table entry of a project's board message id, followed by the project id
+BOARD_MESSAGE_VALUE_PREFIX = 'BOARD_MESSAGE_'
+
+# maximum number of assignees listed on a board
+MAX_BOARD_ASSIGNEES = 20
+
+# values table entry of a project channel's reconciliation mark (the oldest task message), followed by the channel id
+RECONCILE_MARK_VALUE_PREFIX = 'RECONCILE_MARK_'
+
+# project channels reconciled at the same time after startup and messages between two progress records of a channel
+DEFAULT_RECONCILE_CONCURRENCY = 4
+RECONCILE_PROGRESS_INTERVAL = 5000
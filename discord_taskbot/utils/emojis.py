@@ -0,0 +1,26 @@
+"""
+Emoji helpers.
+"""
+
+import re
+
+__all__ = ['normalize_emoji']
+
+# custom server emojis are formatted as '<:name:id>' or '<a:name:id>' (animated)
+CUSTOM_EMOJI_PATTERN = re.compile(r'<a?:\w+:(\d+)>')
+
+
+def normalize_emoji(emoji: str) -> str:
+    """
+    Generate a comparable key for an emoji.
+    Custom server emojis are identified by their emoji id, as their name can change. Unicode emojis are compared
+    without variation selectors, which are not always part of reaction payloads.
+    """
+
+    emoji = str(emoji).strip()
+
+    match = CUSTOM_EMOJI_PATTERN.fullmatch(emoji)
+    if match:
+        return match.group(1)
+
+    return emoji.replace('\ufe0f', '')
@@ -0,0 +1,144 @@
+"""
+Tests of the online backup while the bot's persistence layer keeps updating tasks.
+"""
+
+import itertools
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from discord_taskbot.components.backup import create_snapshot
+from discord_taskbot.components.config import BackupConfig, StorageConfig
+from discord_taskbot.components.exceptions import BackupFailed
+from discord_taskbot.components.persistence import PersistenceAPI
+from discord_taskbot.utils.constants import TASK_STATUS_IDS
+
+# tasks with descriptions of 1 KiB in the database before the backup, a few hundred pages
+TASKS = 1000
+
+# longest time a single update_task() of the writer may take while the backup runs
+MAX_UPDATE_SECONDS = 0.5
+
+
+class Writer(threading.Thread):
+
+    def __init__(self, db: PersistenceAPI, task_ids: list[int]) -> None:
+        """
+        Updates status and assignee of the tasks one after another until stopped, tracking the number and the
+        longest duration of the updates.
+        """
+
+        super().__init__(daemon=True)
+        self.db = db
+        self.task_ids = task_ids
+        self.updates = 0
+        self.max_update_seconds = 0.0
+        self.error: Exception | None = None
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        statuses = itertools.cycle(TASK_STATUS_IDS)
+        assignees = itertools.cycle([1, 2, 3])
+
+        try:
+            for task_id in itertools.cycle(self.task_ids):
+                if self._stopped.is_set():
+                    return
+
+                start = time.perf_counter()
+                self.db.update_task(task_id, status=next(statuses), assigned_to=next(assignees))
+                self.max_update_seconds = max(self.max_update_seconds, time.perf_counter() - start)
+                self.updates += 1
+                time.sleep(0.001)
+        except Exception as e:
+            self.error = e
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+def _create_database(tmp_path, journal_mode: str) -> tuple[PersistenceAPI, list[int]]:
+    """Bot database with a project of TASKS tasks. Returns the api and the task ids."""
+
+    db = PersistenceAPI(StorageConfig(path=str(tmp_path / 'data.db'), journal_mode=journal_mode))
+    db.startup()
+
+    project = db.add_project('BACKUP', "Backup", "Backups during updates.", 1)
+    tasks = db.add_tasks(project.id, [(f"Task {i}", 'x' * 1024) for i in range(TASKS)])
+
+    return db, [t.id for t in tasks]
+
+
+def _assert_consistent(snapshot: str) -> None:
+    """The snapshot holds all tasks, and the stored task counts of the project match its tasks."""
+
+    connection = sqlite3.connect(snapshot)
+    try:
+        assert connection.execute("SELECT count(*) FROM tasks").fetchone()[0] == TASKS
+
+        statuses = Counter(dict(connection.execute("SELECT status, count(*) FROM tasks GROUP BY status")))
+        assignees = Counter(dict(connection.execute("SELECT CAST(assigned_to AS TEXT), count(*) FROM tasks "
+                                                    "WHERE assigned_to IS NOT NULL GROUP BY assigned_to")))
+        stats = {kind: Counter() for kind in ('status', 'assignee')}
+        for kind, key, count in connection.execute("SELECT kind, key, count FROM project_stats WHERE count != 0"):
+            stats[kind][key] = count
+
+        assert sum(stats['status'].values()) == TASKS
+        assert stats['status'] == statuses
+        assert stats['assignee'] == assignees
+    finally:
+        connection.close()
+
+
+def test_backup_during_updates_wal(tmp_path):
+    """In WAL mode, the backup completes while update_task() keeps committing, and the snapshot is consistent."""
+
+    db, task_ids = _create_database(tmp_path, 'WAL')
+    config = BackupConfig(directory=str(tmp_path / 'backups'), pages=1, step_sleep=0.002)
+
+    writer = Writer(db, task_ids)
+    writer.start()
+    time.sleep(0.05)
+
+    try:
+        updates_before = writer.updates
+        snapshot = create_snapshot(db.config.path, config)
+        updates_during = writer.updates - updates_before
+    finally:
+        writer.stop()
+        db.close()
+
+    assert writer.error is None
+    assert updates_during > 0
+    assert writer.max_update_seconds < MAX_UPDATE_SECONDS
+
+    _assert_consistent(str(snapshot))
+
+
+def test_backup_during_updates_rollback_journal(tmp_path):
+    """
+    In rollback journal mode, every commit restarts the backup. It gives up instead of copying the database in a
+    single step, so update_task() is never locked out and no partial snapshot is left behind.
+    """
+
+    db, task_ids = _create_database(tmp_path, 'DELETE')
+    config = BackupConfig(directory=str(tmp_path / 'backups'), pages=1, step_sleep=0.002)
+
+    writer = Writer(db, task_ids)
+    writer.start()
+    time.sleep(0.05)
+
+    try:
+        with pytest.raises(BackupFailed):
+            create_snapshot(db.config.path, config)
+    finally:
+        writer.stop()
+        db.close()
+
+    assert writer.error is None
+    assert writer.max_update_seconds < MAX_UPDATE_SECONDS
+    assert not list((tmp_path / 'backups').iterdir())
@@ -0,0 +1,83 @@
+"""
+Tests of the reconciliation of project channels against the fake Discord server.
+"""
+
+import asyncio
+
+import discord
+import discord.http
+import discord.webhook.async_
+import yarl
+from discord.gateway import DiscordWebSocket
+
+from discord_taskbot.components.client import TaskBot
+from discord_taskbot.components.reconcile import reconcile_channels
+from discord_taskbot.fake_discord import FakeDiscord
+from discord_taskbot.utils import INTENTS
+
+USER_ID = 1001
+
+
+def test_conflicting_status_reactions(monkeypatch, tmp_path):
+    """
+    Status reactions that ask for different statuses are not replayed, as the order they were added in is unknown.
+    They are removed, the other reactions of the message are replayed. A single status is replayed as usual.
+    """
+
+    async def run() -> None:
+        fake = FakeDiscord(channels=1)
+        await fake.start()
+
+        monkeypatch.setenv('DB_PATH', str(tmp_path / 'data.db'))
+        monkeypatch.setenv('BACKUP_INTERVAL', '0')
+        monkeypatch.setattr(discord.http.Route, 'BASE', fake.rest_url)
+        monkeypatch.setattr(discord.webhook.async_.Route, 'BASE', fake.rest_url)
+        monkeypatch.setattr(DiscordWebSocket, 'DEFAULT_GATEWAY', yarl.URL(fake.gateway_url), raising=False)
+
+        client = TaskBot(intents=INTENTS)
+        emojis = client.db.api.get_task_action_emoji_mapping()
+
+        channel_id = fake.channel_ids[0]
+        project = client.db.api.add_project('RECON', "Reconcile", "Reactions while offline.", channel_id,
+                                            fake.guild_id)
+
+        conflicting, single = fake.add_message(channel_id), fake.add_message(channel_id)
+        for message_id in (conflicting, single):
+            task = client.db.api.add_task(project.id, "Task", "Reacted to while offline.")
+            client.db.api.update_task(task.id, message_id=message_id)
+
+        fake.add_reaction(conflicting, emojis['in_progress'], USER_ID)
+        fake.add_reaction(conflicting, emojis['done'], USER_ID)
+        fake.add_reaction(conflicting, emojis['self_assign'], USER_ID)
+        fake.add_reaction(single, emojis['done'], USER_ID)
+
+        replayed = []
+
+        async def replay(payload: discord.RawReactionActionEvent) -> None:
+            replayed.append((payload.message_id, str(payload.emoji)))
+
+        bot_task = asyncio.create_task(client.start('fake-token'))
+        try:
+            await fake.wait_until_identified()
+            await client.wait_until_ready()
+            result = await reconcile_channels(client, replay)
+
+            while client.scheduler.pending:
+                await asyncio.sleep(0.01)
+
+            remaining = {m: {e: list(u) for e, u in fake._reactions.get(m, {}).items() if u}
+                         for m in (conflicting, single)}
+        finally:
+            await client.close()
+            await asyncio.gather(bot_task, return_exceptions=True)
+            await fake.close()
+
+        assert result.conflicts == 1
+        assert result.reactions == 2
+        assert sorted(replayed) == sorted([(conflicting, emojis['self_assign']), (single, emojis['done'])])
+
+        # the conflicting status reactions are removed, replayed ones are removed by the bot's reaction handler
+        assert remaining[conflicting] == {emojis['self_assign']: [USER_ID]}
+        assert remaining[single] == {emojis['done']: [USER_ID]}
+
+    asyncio.run(run())
@@ -0,0 +1,125 @@
+"""
+Tests of the outbound scheduler: priorities, bucket serialization and requests of busy buckets.
+"""
+
+import asyncio
+import time
+
+import discord
+import discord.http
+import discord.webhook.async_
+
+from discord_taskbot.components.scheduler import OutboundScheduler, Priority
+from discord_taskbot.components.stats import BotStats
+from discord_taskbot.fake_discord import FakeDiscord
+
+
+def test_priority_order():
+    """Waiting requests are sent by priority class, in queue order within a class."""
+
+    async def run() -> list[str]:
+        scheduler = OutboundScheduler(BotStats(), concurrency=1, queue_size=100)
+        sent = []
+
+        async def send(name: str) -> None:
+            sent.append(name)
+
+        for i, priority in enumerate([Priority.BULK, Priority.CLEANUP, Priority.INTERACTION, Priority.BULK]):
+            await scheduler.enqueue(priority, ('channel', i), send, f"{priority.name}-{i}")
+
+        scheduler.start()
+        while len(sent) < 4:
+            await asyncio.sleep(0.01)
+
+        await scheduler.close()
+        return sent
+
+    assert asyncio.run(run()) == ['INTERACTION-2', 'CLEANUP-1', 'BULK-0', 'BULK-3']
+
+
+def test_bucket_serialized():
+    """Requests of a bucket are sent one after another and in order, other buckets are not delayed."""
+
+    async def run() -> tuple[list[str], int]:
+        scheduler = OutboundScheduler(BotStats(), concurrency=4, queue_size=100)
+        scheduler.start()
+
+        sent = []
+        in_flight = {'a': 0, 'max': 0}
+
+        async def send(name: str) -> None:
+            in_flight['a'] += 1
+            in_flight['max'] = max(in_flight['max'], in_flight['a'])
+            await asyncio.sleep(0.02)
+            in_flight['a'] -= 1
+            sent.append(name)
+
+        async def other() -> None:
+            sent.append('other')
+
+        results = [scheduler.run(Priority.CLEANUP, ('channel', 1), send, f"a{i}") for i in range(4)]
+        results.append(scheduler.run(Priority.CLEANUP, ('channel', 2), other))
+        await asyncio.gather(*results)
+
+        await scheduler.close()
+        return sent, in_flight['max']
+
+    sent, max_in_flight = asyncio.run(run())
+    assert max_in_flight == 1
+    assert [s for s in sent if s != 'other'] == ['a0', 'a1', 'a2', 'a3']
+    assert sent.index('other') < sent.index('a1')
+
+
+def test_busy_bucket_does_not_block_other_buckets(monkeypatch):
+    """
+    Message edits against the fake Discord server: while a channel's rate limit holds its requests back, edits of
+    other channels are still sent right away, even if all workers could be waiting for the limited channel.
+    """
+
+    async def run() -> tuple[float, list[str]]:
+        fake = FakeDiscord(channels=2, rate_limit=(2, 1.0))
+        await fake.start()
+
+        monkeypatch.setattr(discord.http.Route, 'BASE', fake.rest_url)
+        monkeypatch.setattr(discord.webhook.async_.Route, 'BASE', fake.rest_url)
+
+        client = discord.Client(intents=discord.Intents.none())
+        await client.login('x')
+
+        scheduler = OutboundScheduler(BotStats(), concurrency=2, queue_size=100)
+        scheduler.start()
+
+        limited, other = fake.channel_ids
+        message = client.get_partial_messageable(limited).get_partial_message(fake.snowflake())
+        other_message = client.get_partial_messageable(other).get_partial_message(fake.snowflake())
+        edited = []
+
+        async def edit(m: discord.PartialMessage, content: str) -> None:
+            await m.edit(content=content)
+            edited.append(content)
+
+        try:
+            # the second edit depletes the channel's bucket: discord.py waits for its reset before returning, the
+            # third edit has to wait for the bucket as well
+            for i in range(3):
+                await scheduler.enqueue(Priority.BULK, ('channel', limited), edit, message, f"bulk {i}")
+            await asyncio.sleep(0.2)
+
+            started = time.perf_counter()
+            await scheduler.run(Priority.TASK_EDIT, ('channel', other), edit, other_message, "urgent")
+            urgent_seconds = time.perf_counter() - started
+
+            while len(edited) < 4:
+                await asyncio.sleep(0.05)
+
+        finally:
+            await scheduler.close()
+            await client.close()
+            await fake.close()
+
+        return urgent_seconds, edited
+
+    urgent_seconds, edited = asyncio.run(run())
+
+    assert urgent_seconds < 0.5
+    assert [e for e in edited if e != "urgent"] == ["bulk 0", "bulk 1", "bulk 2"]
@@ -0,0 +1,98 @@
+"""
+Concurrency stress test of task number allocation: tasks created in parallel get unique, gap-free numbers.
+
+Runs on SQLite, and on PostgreSQL if TASKBOT_TEST_DATABASE_URL points to an empty database.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from discord_taskbot.components.backends import create_backend
+from discord_taskbot.components.config import StorageConfig
+from discord_taskbot.components.persistence import PersistenceAPI
+
+THREADS = 16
+PROCESSES = 4
+TASKS = 2000
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def config(request, tmp_path) -> StorageConfig:
+    if request.param == 'sqlite':
+        yield StorageConfig(path=str(tmp_path / 'data.db'))
+        return
+
+    url = os.environ.get('TASKBOT_TEST_DATABASE_URL')
+    if not url:
+        pytest.skip("TASKBOT_TEST_DATABASE_URL is not set")
+
+    config = StorageConfig(url=url)
+    yield config
+
+    backend = create_backend(config)
+    engine = backend.create_engine()
+    backend.drop_all(engine)
+    engine.dispose()
+
+
+def _create_project(config: StorageConfig) -> int:
+    db = PersistenceAPI(config)
+    db.startup()
+    project = db.add_project('STRESS', "Stress", "Concurrent task creation.", 1)
+    db.close()
+    return project.id
+
+
+def _add_tasks(config: StorageConfig, project_id: int, count: int) -> list[int]:
+    """Create tasks with an own PersistenceAPI, like a second bot process or 'import' would."""
+
+    db = PersistenceAPI(config)
+    db.startup()
+    try:
+        return [db.add_task(project_id, f"Task {i}", "Stress test.").number for i in range(count)]
+    finally:
+        db.close()
+
+
+def _stored_numbers(config: StorageConfig, project_id: int) -> list[int]:
+    db = PersistenceAPI(config)
+    db.startup()
+    try:
+        return [t.number for t in db.get_tasks(project_id, limit=TASKS * 2)]
+    finally:
+        db.close()
+
+
+def test_add_task_threads(config):
+    """Many threads sharing one PersistenceAPI, as the bot's executor does with DB_WORKERS > 1."""
+
+    project_id = _create_project(config)
+
+    db = PersistenceAPI(config)
+    db.startup()
+    try:
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            numbers = list(executor.map(lambda i: db.add_task(project_id, f"Task {i}", "Stress test.").number,
+                                        range(TASKS)))
+    finally:
+        db.close()
+
+    assert sorted(numbers) == list(range(1, TASKS + 1))
+    assert _stored_numbers(config, project_id) == list(range(1, TASKS + 1))
+
+
+def test_add_task_processes(config):
+    """Several processes with their own connections creating tasks of the same project."""
+
+    project_id = _create_project(config)
+    per_process = TASKS // PROCESSES
+
+    with multiprocessing.get_context('spawn').Pool(PROCESSES) as pool:
+        results = pool.starmap(_add_tasks, [(config, project_id, per_process)] * PROCESSES)
+
+    numbers = [n for r in results for n in r]
+    assert sorted(numbers) == list(range(1, per_process * PROCESSES + 1))
+    assert _stored_numbers(config, project_id) == list(range(1, per_process * PROCESSES + 1))